@@ -5,6 +5,12 @@ import streamlit as st
 
 import config
 from src.chat import ChatPipeline
+from src.common.constants import SAMPLE_QUESTIONS
+from src.result_cache import ResultCache
+from src.schema_profile import ProfileStore
+from src.table_store import SharedTableStore
+from src.tracing import OpenTelemetryExporter, add_exporter, format_timings, serve_metrics
+from src.uploads import UploadCache
 
 # Page configuration
 st.set_page_config(
@@ -396,6 +402,18 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+
+@st.cache_resource
+def get_upload_cache() -> UploadCache:
+    """Get the cache of parsed uploads shared by all sessions (cached)."""
+    return UploadCache()
+
+
+def load_uploads(uploaded_files) -> tuple[str, dict[str, pd.DataFrame]]:
+    """Get the parsed tables for the uploaded files, parsing each workbook only once."""
+    return get_upload_cache().load([(f.name, f.getvalue()) for f in uploaded_files])
+
+
 # Sidebar for configuration
 with st.sidebar:
     # Logo/Brand section
@@ -481,17 +499,7 @@ with st.sidebar:
     if use_uploaded and uploaded_files:
         st.caption("Questions depend on your uploaded data")
     else:
-        sample_questions = [
-            "List all clients with their industries",
-            "Which clients are based in the UK?",
-            "Invoices issued in March 2024",
-            "Which invoices are marked as 'Overdue'?",
-            "Count line items by service name",
-            "Total billed amount per client in 2024",
-            "Client with highest 2024 billing",
-        ]
-
-        for q in sample_questions:
+        for q in SAMPLE_QUESTIONS:
             if st.button(q, key=q, width="stretch"):
                 st.session_state.selected_question = q
 
@@ -501,14 +509,10 @@ with st.sidebar:
     st.markdown("## Data Preview")
 
     if use_uploaded and uploaded_files:
-        file_names = [f.name.replace(".xlsx", "") for f in uploaded_files]
-        preview_table = st.selectbox("Select table", file_names, label_visibility="collapsed")
-
         try:
-            for f in uploaded_files:
-                if f.name.replace(".xlsx", "") == preview_table:
-                    df = pd.read_excel(f)
-                    break
+            _, uploaded_dataframes = load_uploads(uploaded_files)
+            preview_table = st.selectbox("Select table", list(uploaded_dataframes), label_visibility="collapsed")
+            df = uploaded_dataframes[preview_table]
             st.dataframe(df.head(10), width="stretch", height=200)
             st.caption(f"Showing 10 of {len(df)} rows • {len(df.columns)} columns")
         except Exception as e:
@@ -527,45 +531,99 @@ with st.sidebar:
             st.error(f"Could not load data: {e}")
 
 
-def load_uploaded_dataframes(uploaded_files) -> dict[str, pd.DataFrame]:
-    """Load dataframes from uploaded files."""
-    dataframes = {}
-    for f in uploaded_files:
-        # Create DataFrame name from filename (e.g., "Clients.xlsx" -> "clients_df")
-        name = f.name.replace(".xlsx", "").lower().replace(" ", "_") + "_df"
+@st.cache_resource
+def get_table_store() -> SharedTableStore:
+    """Get the memory-mapped table store shared by all sessions (cached)."""
+    return SharedTableStore(config.TABLE_STORE_DIR, max_bytes=config.TABLE_STORE_MAX_MB * 1024 * 1024)
+
+
+@st.cache_resource
+def get_profile_store() -> ProfileStore:
+    """Get the store of precomputed column statistics (cached)."""
+    return ProfileStore(config.PROFILE_STORE_DIR)
 
-        # Try to detect date columns and parse them
-        df = pd.read_excel(f)
 
-        # Auto-detect date columns by name
-        for col in df.columns:
-            col_lower = col.lower()
-            if "date" in col_lower or col_lower.endswith("_at") or col_lower.endswith("_on"):
-                try:
-                    df[col] = pd.to_datetime(df[col])
-                except Exception:
-                    pass  # Keep as-is if conversion fails
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Get the persistent answer cache shared by all sessions (cached)."""
+    return ResultCache(
+        config.RESULT_CACHE_PATH,
+        max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.RESULT_CACHE_TTL_SECONDS,
+    )
 
-        dataframes[name] = df
 
-    return dataframes
+@st.cache_resource
+def start_metrics() -> None:
+    """Start the Prometheus endpoint and OpenTelemetry export once per process (cached)."""
+    if config.METRICS_PORT:
+        serve_metrics(config.METRICS_PORT)
+    if config.OTEL_TRACING:
+        add_exporter(OpenTelemetryExporter())
+
+
+start_metrics()
 
 
 # Initialize chat pipeline
 @st.cache_resource
 def get_pipeline_from_dir(api_key: str, model: str):
     """Initialize the chat pipeline from the data directory (cached)."""
-    return ChatPipeline(data_dir=config.DATA_DIR, api_key=api_key, model=model)
+    return ChatPipeline(
+        data_dir=config.DATA_DIR,
+        api_key=api_key,
+        model=model,
+        table_store=get_table_store(),
+        result_cache=get_result_cache(),
+        profile_store=get_profile_store(),
+        reuse_similar_questions=True,
+        direct_answers=True,
+        materialized_views=config.MATERIALIZED_VIEWS,
+        key_indexes=config.KEY_INDEXES,
+        derived_tables_max_rows=config.DERIVED_TABLES_MAX_ROWS,
+        engine=config.EXECUTION_ENGINE,
+        sandbox_workers=config.SANDBOX_WORKERS,
+        optimize_dtypes=config.OPTIMIZE_DTYPES,
+    )
 
 
-def get_pipeline_from_uploads(api_key: str, model: str, uploaded_files):
-    """Initialize the chat pipeline from uploaded files."""
-    dataframes = load_uploaded_dataframes(uploaded_files)
-    return ChatPipeline(dataframes=dataframes, api_key=api_key, model=model)
+@st.cache_resource(max_entries=8)
+def get_pipeline_from_uploads(api_key: str, model: str, upload_key: str, _dataframes: dict[str, pd.DataFrame]):
+    """Initialize the chat pipeline from uploaded files (cached per upload content)."""
+    return ChatPipeline(
+        dataframes=_dataframes,
+        api_key=api_key,
+        model=model,
+        table_store=get_table_store(),
+        result_cache=get_result_cache(),
+        profile_store=get_profile_store(),
+        reuse_similar_questions=True,
+        direct_answers=True,
+        materialized_views=config.MATERIALIZED_VIEWS,
+        key_indexes=config.KEY_INDEXES,
+        derived_tables_max_rows=config.DERIVED_TABLES_MAX_ROWS,
+        engine=config.EXECUTION_ENGINE,
+    )
+
+
+def show_status(placeholder, text: str) -> None:
+    """Render the animated loading indicator with a status message."""
+    placeholder.markdown(
+        f"""
+        <div class="loading-indicator">
+            <div class="loading-dots">
+                <span></span><span></span><span></span>
+            </div>
+            <span class="loading-text">{text}</span>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
 
 
 # Get API key from config
 api_key = config.ANTHROPIC_API_KEY
+CODE_LANGUAGE = "sql" if config.EXECUTION_ENGINE == "sql" else "python"
 
 # Main chat interface
 if not api_key:
@@ -596,7 +654,7 @@ elif use_uploaded and not uploaded_files:
 else:
     # Show available tables info
     if use_uploaded and uploaded_files:
-        dataframes = load_uploaded_dataframes(uploaded_files)
+        _, dataframes = load_uploads(uploaded_files)
         table_names = list(dataframes.keys())
         cols = st.columns(len(table_names))
         for i, name in enumerate(table_names):
@@ -633,9 +691,11 @@ else:
             for message in st.session_state.messages:
                 with st.chat_message(message["role"], avatar=None):
                     st.markdown(message["content"])
+                    if message.get("timings"):
+                        st.caption(message["timings"])
                     if "code" in message and message["code"]:
                         with st.expander("View generated code", expanded=False):
-                            st.code(message["code"], language="python")
+                            st.code(message["code"], language=CODE_LANGUAGE)
                     if "data" in message and message["data"] is not None:
                         with st.expander("View raw data", expanded=False):
                             if isinstance(message["data"], pd.DataFrame):
@@ -666,41 +726,43 @@ else:
         with st.chat_message("assistant", avatar=None):
             # Animated loading indicator
             status_placeholder = st.empty()
-            status_placeholder.markdown(
-                """
-                <div class="loading-indicator">
-                    <div class="loading-dots">
-                        <span></span><span></span><span></span>
-                    </div>
-                    <span class="loading-text">Analyzing your question</span>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
+            show_status(status_placeholder, "Analyzing your question")
 
             try:
                 # Get a pipeline based on a data source
                 if use_uploaded and uploaded_files:
-                    pipeline = get_pipeline_from_uploads(api_key, model, uploaded_files)
+                    upload_key, dataframes = load_uploads(uploaded_files)
+                    pipeline = get_pipeline_from_uploads(api_key, model, upload_key, dataframes)
                 else:
                     pipeline = get_pipeline_from_dir(api_key, model)
 
-                status_placeholder.markdown(
-                    """
-                    <div class="loading-indicator">
-                        <div class="loading-dots">
-                            <span></span><span></span><span></span>
-                        </div>
-                        <span class="loading-text">Generating response</span>
-                    </div>
-                    """,
-                    unsafe_allow_html=True,
-                )
-                response = pipeline.ask(query)
+                # Stream the pipeline's progress and render answer tokens as they arrive
+                show_status(status_placeholder, "Generating code")
+                answer_placeholder = st.empty()
+                answer_text = ""
+                response = None
+                for event in pipeline.ask_stream(query):
+                    if event.type == "code":
+                        show_status(status_placeholder, "Running query")
+                    elif event.type == "execution":
+                        if event.execution_result.success:
+                            show_status(status_placeholder, "Writing answer")
+                        else:
+                            show_status(status_placeholder, "Fixing query")
+                    elif event.type == "answer_delta":
+                        status_placeholder.empty()
+                        answer_text += event.text
+                        answer_placeholder.markdown(answer_text + "▌")
+                    elif event.type == "done":
+                        response = event.response
                 status_placeholder.empty()
 
                 # Display answer
-                st.markdown(response.answer)
+                answer_placeholder.markdown(response.answer)
+                if response.cached:
+                    st.caption("Answered from cache")
+                timings = format_timings(response.timings, response.tokens)
+                st.caption(timings)
 
                 # Show expandable details
                 col1, col2 = st.columns(2)
@@ -708,7 +770,7 @@ else:
                 with col1:
                     if response.generated_code:
                         with st.expander("View generated code", expanded=False):
-                            st.code(response.generated_code, language="python")
+                            st.code(response.generated_code, language=CODE_LANGUAGE)
 
                 with col2:
                     if response.execution_result.result is not None:
@@ -725,6 +787,7 @@ else:
                         "role": "assistant",
                         "content": response.answer,
                         "code": response.generated_code,
+                        "timings": timings,
                         "data": response.execution_result.result
                         if isinstance(response.execution_result.result, pd.DataFrame | pd.Series)
                         else None,
@@ -12,9 +12,47 @@ load_dotenv()
 PROJECT_ROOT = Path(__file__).parent
 DATA_DIR = PROJECT_ROOT / "data"
 
+# Shared, memory-mapped table store used by every pipeline on this host
+TABLE_STORE_DIR = Path(os.environ.get("TABLE_STORE_DIR", PROJECT_ROOT / ".cache" / "tables"))
+# Least recently used datasets (e.g. old uploads) are removed beyond this size
+TABLE_STORE_MAX_MB = int(os.environ.get("TABLE_STORE_MAX_MB", "2048"))
+
+# Column statistics for the schema prompt, kept next to the data
+PROFILE_STORE_DIR = Path(os.environ.get("PROFILE_STORE_DIR", DATA_DIR / ".cache" / "profiles"))
+
+# Convert loaded tables to compact dtypes (category, Arrow-backed strings)
+OPTIMIZE_DTYPES = os.environ.get("OPTIMIZE_DTYPES", "false").lower() in ("1", "true", "yes")
+
+# Pre-joined views and key indexes for generated pandas code; both are left
+# out for datasets with more rows than DERIVED_TABLES_MAX_ROWS (0 for no limit),
+# where the views copy and the indexes pin too much memory
+MATERIALIZED_VIEWS = os.environ.get("MATERIALIZED_VIEWS", "true").lower() in ("1", "true", "yes")
+KEY_INDEXES = os.environ.get("KEY_INDEXES", "true").lower() in ("1", "true", "yes")
+DERIVED_TABLES_MAX_ROWS = int(os.environ.get("DERIVED_TABLES_MAX_ROWS", "2000000"))
+
+# Run generated pandas code ("pandas"), Polars code on lazy frames ("polars")
+# or generated SQL on an embedded database ("sql")
+EXECUTION_ENGINE = os.environ.get("EXECUTION_ENGINE", "pandas")
+
 # API Configuration
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
 
 # LLM Configuration
 DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL", "claude-sonnet-4-20250514")
 MAX_TOKENS = int(os.environ.get("MAX_TOKENS", "1024"))
+
+# Answer cache for repeated questions
+RESULT_CACHE_PATH = Path(os.environ.get("RESULT_CACHE_PATH", PROJECT_ROOT / ".cache" / "results.sqlite"))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "500"))
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "86400"))
+
+# Metrics: Prometheus text served at http://127.0.0.1:<METRICS_PORT>/metrics (0 disables),
+# and spans mirrored to OpenTelemetry (needs opentelemetry-api and a configured SDK)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+OTEL_TRACING = os.environ.get("OTEL_TRACING", "false").lower() in ("1", "true", "yes")
+
+# Sandbox for generated code (0 workers runs it inline in the app process)
+SANDBOX_WORKERS = int(os.environ.get("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT_SECONDS = float(os.environ.get("SANDBOX_TIMEOUT_SECONDS", "30"))
+SANDBOX_MEMORY_LIMIT_MB = int(os.environ.get("SANDBOX_MEMORY_LIMIT_MB", "2048"))
+SANDBOX_CPU_LIMIT_SECONDS = int(os.environ.get("SANDBOX_CPU_LIMIT_SECONDS", "30"))
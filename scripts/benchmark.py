@@ -0,0 +1,80 @@
+"""Benchmark the chat pipeline offline by replaying recorded model responses.
+
+Examples:
+    uv run python scripts/benchmark.py
+    uv run python scripts/benchmark.py --engine sql --repeats 20 --concurrency 8 --latency 0.2
+    uv run python scripts/benchmark.py --data-dir data/scaled --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.benchmark import compare_reports, load_corpus, run_benchmark  # noqa: E402
+from src.common.constants import SAMPLE_QUESTIONS  # noqa: E402
+
+DEFAULT_CORPUS = PROJECT_ROOT / "benchmarks" / "corpus.json"
+DEFAULT_DATA_DIR = PROJECT_ROOT / "data"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="recorded questions and responses")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="workbooks to load")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per question")
+    parser.add_argument("--concurrency", type=int, default=4, help="threads for the throughput run")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per model request")
+    parser.add_argument("--engine", choices=("pandas", "polars", "sql"), default="pandas")
+    parser.add_argument("--sandbox-workers", type=int, default=0)
+    parser.add_argument("--optimize-dtypes", action="store_true")
+    parser.add_argument("--views", action="store_true", help="build materialized views")
+    parser.add_argument("--indexes", action="store_true", help="build key indexes")
+    parser.add_argument("--no-direct-answers", action="store_true", help="always make the answer request")
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", type=Path, help="earlier JSON report to compare against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    corpus = load_corpus(args.corpus)
+    missing = [question for question in SAMPLE_QUESTIONS if question not in {entry["question"] for entry in corpus}]
+    if missing:
+        print(f"Warning: corpus has no recording for {missing}", file=sys.stderr)
+
+    report = run_benchmark(
+        corpus,
+        args.data_dir,
+        repeats=args.repeats,
+        concurrency=args.concurrency,
+        latency=args.latency,
+        engine=args.engine,
+        sandbox_workers=args.sandbox_workers,
+        optimize_dtypes=args.optimize_dtypes,
+        materialized_views=args.views,
+        key_indexes=args.indexes,
+        direct_answers=not args.no_direct_answers,
+    )
+
+    failures = sum(stats.failures for stats in report.questions) + report.throughput["failures"]
+    if failures:
+        print(f"Warning: {failures} runs failed; latencies include failed attempts", file=sys.stderr)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(report.to_json())
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(report.to_json())
+
+    if args.compare:
+        for line in compare_reports(json.loads(args.compare.read_text()), json.loads(report.to_json())):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
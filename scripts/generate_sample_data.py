@@ -1,6 +1,16 @@
-"""Generate sample Excel data files for the RAG system."""
+"""Generate sample Excel data files for the RAG system.
 
+Without options this writes the small hand-made sample to data/. Scale
+options generate a synthetic dataset of any size with the same schema:
+
+    uv run python scripts/generate_sample_data.py --clients 5000 --invoices-per-month 280000 \\
+        --line-items-per-invoice 3 --format parquet --output-dir data/scaled
+"""
+
+import argparse
 import random
+import sys
+import time
 from datetime import date, timedelta
 from pathlib import Path
 
@@ -9,7 +19,8 @@ import pandas as pd
 # Seed for reproducibility
 random.seed(42)
 
-DATA_DIR = Path(__file__).parent.parent / "data"
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data"
 
 
 def generate_clients() -> pd.DataFrame:
@@ -188,9 +199,9 @@ def generate_line_items(invoices_df: pd.DataFrame) -> pd.DataFrame:
     return pd.DataFrame(line_items)
 
 
-def main():
-    """Generate all sample data files."""
-    DATA_DIR.mkdir(exist_ok=True)
+def generate_sample(output_dir: Path):
+    """Write the small sample dataset as Excel workbooks."""
+    output_dir.mkdir(parents=True, exist_ok=True)
 
     print("Generating sample data...")
 
@@ -200,14 +211,64 @@ def main():
     line_items_df = generate_line_items(invoices_df)
 
     # Save to Excel
-    clients_df.to_excel(DATA_DIR / "Clients.xlsx", index=False)
-    invoices_df.to_excel(DATA_DIR / "Invoices.xlsx", index=False)
-    line_items_df.to_excel(DATA_DIR / "InvoiceLineItems.xlsx", index=False)
+    clients_df.to_excel(output_dir / "Clients.xlsx", index=False)
+    invoices_df.to_excel(output_dir / "Invoices.xlsx", index=False)
+    line_items_df.to_excel(output_dir / "InvoiceLineItems.xlsx", index=False)
 
     print(f"Generated {len(clients_df)} clients")
     print(f"Generated {len(invoices_df)} invoices")
     print(f"Generated {len(line_items_df)} line items")
-    print(f"Data saved to {DATA_DIR}")
+    print(f"Data saved to {output_dir}")
+
+
+def generate_scaled(args: argparse.Namespace):
+    """Write a synthetic dataset of the requested size."""
+    sys.path.insert(0, str(PROJECT_ROOT))
+    from src.synthetic_data import Scale, write_dataset
+
+    scale = Scale(
+        clients=args.clients,
+        invoices_per_month=args.invoices_per_month,
+        years=args.years,
+        line_items_per_invoice=args.line_items_per_invoice,
+        start_year=args.start_year,
+    )
+    print(f"Generating {args.format} data: {scale}")
+    started = time.perf_counter()
+    rows = write_dataset(args.output_dir, scale, fmt=args.format, chunk_rows=args.chunk_rows, seed=args.seed)
+    for name, count in rows.items():
+        print(f"Generated {count:,} rows for {name}")
+    print(f"Data saved to {args.output_dir} in {time.perf_counter() - started:.1f}s")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-dir", type=Path, default=DATA_DIR)
+    scale = parser.add_argument_group("scale (any of these generates a synthetic dataset)")
+    scale.add_argument("--clients", type=int)
+    scale.add_argument("--invoices-per-month", type=float, help="mean invoices per month over all clients")
+    scale.add_argument("--years", type=int)
+    scale.add_argument("--line-items-per-invoice", type=float, help="mean line items per invoice (at least 1 each)")
+    scale.add_argument("--start-year", type=int, default=2024)
+    scale.add_argument("--format", choices=("excel", "csv", "parquet"), default="parquet")
+    scale.add_argument("--chunk-rows", type=int, default=1_000_000, help="line items generated and written at once")
+    scale.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def main():
+    """Generate the sample data, or a scaled synthetic dataset when scale options are given."""
+    args = parse_args()
+    scale_options = ("clients", "invoices_per_month", "years", "line_items_per_invoice")
+    if all(getattr(args, option) is None for option in scale_options):
+        generate_sample(args.output_dir)
+        return
+
+    defaults = {"clients": 1_000, "invoices_per_month": 1_000.0, "years": 1, "line_items_per_invoice": 3.0}
+    for option, default in defaults.items():
+        if getattr(args, option) is None:
+            setattr(args, option, default)
+    generate_scaled(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+"""Render small query results as answers without an LLM call."""
+
+import numbers
+import re
+
+import numpy as np
+import pandas as pd
+
+# Results larger than this are summarized by the LLM instead
+MAX_DIRECT_ROWS = 15
+MAX_DIRECT_COLUMNS = 6
+
+# Column or question words suggesting monetary values
+CURRENCY_HINTS = ("amount", "billed", "billing", "total", "price", "revenue", "cost", "subtotal", "spend", "paid")
+
+# Questions asking for interpretation rather than numbers always go to the LLM
+NARRATIVE_PATTERN = re.compile(
+    r"\b(why|explain|describe|summari[sz]e|compare|comparison|trend|insight|analy[sz]e|recommend|should)\b",
+    re.IGNORECASE,
+)
+
+
+def format_direct_answer(question: str, result: object) -> str | None:
+    """Format a result directly when it is small enough to need no phrasing.
+
+    Returns None when the question asks for interpretation or the result is
+    too large or too unusual, in which case the caller should use the LLM.
+    """
+    if NARRATIVE_PATTERN.search(question):
+        return None
+
+    if result is None:
+        return "The query returned no data."
+
+    if isinstance(result, pd.DataFrame):
+        if len(result) == 0:
+            return "No matching records were found."
+        if len(result) == 1 and len(result.columns) == 1:
+            return _scalar_answer(question, result.iat[0, 0], str(result.columns[0]))
+        if len(result) > MAX_DIRECT_ROWS or len(result.columns) > MAX_DIRECT_COLUMNS:
+            return None
+        return _table_answer(result.reset_index(drop=_has_unnamed_index(result)), len(result))
+
+    if isinstance(result, pd.Series):
+        if len(result) == 0:
+            return "No matching records were found."
+        if len(result) > MAX_DIRECT_ROWS:
+            return None
+        name = result.name if result.name is not None and result.name not in result.index.names else "value"
+        frame = result.rename(name).to_frame()
+        return _table_answer(frame.reset_index(drop=_has_unnamed_index(result)), len(result))
+
+    if _is_scalar(result):
+        return _scalar_answer(question, result, "")
+
+    return None
+
+
+def format_value(value: object, column: str = "", currency: bool = False) -> str:
+    """Format a single value for display."""
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return "-"
+    if isinstance(value, pd.Timestamp | np.datetime64):
+        timestamp = pd.Timestamp(value)
+        return timestamp.strftime("%Y-%m-%d") if timestamp == timestamp.normalize() else str(timestamp)
+    if isinstance(value, bool | np.bool_):
+        return "Yes" if value else "No"
+    if isinstance(value, numbers.Integral):
+        return f"{int(value):,}"
+    if isinstance(value, numbers.Real):
+        if currency or _is_currency(column):
+            return f"{float(value):,.2f}"
+        if float(value).is_integer():
+            return f"{int(value):,}"
+        return f"{float(value):,.4g}" if abs(float(value)) < 1 else f"{float(value):,.2f}"
+    return str(value)
+
+
+def _scalar_answer(question: str, value: object, column: str) -> str:
+    """Phrase a single value according to what the question asks for."""
+    lowered = question.lower()
+    currency = _is_currency(column) or _is_currency(lowered)
+    formatted = format_value(value, column, currency=currency and not _is_count(lowered))
+
+    if _is_count(lowered):
+        label = "Count"
+    elif any(word in lowered for word in ("total", "sum", "billed", "amount")):
+        label = "Total"
+    elif any(word in lowered for word in ("average", "mean")):
+        label = "Average"
+    else:
+        label = "Result"
+    return f"{label}: **{formatted}**"
+
+
+def _table_answer(df: pd.DataFrame, rows: int) -> str:
+    """Render a small DataFrame as a markdown table."""
+    columns = [str(col) for col in df.columns]
+    lines = [
+        "| " + " | ".join(_escape(col) for col in columns) + " |",
+        "| " + " | ".join("---:" if pd.api.types.is_numeric_dtype(df[col]) else "---" for col in df.columns) + " |",
+    ]
+    for row in df.itertuples(index=False):
+        cells = [_escape(format_value(value, column)) for value, column in zip(row, columns, strict=True)]
+        lines.append("| " + " | ".join(cells) + " |")
+
+    noun = "row" if rows == 1 else "rows"
+    return f"Found {rows} {noun}:\n\n" + "\n".join(lines)
+
+
+def _has_unnamed_index(data: pd.DataFrame | pd.Series) -> bool:
+    """Check whether the index is a positional row label worth hiding."""
+    return data.index.nlevels == 1 and data.index.name is None
+
+
+def _is_scalar(value: object) -> bool:
+    return isinstance(value, str | numbers.Number | np.generic | pd.Timestamp)
+
+
+def _is_currency(text: str) -> bool:
+    text = text.lower()
+    return any(hint in text for hint in CURRENCY_HINTS)
+
+
+def _is_count(text: str) -> bool:
+    return bool(re.search(r"\b(how many|count|number of)\b", text))
+
+
+def _escape(text: str) -> str:
+    """Escape characters that would break a markdown table cell."""
+    return text.replace("|", "\\|").replace("\n", " ")
@@ -1,34 +1,61 @@
 """Generate natural language answers from query results."""
 
+from collections.abc import Iterator
+
 import anthropic
 import pandas as pd
 
 from .common.llm_constants import DEFAULT_MODEL, MAX_TOKENS
 from .common.prompt_templates import ANSWER_GENERATION_PROMPT
+from .tracing import record_usage
 
 
 class AnswerGenerator:
     """Generate natural language answers from query results."""
 
-    def __init__(self, api_key: str | None = None, model: str = DEFAULT_MODEL):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str = DEFAULT_MODEL,
+        client: anthropic.Anthropic | None = None,
+        async_client: anthropic.AsyncAnthropic | None = None,
+    ):
+        self.client = client or anthropic.Anthropic(api_key=api_key)
+        self.async_client = async_client
         self.model = model
 
     def generate(self, question: str, result: object, code: str) -> str:
         """Generate a natural language answer from the query result."""
-        # Format the result for the prompt
-        data_str = self._format_result(result)
+        message = self.client.messages.create(**self._request(question, result))
+        record_usage(message.usage)
 
-        prompt = ANSWER_GENERATION_PROMPT.format(data=data_str, question=question)
-
-        message = self.client.messages.create(
-            model=self.model,
-            max_tokens=MAX_TOKENS,
-            messages=[{"role": "user", "content": prompt}],
-        )
+        return message.content[0].text.strip()
 
+    async def agenerate(self, question: str, result: object, code: str) -> str:
+        """Generate a natural language answer using the async client."""
+        if self.async_client is None:
+            raise RuntimeError("AnswerGenerator was created without an async client")
+        message = await self.async_client.messages.create(**self._request(question, result))
+        record_usage(message.usage)
         return message.content[0].text.strip()
 
+    def generate_stream(self, question: str, result: object, code: str) -> Iterator[str]:
+        """Generate the answer, yielding text chunks as the model produces them."""
+        with self.client.messages.stream(**self._request(question, result)) as stream:
+            yield from stream.text_stream
+            record_usage(stream.get_final_message().usage)
+
+    def _request(self, question: str, result: object) -> dict:
+        """Build the Messages API request for a question and its query result."""
+        # Format the result for the prompt
+        data_str = self._format_result(result)
+        prompt = ANSWER_GENERATION_PROMPT.format(data=data_str, question=question)
+        return {
+            "model": self.model,
+            "max_tokens": MAX_TOKENS,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+
     def _format_result(self, result: object) -> str:
         """Format the result for display in the prompt."""
         if result is None:
@@ -0,0 +1,183 @@
+"""Async chat orchestration for serving many concurrent questions."""
+
+import asyncio
+import weakref
+from pathlib import Path
+
+import anthropic
+import httpx
+import pandas as pd
+
+from .chat import ChatPipeline, ChatResponse
+from .common.llm_constants import DEFAULT_MODEL
+from .repair import repair_feedback
+from .result_cache import ResultCache
+from .schema_profile import ProfileStore
+from .table_store import SharedTableStore
+from .tracing import Trace, result_rows
+
+
+class AsyncChatPipeline(ChatPipeline):
+    """RAG pipeline whose `ask` is a coroutine.
+
+    Both LLM stages share one `AsyncAnthropic` client and its HTTP connection
+    pool, so many `ask` coroutines can run on one event loop without a thread
+    per request. Generated code still runs synchronously, offloaded to the
+    default thread pool so it never blocks the loop.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path | str | None = None,
+        dataframes: dict[str, pd.DataFrame] | None = None,
+        api_key: str | None = None,
+        model: str = DEFAULT_MODEL,
+        table_store: SharedTableStore | None = None,
+        result_cache: ResultCache | None = None,
+        reuse_similar_questions: bool = False,
+        sandbox_workers: int = 0,
+        direct_answers: bool = False,
+        profile_store: ProfileStore | None = None,
+        optimize_dtypes: bool = False,
+        materialized_views: bool = False,
+        key_indexes: bool = False,
+        derived_tables_max_rows: int = 0,
+        engine: str = "pandas",
+        max_concurrency: int = 32,
+        max_connections: int = 64,
+        async_client: anthropic.AsyncAnthropic | None = None,
+    ):
+        super().__init__(
+            data_dir=data_dir,
+            dataframes=dataframes,
+            api_key=api_key,
+            model=model,
+            table_store=table_store,
+            result_cache=result_cache,
+            reuse_similar_questions=reuse_similar_questions,
+            sandbox_workers=sandbox_workers,
+            direct_answers=direct_answers,
+            profile_store=profile_store,
+            optimize_dtypes=optimize_dtypes,
+            materialized_views=materialized_views,
+            key_indexes=key_indexes,
+            derived_tables_max_rows=derived_tables_max_rows,
+            engine=engine,
+        )
+        self.async_client = async_client or anthropic.AsyncAnthropic(
+            api_key=api_key,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            ),
+        )
+        self.code_generator.async_client = self.async_client
+        self.answer_generator.async_client = self.async_client
+        self.max_concurrency = max_concurrency
+        # One semaphore per event loop, created inside it (a semaphore is bound to the loop that first waits on it)
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def ask(self, question: str, max_retries: int = 2) -> ChatResponse:  # type: ignore[override]
+        """Process a question through the RAG pipeline without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphores[loop]:
+            trace = Trace("ask")
+            try:
+                response = await self._ask(question, max_retries, trace)
+            except BaseException:
+                trace.finish(success=False)
+                raise
+            trace.finish(success=response.success, cached=response.cached)
+            response.timings = trace.timings()
+            response.tokens = trace.tokens()
+            return response
+
+    async def _ask(self, question: str, max_retries: int, trace: Trace) -> ChatResponse:
+        with trace.span("result_cache") as span:
+            cache_key, cached = self._lookup_cache(question)
+            span.set(hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        last_error = None
+
+        # Reuse the code of a paraphrased earlier question when it still runs
+        if self.question_index is not None:
+            with trace.span("question_index") as span:
+                match = self.question_index.lookup(question)
+                reused_result = None
+                if match is not None:
+                    reused_result = await asyncio.to_thread(self.executor.execute, match.code)
+                span.set(hit=reused_result is not None and reused_result.success)
+            if reused_result is not None and reused_result.success:
+                try:
+                    with trace.span("answer"):
+                        answer = await self._agenerate_answer(question, reused_result.result, match.code)
+                    return self._success_response(question, match.code, reused_result, answer, cache_key)
+                except Exception as e:
+                    # Phrasing the reused answer failed; generate code as for a new question
+                    last_error = str(e)
+
+        # Only describe the tables relevant to the question on large datasets
+        with trace.span("schema"):
+            schema = self.schema_retriever.schema_for(question)
+        code = ""
+        exec_result = None
+        attempts = []
+
+        for attempt in range(max_retries + 1):
+            with trace.span("attempt", attempt=attempt, success=False) as attempt_span:
+                try:
+                    # Step 1: Generate code, or repair the last failed attempt
+                    with trace.span("generate_code"):
+                        if attempts:
+                            code = await self.code_generator.agenerate(question, schema, attempts)
+                        else:
+                            code = await self.code_generator.agenerate(question, schema)
+                        # Fix misspelled columns and table names locally rather than with another request
+                        code = self.executor.fix_code(code)
+
+                    # Step 2: Execute code off the event loop
+                    with trace.span("execute") as span:
+                        exec_result = await asyncio.to_thread(self.executor.execute, code)
+                        span.set(success=exec_result.success, rows=result_rows(exec_result.result))
+
+                    if not exec_result.success:
+                        last_error = exec_result.error
+                        attempts.append((code, repair_feedback(exec_result, self.executor.dataframes)))
+                        continue
+                    attempt_span.set(success=True)
+
+                except Exception as e:
+                    last_error = str(e)
+                    continue
+
+            # Step 3: Generate natural language answer
+            if self.question_index is not None:
+                self.question_index.add(question, code)
+            try:
+                with trace.span("answer"):
+                    answer = await self._agenerate_answer(question, exec_result.result, code)
+            except Exception as e:
+                # Like the synchronous pipeline, a failed answer request is retried with new code
+                last_error = str(e)
+                continue
+            return self._success_response(question, code, exec_result, answer, cache_key)
+
+        # All retries failed
+        return self._failure_response(last_error, code, exec_result)
+
+    async def _agenerate_answer(self, question: str, result: object, code: str) -> str:
+        """Phrase the answer, rendering small results without an LLM call."""
+        answer = self._direct_answer(question, result)
+        if answer is None:
+            answer = await self.answer_generator.agenerate(question, result, code)
+        return answer
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP connection pool and any sandbox workers."""
+        await self.async_client.close()
+        self.close()
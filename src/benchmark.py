@@ -0,0 +1,258 @@
+"""Offline benchmarks of the chat pipeline against recorded model responses."""
+
+import json
+import platform
+import re
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from .chat import ChatPipeline
+from .dtype_optimizer import memory_usage
+
+_QUESTION = re.compile(r"# Question\n(.*?)\n\n# (?:Code|SQL)\n", re.DOTALL)
+_ANSWER_QUESTION = re.compile(r'Answer this question in natural language: "(.*)"')
+
+
+def load_corpus(path: Path | str) -> list[dict]:
+    """Load recorded questions: each has a question, code per language and an answer."""
+    return json.loads(Path(path).read_text())
+
+
+class ReplayClient:
+    """Deterministic stand-in for `anthropic.Anthropic` that replays recorded responses.
+
+    Code generation requests get the recorded code for the question in the
+    request's language ("python", "polars" or "sql"); answer requests get the
+    recorded answer. Token usage is estimated at four characters per token,
+    with the system prompt counted as a prompt-cache read. `latency` adds a
+    fixed delay per request to stand in for the network.
+    """
+
+    def __init__(self, corpus: list[dict], latency: float = 0.0):
+        self.recordings = {entry["question"]: entry for entry in corpus}
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **request) -> SimpleNamespace:
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        prompt = request["messages"][0]["content"]
+        system = "".join(block["text"] for block in request.get("system", []))
+        text = self._reply(prompt, system)
+        conversation = "".join(message["content"] for message in request["messages"])
+        usage = SimpleNamespace(
+            input_tokens=len(conversation) // 4,
+            output_tokens=len(text) // 4,
+            cache_read_input_tokens=len(system) // 4,
+            cache_creation_input_tokens=0,
+        )
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=usage)
+
+    def _reply(self, prompt: str, system: str) -> str:
+        match = _QUESTION.search(prompt)
+        if match is not None:
+            language = "sql" if prompt.rstrip().endswith("```sql") else "polars" if "Polars" in system else "python"
+            code = self._recording(match.group(1))[language]
+            return f"```{'sql' if language == 'sql' else 'python'}\n{code}\n```"
+
+        match = _ANSWER_QUESTION.search(prompt)
+        if match is not None:
+            return self._recording(match.group(1))["answer"]
+        raise LookupError("Request is neither code generation nor answer generation")
+
+    def _recording(self, question: str) -> dict:
+        if question not in self.recordings:
+            raise LookupError(f"No recorded response for question: {question!r}")
+        return self.recordings[question]
+
+
+@dataclass
+class QuestionStats:
+    """Latency of one question over the repeated runs."""
+
+    question: str
+    runs: int
+    failures: int
+    p50: float
+    p95: float
+    mean: float
+    stages: dict[str, float]  # Mean seconds per stage
+    tokens: dict[str, int]  # Tokens of one run
+
+
+@dataclass
+class BenchmarkReport:
+    """Machine-readable benchmark results, comparable between commits."""
+
+    metadata: dict
+    load_seconds: float
+    table_bytes: int
+    peak_rss_bytes: int
+    latency: dict[str, float]  # End-to-end p50/p95/mean over every run
+    stages: dict[str, float]  # Mean seconds per stage over every run
+    throughput: dict[str, float] = field(default_factory=dict)
+    questions: list[QuestionStats] = field(default_factory=list)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=2)
+
+
+def run_benchmark(
+    corpus: list[dict],
+    data_dir: Path | str,
+    repeats: int = 5,
+    concurrency: int = 4,
+    latency: float = 0.0,
+    **pipeline_options,
+) -> BenchmarkReport:
+    """Replay the corpus through a ChatPipeline and measure it.
+
+    Every question runs `repeats` times one at a time for latency, then the
+    whole corpus runs `repeats` times on `concurrency` threads for
+    throughput. Result caching and question reuse stay off so every run
+    executes; other options are passed to ChatPipeline.
+    """
+    client = ReplayClient(corpus, latency=latency)
+    started = time.perf_counter()
+    pipeline = ChatPipeline(data_dir=data_dir, client=client, **pipeline_options)
+    load_seconds = time.perf_counter() - started
+
+    try:
+        measured = [_measure_question(pipeline, entry["question"], repeats) for entry in corpus]
+        throughput = _measure_throughput(pipeline, [entry["question"] for entry in corpus] * repeats, concurrency)
+    finally:
+        pipeline.close()
+
+    latencies = [seconds for _, runs, _ in measured for seconds in runs]
+    stage_runs = [stages for _, _, runs in measured for stages in runs]
+    return BenchmarkReport(
+        metadata=_metadata(data_dir, repeats, concurrency, latency, client.requests, pipeline_options),
+        load_seconds=load_seconds,
+        table_bytes=sum(memory_usage(df) for df in pipeline.dataframes.values()),
+        peak_rss_bytes=_peak_rss(),
+        latency=_summary(latencies),
+        stages=_mean_stages(stage_runs),
+        throughput=throughput,
+        questions=[stats for stats, _, _ in measured],
+    )
+
+
+def compare_reports(baseline: dict, current: dict) -> list[str]:
+    """Describe changes in the headline metrics between two JSON reports."""
+    lines = []
+    metrics = [
+        ("latency p50", ("latency", "p50")),
+        ("latency p95", ("latency", "p95")),
+        ("throughput", ("throughput", "questions_per_second")),
+        ("load", ("load_seconds",)),
+        ("table bytes", ("table_bytes",)),
+        ("peak rss", ("peak_rss_bytes",)),
+    ]
+    for label, keys in metrics:
+        before, after = baseline, current
+        for key in keys:
+            before, after = before.get(key, {}), after.get(key, {})
+        if isinstance(before, int | float) and isinstance(after, int | float) and before:
+            lines.append(f"{label}: {before:.4g} -> {after:.4g} ({(after - before) / before:+.1%})")
+    return lines
+
+
+def _measure_question(
+    pipeline: ChatPipeline, question: str, repeats: int
+) -> tuple[QuestionStats, list[float], list[dict[str, float]]]:
+    """Ask a question `repeats` times; return its stats plus the raw latencies and stage timings."""
+    latencies, stages, failures = [], [], 0
+    tokens: dict[str, int] = {}
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = pipeline.ask(question)
+        latencies.append(time.perf_counter() - started)
+        stages.append(response.timings)
+        tokens = response.tokens
+        failures += not response.success
+    stats = QuestionStats(
+        question=question,
+        runs=repeats,
+        failures=failures,
+        **_summary(latencies),
+        stages=_mean_stages(stages),
+        tokens=tokens,
+    )
+    return stats, latencies, stages
+
+
+def _measure_throughput(pipeline: ChatPipeline, questions: list[str], concurrency: int) -> dict[str, float]:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        responses = list(pool.map(pipeline.ask, questions))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "questions": len(questions),
+        "failures": sum(not response.success for response in responses),
+        "seconds": elapsed,
+        "questions_per_second": len(questions) / elapsed if elapsed else 0.0,
+    }
+
+
+def _summary(latencies: list[float]) -> dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "p50": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "mean": statistics.fmean(ordered),
+    }
+
+
+def _mean_stages(runs: list[dict[str, float]]) -> dict[str, float]:
+    stages = {stage for run in runs for stage in run}
+    return {stage: sum(run.get(stage, 0.0) for run in runs) / len(runs) for stage in sorted(stages)}
+
+
+def _peak_rss() -> int:
+    """Peak resident memory of this process in bytes (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def _metadata(
+    data_dir: Path | str, repeats: int, concurrency: int, latency: float, requests: int, options: dict
+) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "data_dir": str(data_dir),
+        "repeats": repeats,
+        "concurrency": concurrency,
+        "simulated_latency": latency,
+        "llm_requests": requests,
+        "options": options,
+    }
@@ -1,16 +1,33 @@
 """Main chat orchestration for the RAG pipeline."""
 
-from dataclasses import dataclass
+from collections.abc import Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 
+import anthropic
 import pandas as pd
 
+from .answer_formatter import format_direct_answer
 from .answer_generator import AnswerGenerator
-from .code_generator import CodeGenerator
+from .code_generator import CodeGenerator, PromptCacheStats
 from .common.llm_constants import DEFAULT_MODEL
 from .data_loader import DataLoader
+from .dtype_optimizer import MemoryReport, optimize_dataframes
 from .executor import ExecutionResult, SafeCodeExecutor
+from .fingerprint import combine_fingerprints, fingerprint_dataframe
+from .indexes import build_indexes
+from .polars_executor import PolarsExecutor
+from .question_index import QuestionIndex
+from .repair import repair_feedback
+from .result_cache import ResultCache
+from .sandbox import SandboxedExecutor
 from .schema import generate_full_schema
+from .schema_profile import ProfileStore
+from .schema_retriever import SchemaRetriever
+from .sql_executor import SQLExecutor
+from .table_store import SharedTableStore
+from .tracing import Trace, result_rows
+from .views import build_views
 
 
 @dataclass
@@ -22,6 +39,20 @@ class ChatResponse:
     execution_result: ExecutionResult
     success: bool
     error: str | None = None
+    cached: bool = False
+    timings: dict[str, float] = field(default_factory=dict)  # Seconds per stage and "total"
+    tokens: dict[str, int] = field(default_factory=dict)  # Anthropic token usage for this request
+
+
+@dataclass
+class ChatEvent:
+    """Progress event emitted by ChatPipeline.ask_stream."""
+
+    type: str  # "code", "execution", "answer_delta" or "done"
+    text: str = ""
+    code: str = ""
+    execution_result: ExecutionResult | None = None
+    response: ChatResponse | None = None
 
 
 class ChatPipeline:
@@ -33,69 +64,320 @@ class ChatPipeline:
         dataframes: dict[str, pd.DataFrame] | None = None,
         api_key: str | None = None,
         model: str = DEFAULT_MODEL,
+        table_store: SharedTableStore | None = None,
+        result_cache: ResultCache | None = None,
+        reuse_similar_questions: bool = False,
+        sandbox_workers: int = 0,
+        client: anthropic.Anthropic | None = None,
+        direct_answers: bool = False,
+        profile_store: ProfileStore | None = None,
+        optimize_dtypes: bool = False,
+        materialized_views: bool = False,
+        key_indexes: bool = False,
+        derived_tables_max_rows: int = 0,
+        engine: str = "pandas",
     ):
+        if engine not in ("pandas", "polars", "sql"):
+            raise ValueError(f"Unknown engine '{engine}', expected 'pandas', 'polars' or 'sql'")
+
         # Load dataframes either from directory or use provided ones
+        # Per-table fingerprints key the shared store, the answer cache and the
+        # stored column profiles; they are computed at most once per table
+        self.memory_report: dict[str, MemoryReport] = {}
         if dataframes is not None:
-            self.dataframes = dataframes
+            if optimize_dtypes:
+                dataframes, self.memory_report = optimize_dataframes(dataframes)
+            if table_store is not None or result_cache is not None or profile_store is not None:
+                table_keys = {name: fingerprint_dataframe(df) for name, df in dataframes.items()}
+            else:
+                table_keys = {}
+            self.dataframes = table_store.share(dataframes, table_keys) if table_store is not None else dataframes
         elif data_dir is not None:
             self.data_dir = Path(data_dir)
-            self.data_loader = DataLoader(self.data_dir)
+            self.data_loader = DataLoader(self.data_dir, table_store=table_store, optimize_dtypes=optimize_dtypes)
             self.dataframes = self.data_loader.load_all()
+            self.memory_report = self.data_loader.memory_report
+            # The loader keys tables by their source files, which costs no pass over the rows
+            table_keys = self.data_loader.table_keys
         else:
             raise ValueError("Either data_dir or dataframes must be provided")
 
         # Initialize components
-        self.schema = generate_full_schema(self.dataframes)
-        self.code_generator = CodeGenerator(api_key=api_key, model=model)
-        self.executor = SafeCodeExecutor(self.dataframes)
-        self.answer_generator = AnswerGenerator(api_key=api_key, model=model)
+        self.model = model
+        self.engine = engine
+        self.direct_answers = direct_answers
+        self.result_cache = result_cache
+        self.dataset_key = combine_fingerprints(table_keys) if result_cache is not None else ""
+        self.question_index = QuestionIndex.from_dataframes(self.dataframes) if reuse_similar_questions else None
+        self.profiles = (
+            {name: profile_store.get(name, df, key=table_keys[name]) for name, df in self.dataframes.items()}
+            if profile_store is not None
+            else None
+        )
+        # Views and indexes cost memory in proportion to the data, so large datasets go without
+        if derived_tables_max_rows and sum(len(df) for df in self.dataframes.values()) > derived_tables_max_rows:
+            materialized_views = key_indexes = False
+        # Pre-joined views are rebuilt from the current tables, so they follow data changes
+        self.views = build_views(self.dataframes) if materialized_views else {}
+        if self.views and table_store is not None:
+            self.views = table_store.share(self.views)
+        # Hash indexes and join maps on the key columns, built once for this dataset
+        # (pandas objects only, so the other engines go without them)
+        self.indexes = build_indexes(self.dataframes) if key_indexes and engine == "pandas" else []
+        self.schema = generate_full_schema(
+            self.dataframes,
+            profiles=self.profiles,
+            views=self.views,
+            indexes={index.name: index.description for index in self.indexes},
+            engine=engine,
+        )
+        self.schema_retriever = SchemaRetriever(
+            self.dataframes,
+            full_schema=self.schema,
+            profiles=self.profiles,
+            views=self.views,
+            indexes=self.indexes,
+            engine=engine,
+        )
+        # One client (and HTTP connection pool) serves both LLM stages
+        self.client = client or anthropic.Anthropic(api_key=api_key)
+        tables = {**self.dataframes, **self.views}
+        namespace = {**tables, **{index.name: index.value for index in self.indexes}}
+        if engine == "sql":
+            # Generate SQL and run it on an embedded database over the same tables
+            self.executor = SQLExecutor(namespace)
+            dialect = "DuckDB" if self.executor.backend == "duckdb" else "SQLite"
+            self.code_generator = CodeGenerator(model=model, client=self.client, language="sql", sql_dialect=dialect)
+        elif engine == "polars":
+            # Generate Polars code over lazy frames, collected with the query optimizer
+            self.executor = PolarsExecutor(namespace)
+            self.code_generator = CodeGenerator(model=model, client=self.client, language="polars")
+        else:
+            self.code_generator = CodeGenerator(model=model, client=self.client)
+            # Run generated code in resource-limited worker processes when requested
+            if sandbox_workers > 0:
+                # Workers rebuild the indexes over their mapped tables rather than receive copies
+                self.executor = SandboxedExecutor(
+                    tables,
+                    workers=sandbox_workers,
+                    table_store=table_store,
+                    indexes=self.indexes,
+                    table_keys=table_keys,
+                )
+            else:
+                self.executor = SafeCodeExecutor(namespace)
+        self.answer_generator = AnswerGenerator(model=model, client=self.client)
 
     def ask(self, question: str, max_retries: int = 2) -> ChatResponse:
         """Process a question through the RAG pipeline."""
+        for event in self._run(question, max_retries, stream=False):
+            if event.type == "done":
+                return event.response
+        raise RuntimeError("Pipeline finished without a response")
+
+    def ask_stream(self, question: str, max_retries: int = 2) -> Iterator[ChatEvent]:
+        """Process a question, yielding progress events and answer tokens as they arrive.
+
+        Yields "code" once code is generated, "execution" after each run,
+        "answer_delta" for every chunk of answer text and finally "done"
+        carrying the complete ChatResponse. Once answer text has been
+        yielded, a failure ends the request rather than retrying, so no
+        answer is streamed twice.
+        """
+        yield from self._run(question, max_retries, stream=True)
+
+    def _run(self, question: str, max_retries: int, stream: bool) -> Iterator[ChatEvent]:
+        """Run the pipeline, attaching the request's timings and token usage to its response."""
+        trace = Trace("ask")
+        try:
+            for event in self._run_stages(question, max_retries, stream, trace):
+                if event.type == "done":
+                    trace.finish(success=event.response.success, cached=event.response.cached)
+                    event.response.timings = trace.timings()
+                    event.response.tokens = trace.tokens()
+                yield event
+        finally:
+            trace.finish()
+
+    def _run_stages(self, question: str, max_retries: int, stream: bool, trace: Trace) -> Iterator[ChatEvent]:
+        """Run the pipeline, emitting events for each stage."""
+        with trace.span("result_cache") as span:
+            cache_key, cached = self._lookup_cache(question)
+            span.set(hit=cached is not None)
+        if cached is not None:
+            yield ChatEvent("done", response=cached)
+            return
+
         last_error = None
 
+        # Reuse the code of a paraphrased earlier question when it still runs
+        if self.question_index is not None:
+            with trace.span("question_index") as span:
+                match = self.question_index.lookup(question)
+                reused_result = self.executor.execute(match.code) if match is not None else None
+                span.set(hit=reused_result is not None and reused_result.success)
+            if reused_result is not None and reused_result.success:
+                yield ChatEvent("code", code=match.code)
+                yield ChatEvent("execution", execution_result=reused_result)
+                streamed = False
+                try:
+                    for event in self._respond(question, match.code, reused_result, cache_key, stream, trace):
+                        streamed = streamed or event.type == "answer_delta"
+                        yield event
+                    return
+                except Exception as e:
+                    # Phrasing the reused answer failed; generate code as for a new question
+                    last_error = str(e)
+                    if streamed:
+                        # Part of the answer was already shown, so a new one would repeat it
+                        yield ChatEvent("done", response=self._failure_response(last_error, match.code, reused_result))
+                        return
+
+        # Only describe the tables relevant to the question on large datasets
+        with trace.span("schema"):
+            schema = self.schema_retriever.schema_for(question)
+        # Failed (code, feedback) pairs; retries continue this conversation
+        attempts = []
+        streamed = False
+
         for attempt in range(max_retries + 1):
+            attempt_span = trace.start("attempt", attempt=attempt)
             try:
-                # Step 1: Generate code
-                if attempt == 0:
-                    code = self.code_generator.generate(question, self.schema)
-                else:
-                    # Include previous error in retry prompt
-                    error_context = f"\n\nPrevious attempt failed with error: {last_error}\nPlease fix the code."
-                    code = self.code_generator.generate(question + error_context, self.schema)
+                # Step 1: Generate code, or repair the last failed attempt
+                with trace.span("generate_code", parent=attempt_span):
+                    if attempts:
+                        code = self.code_generator.generate(question, schema, attempts)
+                    else:
+                        code = self.code_generator.generate(question, schema)
+                    # Fix misspelled columns and table names locally rather than with another request
+                    code = self.executor.fix_code(code)
+                yield ChatEvent("code", code=code)
 
                 # Step 2: Execute code
-                exec_result = self.executor.execute(code)
+                with trace.span("execute", parent=attempt_span) as span:
+                    exec_result = self.executor.execute(code)
+                    span.set(success=exec_result.success, rows=result_rows(exec_result.result))
+                yield ChatEvent("execution", execution_result=exec_result)
 
                 if not exec_result.success:
                     last_error = exec_result.error
+                    attempts.append((code, repair_feedback(exec_result, self.executor.dataframes)))
+                    trace.end(attempt_span, success=False)
                     continue
+                trace.end(attempt_span, success=True)
 
                 # Step 3: Generate natural language answer
-                answer = self.answer_generator.generate(question, exec_result.result, code)
-
-                return ChatResponse(
-                    answer=answer,
-                    generated_code=code,
-                    execution_result=exec_result,
-                    success=True,
-                )
+                if self.question_index is not None:
+                    self.question_index.add(question, code)
+                for event in self._respond(question, code, exec_result, cache_key, stream, trace):
+                    streamed = streamed or event.type == "answer_delta"
+                    yield event
+                return
 
             except Exception as e:
                 last_error = str(e)
+                trace.end(attempt_span, success=False)
+                if streamed:
+                    # Part of the answer was already shown, so a new one would repeat it
+                    break
                 continue
 
         # All retries failed
+        response = self._failure_response(
+            last_error, code if "code" in locals() else "", exec_result if "exec_result" in locals() else None
+        )
+        yield ChatEvent("done", response=response)
+
+    def _respond(
+        self,
+        question: str,
+        code: str,
+        exec_result: ExecutionResult,
+        cache_key: str | None,
+        stream: bool,
+        trace: Trace,
+    ) -> Iterator[ChatEvent]:
+        """Phrase the answer for a successful execution and cache it."""
+        answer = self._direct_answer(question, exec_result.result)
+        if answer is not None:
+            if stream:
+                yield ChatEvent("answer_delta", text=answer)
+        elif stream:
+            parts = []
+            # The span stays open while tokens are yielded, so it is ended explicitly
+            span = trace.start("answer")
+            chunks = self.answer_generator.generate_stream(question, exec_result.result, code)
+            for text in trace.iterate(span, chunks):
+                parts.append(text)
+                yield ChatEvent("answer_delta", text=text)
+            trace.end(span)
+            answer = "".join(parts).strip()
+        else:
+            with trace.span("answer"):
+                answer = self.answer_generator.generate(question, exec_result.result, code)
+
+        yield ChatEvent("done", response=self._success_response(question, code, exec_result, answer, cache_key))
+
+    def _direct_answer(self, question: str, result: object) -> str | None:
+        """Render small results deterministically, skipping the answer LLM call."""
+        if not self.direct_answers:
+            return None
+        return format_direct_answer(question, result)
+
+    def _lookup_cache(self, question: str) -> tuple[str | None, ChatResponse | None]:
+        """Return the question's cache key and its cached response, if any."""
+        if self.result_cache is None:
+            return None, None
+
+        cache_key = ResultCache.make_key(question, self.model, self.dataset_key, self.engine)
+        cached = self.result_cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+
+        response = ChatResponse(
+            answer=cached.answer,
+            generated_code=cached.code,
+            execution_result=ExecutionResult(success=True, result=cached.result, code=cached.code),
+            success=True,
+            cached=True,
+        )
+        return cache_key, response
+
+    def _success_response(
+        self, question: str, code: str, exec_result: ExecutionResult, answer: str, cache_key: str | None
+    ) -> ChatResponse:
+        """Cache a successful answer and wrap it in a ChatResponse."""
+        if cache_key is not None:
+            self.result_cache.put(cache_key, question, code, exec_result.result, answer)
+
+        return ChatResponse(
+            answer=answer,
+            generated_code=code,
+            execution_result=exec_result,
+            success=True,
+        )
+
+    @staticmethod
+    def _failure_response(last_error: str | None, code: str, exec_result: ExecutionResult | None) -> ChatResponse:
+        """Build the response returned once every attempt has failed."""
         return ChatResponse(
             answer=f"I wasn't able to answer that question. Error: {last_error}",
-            generated_code=code if "code" in locals() else "",
-            execution_result=exec_result
-            if "exec_result" in locals()
-            else ExecutionResult(success=False, error=last_error),
+            generated_code=code,
+            execution_result=exec_result or ExecutionResult(success=False, error=last_error),
             success=False,
             error=last_error,
         )
 
+    def close(self) -> None:
+        """Release sandbox worker processes or the SQL database, if any."""
+        if isinstance(self.executor, SandboxedExecutor | SQLExecutor):
+            self.executor.close()
+
+    @property
+    def prompt_cache_stats(self) -> PromptCacheStats:
+        """Prompt-cache hit/miss counters for code generation."""
+        return self.code_generator.cache_stats
+
     def get_schema(self) -> str:
         """Get the database schema description."""
         return self.schema
@@ -1,27 +1,95 @@
 """Generate pandas code using Claude LLM."""
 
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
 import anthropic
 
 from .common.llm_constants import DEFAULT_MODEL, MAX_TOKENS
-from .common.prompt_templates import CODE_GENERATION_PROMPT
+from .common.prompt_templates import (
+    CODE_GENERATION_INSTRUCTIONS,
+    CODE_GENERATION_QUESTION,
+    CODE_REPAIR_PROMPT,
+    POLARS_GENERATION_INSTRUCTIONS,
+    SQL_GENERATION_INSTRUCTIONS,
+    SQL_GENERATION_QUESTION,
+)
+from .tracing import record_usage
+
+
+@dataclass
+class PromptCacheStats:
+    """Prompt-cache hit/miss counters for monitoring."""
+
+    requests: int = 0
+    hits: int = 0
+    misses: int = 0
+    cache_read_tokens: int = 0
+    cache_creation_tokens: int = 0
+    uncached_input_tokens: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, usage) -> None:
+        """Record the token usage reported for one request."""
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_creation = getattr(usage, "cache_creation_input_tokens", None) or 0
+        with self._lock:
+            self.requests += 1
+            if cache_read:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.cache_read_tokens += cache_read
+            self.cache_creation_tokens += cache_creation
+            self.uncached_input_tokens += getattr(usage, "input_tokens", None) or 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of requests that read the prefix from the cache."""
+        return self.hits / self.requests if self.requests else 0.0
 
 
 class CodeGenerator:
-    """Generate pandas code using Claude API."""
+    """Generate pandas code (or Polars code, or SQL) using Claude API."""
 
-    def __init__(self, api_key: str | None = None, model: str = DEFAULT_MODEL):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str = DEFAULT_MODEL,
+        client: anthropic.Anthropic | None = None,
+        async_client: anthropic.AsyncAnthropic | None = None,
+        language: str = "python",
+        sql_dialect: str = "DuckDB",
+    ):
+        self.client = client or anthropic.Anthropic(api_key=api_key)
+        self.async_client = async_client
         self.model = model
+        self.language = language
+        if language == "sql":
+            self.instructions = SQL_GENERATION_INSTRUCTIONS.format(dialect=sql_dialect)
+            self.question_template = SQL_GENERATION_QUESTION
+        elif language == "python":
+            self.instructions = CODE_GENERATION_INSTRUCTIONS
+            self.question_template = CODE_GENERATION_QUESTION
+        elif language == "polars":
+            self.instructions = POLARS_GENERATION_INSTRUCTIONS
+            self.question_template = CODE_GENERATION_QUESTION
+        else:
+            raise ValueError(f"Unsupported language '{language}'")
+        self.repair_template = CODE_REPAIR_PROMPT.replace("{language}", "sql" if language == "sql" else "python")
+        self.cache_stats = PromptCacheStats()
 
-    def generate(self, question: str, schema: str) -> str:
-        """Generate pandas code to answer the question."""
-        prompt = CODE_GENERATION_PROMPT.format(schema=schema, question=question)
+    def generate(self, question: str, schema: str, attempts: Sequence[tuple[str, str]] = ()) -> str:
+        """Generate pandas code to answer the question.
 
-        message = self.client.messages.create(
-            model=self.model,
-            max_tokens=MAX_TOKENS,
-            messages=[{"role": "user", "content": prompt}],
-        )
+        `attempts` holds (code, feedback) pairs for earlier failed attempts;
+        they are sent as a continuing conversation so the model repairs its
+        own code instead of starting over.
+        """
+        message = self.client.messages.create(**self._request(question, schema, attempts))
+        self.cache_stats.record(message.usage)
+        record_usage(message.usage)
 
         response_text = message.content[0].text
 
@@ -29,20 +97,65 @@ class CodeGenerator:
         code = self._extract_code(response_text)
         return code
 
+    async def agenerate(self, question: str, schema: str, attempts: Sequence[tuple[str, str]] = ()) -> str:
+        """Generate pandas code to answer the question using the async client."""
+        if self.async_client is None:
+            raise RuntimeError("CodeGenerator was created without an async client")
+        message = await self.async_client.messages.create(**self._request(question, schema, attempts))
+        self.cache_stats.record(message.usage)
+        record_usage(message.usage)
+        return self._extract_code(message.content[0].text)
+
+    def _request(self, question: str, schema: str, attempts: Sequence[tuple[str, str]] = ()) -> dict:
+        """Build the Messages API request for a question.
+
+        The instructions and schema go in the system prompt with cache
+        breakpoints, so repeated calls (including retries) against the same
+        dataset reuse the cached prefix and only the question is new input.
+        Each failed attempt adds the code as an assistant turn and its error
+        as a short user turn.
+        """
+        system = [
+            {"type": "text", "text": self.instructions, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": schema, "cache_control": {"type": "ephemeral"}},
+        ]
+        return {
+            "model": self.model,
+            "max_tokens": MAX_TOKENS,
+            "system": system,
+            "messages": self._messages(question, attempts),
+        }
+
+    def _messages(self, question: str, attempts: Sequence[tuple[str, str]]) -> list[dict]:
+        """Build the conversation: the question, then each failed attempt and its feedback."""
+        messages = [{"role": "user", "content": self.question_template.format(question=question)}]
+        for code, feedback in attempts:
+            # The prompt opened the code fence, so the reply continues inside it
+            messages.append({"role": "assistant", "content": f"{code}\n```"})
+            messages.append({"role": "user", "content": self.repair_template.format(feedback=feedback)})
+        return messages
+
     def _extract_code(self, text: str) -> str:
-        """Extract Python code from response text."""
+        """Extract Python code (or SQL) from response text."""
         # If response contains code blocks, extract the code
-        if "```python" in text:
-            start = text.find("```python") + len("```python")
+        fence = "```sql" if self.language == "sql" else "```python"
+        if fence in text:
+            start = text.find(fence) + len(fence)
             end = text.find("```", start)
-            if end != -1:
-                return text[start:end].strip()
+            # A reply cut off before the closing fence (e.g. at max_tokens) keeps its body
+            return text[start:end].strip() if end != -1 else text[start:].strip()
 
         if "```" in text:
-            start = text.find("```") + 3
-            end = text.find("```", start)
+            start = text.find("```")
+            end = text.find("```", start + 3)
             if end != -1:
-                return text[start:end].strip()
+                return text[start + 3 : end].strip()
+            if text[:start].strip():
+                # The prompt opens the fence, so the reply may only close it
+                return text[:start].strip()
+            # An opening fence that was never closed: drop its language tag and keep the body
+            tag, _, body = text[start + 3 :].partition("\n")
+            return body.strip() if not tag.strip() or tag.strip().isidentifier() else text[start + 3 :].strip()
 
         # Otherwise return the text as-is (assuming it's just code)
         return text.strip()
@@ -1,15 +1,48 @@
 """Common constants, templates, and configurations."""
 
-from .constants import ALLOWED_BUILTINS, DANGEROUS_ATTRIBUTES, DANGEROUS_FUNCTIONS
+from .constants import (
+    ALLOWED_BUILTINS,
+    DANGEROUS_ATTRIBUTES,
+    DANGEROUS_FUNCTIONS,
+    IO_ATTRIBUTE_PREFIXES,
+    SAMPLE_QUESTIONS,
+)
 from .llm_constants import DEFAULT_MODEL, MAX_TOKENS
-from .prompt_templates import ANSWER_GENERATION_PROMPT, CODE_GENERATION_PROMPT
+from .prompt_templates import (
+    ANSWER_GENERATION_PROMPT,
+    CODE_GENERATION_INSTRUCTIONS,
+    CODE_GENERATION_PROMPT,
+    CODE_GENERATION_QUESTION,
+    CODE_REPAIR_PROMPT,
+    POLARS_GENERATION_INSTRUCTIONS,
+    SQL_GENERATION_INSTRUCTIONS,
+    SQL_GENERATION_QUESTION,
+)
+from .sandbox_constants import (
+    SANDBOX_CPU_LIMIT_SECONDS,
+    SANDBOX_MEMORY_LIMIT_MB,
+    SANDBOX_TIMEOUT_SECONDS,
+    SANDBOX_WORKERS,
+)
 
 __all__ = [
     "ALLOWED_BUILTINS",
     "DANGEROUS_FUNCTIONS",
     "DANGEROUS_ATTRIBUTES",
+    "IO_ATTRIBUTE_PREFIXES",
+    "SAMPLE_QUESTIONS",
     "DEFAULT_MODEL",
     "MAX_TOKENS",
     "CODE_GENERATION_PROMPT",
+    "CODE_GENERATION_INSTRUCTIONS",
+    "CODE_GENERATION_QUESTION",
+    "CODE_REPAIR_PROMPT",
+    "POLARS_GENERATION_INSTRUCTIONS",
+    "SQL_GENERATION_INSTRUCTIONS",
+    "SQL_GENERATION_QUESTION",
     "ANSWER_GENERATION_PROMPT",
+    "SANDBOX_WORKERS",
+    "SANDBOX_TIMEOUT_SECONDS",
+    "SANDBOX_MEMORY_LIMIT_MB",
+    "SANDBOX_CPU_LIMIT_SECONDS",
 ]
@@ -28,3 +28,17 @@ DANGEROUS_FUNCTIONS = {"exec", "eval", "compile", "open", "__import__"}
 
 # Attributes that are not allowed to be accessed
 DANGEROUS_ATTRIBUTES = {"__class__", "__bases__", "__subclasses__", "__globals__"}
+
+# Attribute prefixes for file and network I/O in the Polars API (read_csv, scan_parquet, sink_ipc, ...)
+IO_ATTRIBUTE_PREFIXES = ("read_", "scan_", "write_", "sink_")
+
+# Questions offered in the app sidebar (the benchmark corpus records responses for each)
+SAMPLE_QUESTIONS = (
+    "List all clients with their industries",
+    "Which clients are based in the UK?",
+    "Invoices issued in March 2024",
+    "Which invoices are marked as 'Overdue'?",
+    "Count line items by service name",
+    "Total billed amount per client in 2024",
+    "Client with highest 2024 billing",
+)
@@ -1,12 +1,13 @@
 """Prompt templates for LLM interactions."""
 
-CODE_GENERATION_PROMPT = """You are a Python data analyst. Given a natural language question about business data, generate pandas code to answer it.
-
-{schema}
+# The code generation prompt is split so the static parts can be prompt-cached:
+# instructions and examples never change, the schema changes per dataset and
+# only the question suffix changes per request.
+CODE_GENERATION_INSTRUCTIONS = """You are a Python data analyst. Given a natural language question about business data, generate pandas code to answer it.
 
 # Instructions
 1. Write Python code using pandas to answer the question
-2. The DataFrames are already loaded and available as: clients_df, invoices_df, line_items_df
+2. The DataFrames described in the schema are already loaded under the names shown
 3. Store your final result in a variable called `result`
 4. Use pandas operations (merge, groupby, filter, etc.) as needed
 5. For date filtering, dates are already datetime objects
@@ -39,14 +40,110 @@ client_totals = merged_2024.groupby("client_id")["line_total"].sum().reset_index
 # Join with client names
 result = client_totals.merge(clients_df[["client_id", "name"]], on="client_id")
 ```
+"""
 
-# Question
+CODE_GENERATION_QUESTION = """# Question
 {question}
 
 # Code
 ```python
 """
 
+# Single-message form of the code generation prompt
+CODE_GENERATION_PROMPT = CODE_GENERATION_INSTRUCTIONS + "\n{schema}\n\n" + CODE_GENERATION_QUESTION
+
+# Polars variant for pipelines using the lazy Polars engine (same question suffix as pandas)
+POLARS_GENERATION_INSTRUCTIONS = """You are a Python data analyst. Given a natural language question about business data, generate Polars code to answer it.
+
+# Instructions
+1. Write Python code using the Polars lazy API (`pl`) to answer the question
+2. The tables described in the schema are already loaded as Polars LazyFrames under the names shown
+3. Store your final result in a variable called `result`; leave it lazy, it is collected for you
+4. Use join, group_by, filter, with_columns and pl.col expressions as needed
+5. For date filtering, dates are already datetime columns (use .dt.year(), .dt.month(), ...)
+6. Return ONLY executable Python code, no explanations
+7. Do NOT include imports, file reads or .collect() calls
+
+# Examples
+
+Question: "List all clients with their industries"
+```python
+result = clients_df.select("name", "industry")
+```
+
+Question: "Which clients are based in the UK?"
+```python
+result = clients_df.filter(pl.col("country") == "UK")
+```
+
+Question: "Total billed amount per client in 2024"
+```python
+result = (
+    line_items_df.join(invoices_df.select("invoice_id", "client_id", "invoice_date"), on="invoice_id")
+    .filter(pl.col("invoice_date").dt.year() == 2024)
+    .with_columns(line_total=pl.col("quantity") * pl.col("unit_price") * (1 + pl.col("tax_rate")))
+    .group_by("client_id")
+    .agg(pl.col("line_total").sum())
+    .join(clients_df.select("client_id", "name"), on="client_id")
+)
+```
+"""
+
+# SQL variant for pipelines using the SQL execution engine; {dialect} names the database
+SQL_GENERATION_INSTRUCTIONS = """You are a SQL data analyst. Given a natural language question about business data, write a {dialect} SQL query to answer it.
+
+# Instructions
+1. Write a single SELECT query (WITH clauses are allowed) that answers the question
+2. Query the tables described in the schema by the names and columns shown
+3. Use joins, GROUP BY, aggregates and window functions as needed
+4. Filter dates with range comparisons such as invoice_date >= '2024-01-01' AND invoice_date < '2025-01-01'
+5. Give computed columns readable aliases
+6. Return ONLY the SQL query, no explanations
+7. Do NOT modify data or create tables
+
+# Examples
+
+Question: "List all clients with their industries"
+```sql
+SELECT name, industry FROM clients_df
+```
+
+Question: "Which clients are based in the UK?"
+```sql
+SELECT * FROM clients_df WHERE country = 'UK'
+```
+
+Question: "Total billed amount per client in 2024"
+```sql
+SELECT c.client_id, c.name, SUM(li.quantity * li.unit_price * (1 + li.tax_rate)) AS total_billed
+FROM line_items_df li
+JOIN invoices_df i ON li.invoice_id = i.invoice_id
+JOIN clients_df c ON i.client_id = c.client_id
+WHERE i.invoice_date >= '2024-01-01' AND i.invoice_date < '2025-01-01'
+GROUP BY c.client_id, c.name
+```
+"""
+
+SQL_GENERATION_QUESTION = """# Question
+{question}
+
+# SQL
+```sql
+"""
+
+# Follow-up turn sent after generated code fails; the earlier question and code stay in
+# the conversation, so only the error and a hint are new. {language} opens the fence.
+CODE_REPAIR_PROMPT = """The code failed to run.
+
+# Error
+{feedback}
+
+Fix the code so it answers the question. Return the complete corrected code only.
+
+# Code
+```{language}
+"""
+
 ANSWER_GENERATION_PROMPT = """You are a helpful assistant answering questions about business data.
 
 Based on the following data retrieved from the database:
@@ -0,0 +1,9 @@
+"""Sandbox execution limits."""
+
+import config
+
+# Re-export from config
+SANDBOX_WORKERS = config.SANDBOX_WORKERS
+SANDBOX_TIMEOUT_SECONDS = config.SANDBOX_TIMEOUT_SECONDS
+SANDBOX_MEMORY_LIMIT_MB = config.SANDBOX_MEMORY_LIMIT_MB
+SANDBOX_CPU_LIMIT_SECONDS = config.SANDBOX_CPU_LIMIT_SECONDS
@@ -1,41 +1,121 @@
-"""Load Excel data files into pandas DataFrames."""
+"""Load Excel or CSV data files into pandas DataFrames."""
 
 from pathlib import Path
 
 import pandas as pd
 
+from .dtype_optimizer import MemoryReport, optimize_dataframes
+from .ingest import SheetTask, read_sheets
+from .snapshot import SnapshotCache, source_key
+from .streaming import DEFAULT_BATCH_SIZE, iter_batches, write_arrow_file
+from .table_store import SharedTableStore
+
 
 class DataLoader:
-    """Load and manage Excel data files."""
+    """Load and manage Excel (or CSV) data files."""
+
+    # Table name -> (workbook file, date columns to parse)
+    WORKBOOKS = {
+        "clients_df": ("Clients.xlsx", ()),
+        "invoices_df": ("Invoices.xlsx", ("invoice_date", "due_date")),
+        "line_items_df": ("InvoiceLineItems.xlsx", ()),
+    }
 
-    def __init__(self, data_dir: Path | str):
+    def __init__(
+        self,
+        data_dir: Path | str,
+        cache_dir: Path | str | None = None,
+        use_snapshots: bool = True,
+        table_store: SharedTableStore | None = None,
+        workers: int | None = None,
+        streaming: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        optimize_dtypes: bool = False,
+    ):
         self.data_dir = Path(data_dir)
+        self.table_store = table_store
+        # Parallel parse workers; None uses one per CPU core
+        self.workers = workers
+        # Stream sources into memory-mapped Arrow files instead of parsing them whole
+        self.streaming = streaming
+        self.batch_size = batch_size
+        # Convert tables to compact dtypes after loading; memory_report records the effect
+        self.optimize_dtypes = optimize_dtypes
+        self.memory_report: dict[str, MemoryReport] = {}
+        # Per-table keys from the source files' path, modification time and size,
+        # standing in for content fingerprints so loading never hashes the rows
+        self.table_keys: dict[str, str] = {}
         self._dataframes: dict[str, pd.DataFrame] = {}
 
+        # Parsed workbooks are snapshotted next to the data by default; streaming always needs them
+        use_snapshots = use_snapshots or streaming
+        self.snapshots = SnapshotCache(cache_dir or self.data_dir / ".cache") if use_snapshots else None
+
     def load_all(self) -> dict[str, pd.DataFrame]:
-        """Load all Excel files from the data directory."""
-        self._dataframes = {
-            "clients_df": self._load_clients(),
-            "invoices_df": self._load_invoices(),
-            "line_items_df": self._load_line_items(),
+        """Load all data files from the data directory.
+
+        Workbooks without a current snapshot are parsed in parallel worker processes.
+        In streaming mode each source is converted in bounded batches and the
+        tables are memory-mapped rather than held in memory.
+        """
+        paths = {name: self._source(filename) for name, (filename, _) in self.WORKBOOKS.items()}
+        variant = f"{'stream' if self.streaming else 'parse'}|{'optimized' if self.optimize_dtypes else 'raw'}"
+        self.table_keys = {
+            name: source_key(paths[name], f"{variant}|{','.join(parse_dates)}")
+            for name, (_, parse_dates) in self.WORKBOOKS.items()
+        }
+        if self.streaming:
+            return self._finish(
+                {
+                    name: self._load_streamed(paths[name], parse_dates)
+                    for name, (_, parse_dates) in self.WORKBOOKS.items()
+                }
+            )
+
+        dataframes: dict[str, pd.DataFrame | None] = {
+            name: self._snapshot(paths[name], parse_dates) for name, (_, parse_dates) in self.WORKBOOKS.items()
         }
+
+        missing = [name for name, df in dataframes.items() if df is None]
+        tasks = [SheetTask(paths[name], parse_dates=self.WORKBOOKS[name][1]) for name in missing]
+        for name, df in zip(missing, read_sheets(tasks, max_workers=self.workers), strict=True):
+            if self.snapshots is not None:
+                self.snapshots.put(paths[name], df, variant=",".join(self.WORKBOOKS[name][1]))
+            dataframes[name] = df
+
+        return self._finish(dataframes)
+
+    def _finish(self, dataframes: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+        if self.optimize_dtypes:
+            dataframes, self.memory_report = optimize_dataframes(dataframes)
+        self._dataframes = dataframes
+        if self.table_store is not None:
+            # Swap the private copies for the shared, memory-mapped tables
+            self._dataframes = self.table_store.share(self._dataframes, self.table_keys)
         return self._dataframes
 
-    def _load_clients(self) -> pd.DataFrame:
-        """Load clients data."""
-        path = self.data_dir / "Clients.xlsx"
-        return pd.read_excel(path)
-
-    def _load_invoices(self) -> pd.DataFrame:
-        """Load invoices data with proper date parsing."""
-        path = self.data_dir / "Invoices.xlsx"
-        df = pd.read_excel(path, parse_dates=["invoice_date", "due_date"])
-        return df
-
-    def _load_line_items(self) -> pd.DataFrame:
-        """Load invoice line items data."""
-        path = self.data_dir / "InvoiceLineItems.xlsx"
-        return pd.read_excel(path)
+    def _source(self, filename: str) -> Path:
+        """Return the workbook, or a Parquet or CSV file of the same name when there is no workbook."""
+        path = self.data_dir / filename
+        if not path.exists():
+            for suffix in (".parquet", ".csv"):
+                if path.with_suffix(suffix).exists():
+                    return path.with_suffix(suffix)
+        return path
+
+    def _load_streamed(self, path: Path, parse_dates: tuple[str, ...]) -> pd.DataFrame:
+        """Convert a source to an Arrow snapshot batch by batch and memory-map it."""
+        return self.snapshots.load_mapped(
+            path,
+            lambda dest: write_arrow_file(iter_batches(path, self.batch_size), dest, parse_dates),
+            variant="stream|" + ",".join(parse_dates),
+        )
+
+    def _snapshot(self, path: Path, parse_dates: tuple[str, ...]) -> pd.DataFrame | None:
+        """Return the cached snapshot of a workbook, if snapshots are enabled and current."""
+        if self.snapshots is None:
+            return None
+        return self.snapshots.get(path, variant=",".join(parse_dates))
 
     @property
     def dataframes(self) -> dict[str, pd.DataFrame]:
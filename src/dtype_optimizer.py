@@ -0,0 +1,84 @@
+"""Shrink loaded tables with compact, lossless dtypes."""
+
+from dataclasses import dataclass
+
+import pandas as pd
+
+# Text columns with at most this share of distinct values become categories
+CATEGORY_MAX_RATIO = 0.5
+
+
+@dataclass
+class MemoryReport:
+    """Memory used by a table before and after optimization, in bytes."""
+
+    before: int
+    after: int
+
+    @property
+    def ratio(self) -> float:
+        return self.before / self.after if self.after else 1.0
+
+
+def optimize_dataframe(df: pd.DataFrame, category_max_ratio: float = CATEGORY_MAX_RATIO) -> pd.DataFrame:
+    """Return a copy of `df` using the smallest dtypes that keep every value.
+
+    Repetitive text becomes `category` and other text Arrow-backed strings.
+    Numbers keep their 64-bit types: in narrower ones, arithmetic in
+    generated code would silently wrap around (integers) or accumulate
+    rounding errors in sums and means (float32).
+    """
+    optimized = {}
+    for col in df.columns:
+        series = df[col]
+        if (
+            pd.api.types.is_bool_dtype(series)
+            or pd.api.types.is_datetime64_any_dtype(series)
+            or pd.api.types.is_numeric_dtype(series)
+            or isinstance(series.dtype, pd.CategoricalDtype)
+        ):
+            optimized[col] = series
+        elif _is_text(series):
+            non_null = series.dropna()
+            if len(non_null) and non_null.nunique() <= category_max_ratio * len(non_null):
+                optimized[col] = series.astype("category")
+            else:
+                optimized[col] = series.astype(pd.StringDtype("pyarrow"))
+        else:
+            optimized[col] = series
+    return pd.DataFrame(optimized, index=df.index)
+
+
+def optimize_dataframes(
+    dataframes: dict[str, pd.DataFrame], category_max_ratio: float = CATEGORY_MAX_RATIO
+) -> tuple[dict[str, pd.DataFrame], dict[str, MemoryReport]]:
+    """Optimize every table and report its memory use before and after."""
+    optimized = {}
+    report = {}
+    for name, df in dataframes.items():
+        optimized[name] = optimize_dataframe(df, category_max_ratio)
+        report[name] = MemoryReport(before=memory_usage(df), after=memory_usage(optimized[name]))
+    return optimized, report
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Return the bytes held by a DataFrame, including string contents."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def format_memory_report(report: dict[str, MemoryReport]) -> str:
+    """Summarize a memory report, one line per table plus the total."""
+    lines = [
+        f"{name}: {entry.before / 1024:,.1f} KiB -> {entry.after / 1024:,.1f} KiB ({entry.ratio:.1f}x)"
+        for name, entry in report.items()
+    ]
+    total = MemoryReport(sum(entry.before for entry in report.values()), sum(entry.after for entry in report.values()))
+    lines.append(f"total: {total.before / 1024:,.1f} KiB -> {total.after / 1024:,.1f} KiB ({total.ratio:.1f}x)")
+    return "\n".join(lines)
+
+
+def _is_text(series: pd.Series) -> bool:
+    """Check whether a column holds only strings (and missing values)."""
+    if pd.api.types.is_object_dtype(series):
+        return pd.api.types.infer_dtype(series, skipna=True) == "string"
+    return pd.api.types.is_string_dtype(series)
@@ -1,11 +1,17 @@
 """Safely execute generated pandas code."""
 
 import ast
+import hashlib
+import threading
+import traceback
+from collections import OrderedDict
 from dataclasses import dataclass
+from types import CodeType
 
 import pandas as pd
 
 from .common.constants import ALLOWED_BUILTINS, DANGEROUS_ATTRIBUTES, DANGEROUS_FUNCTIONS
+from .preflight import apply_fixes, check_code, format_issues, table_schemas
 
 
 @dataclass
@@ -16,13 +22,22 @@ class ExecutionResult:
     result: pd.DataFrame | pd.Series | object | None = None
     error: str | None = None
     code: str = ""
+    traceback: str | None = None  # Failing lines of the generated code and the exception
 
 
 class SafeCodeExecutor:
     """Execute pandas code in a restricted environment."""
 
-    def __init__(self, dataframes: dict[str, pd.DataFrame]):
+    # Modules available to generated code besides the tables
+    GLOBAL_NAMES = ("pd",)
+
+    def __init__(self, dataframes: dict[str, pd.DataFrame], cache_size: int = 256):
         self.dataframes = dataframes
+        self.cache_size = cache_size
+        self._schemas = table_schemas(dataframes)
+        # LRU of code hash -> compiled code object, or the validation error
+        self._compiled: OrderedDict[str, CodeType | str] = OrderedDict()
+        self._compiled_lock = threading.Lock()
 
     def validate_code(self, code: str) -> tuple[bool, str]:
         """Validate code for safety using AST analysis."""
@@ -31,6 +46,10 @@ class SafeCodeExecutor:
         except SyntaxError as e:
             return False, f"Syntax error: {e}"
 
+        return self._validate_tree(tree)
+
+    def _validate_tree(self, tree: ast.AST) -> tuple[bool, str]:
+        """Check a parsed module for dangerous operations."""
         # Check for dangerous operations
         for node in ast.walk(tree):
             # Block imports
@@ -48,28 +67,64 @@ class SafeCodeExecutor:
                 if node.attr in DANGEROUS_ATTRIBUTES:
                     return False, f"Attribute '{node.attr}' is not allowed"
 
+        # Reject misspelled columns and unknown names before anything runs
+        issues = check_code(tree, self._schemas, self.GLOBAL_NAMES)
+        if issues:
+            return False, format_issues(issues)
+
         return True, ""
 
+    def fix_code(self, code: str) -> str:
+        """Correct unambiguous misspellings of columns and table names.
+
+        Returns the code unchanged when there is nothing it can safely fix.
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return code
+        return apply_fixes(code, check_code(tree, self._schemas, self.GLOBAL_NAMES))
+
+    def compile_code(self, code: str) -> CodeType | str:
+        """Validate and compile code once per distinct snippet.
+
+        Returns the compiled code object, or the validation error message.
+        """
+        key = hashlib.sha256(code.encode()).hexdigest()
+        with self._compiled_lock:
+            if key in self._compiled:
+                self._compiled.move_to_end(key)
+                return self._compiled[key]
+
+        try:
+            tree = ast.parse(code)
+            is_valid, error_msg = self._validate_tree(tree)
+            compiled = compile(tree, "<generated>", "exec") if is_valid else error_msg
+        except SyntaxError as e:
+            compiled = f"Syntax error: {e}"
+
+        with self._compiled_lock:
+            self._compiled[key] = compiled
+            if len(self._compiled) > self.cache_size:
+                self._compiled.popitem(last=False)
+        return compiled
+
     def execute(self, code: str) -> ExecutionResult:
         """Execute the code and return the result."""
-        # Validate first
-        is_valid, error_msg = self.validate_code(code)
-        if not is_valid:
-            return ExecutionResult(success=False, error=error_msg, code=code)
+        # Validate first (cached per distinct snippet)
+        compiled = self.compile_code(code)
+        if isinstance(compiled, str):
+            return ExecutionResult(success=False, error=compiled, code=code)
 
         # Build execution environment
-        exec_globals = {
-            "__builtins__": ALLOWED_BUILTINS,
-            "pd": pd,
-        }
-        exec_locals = dict(self.dataframes)
+        exec_globals, exec_locals = self._environment()
 
         try:
-            exec(code, exec_globals, exec_locals)
+            exec(compiled, exec_globals, exec_locals)
 
             # Get the result variable
             if "result" in exec_locals:
-                result = exec_locals["result"]
+                result = self._convert_result(exec_locals["result"])
                 return ExecutionResult(success=True, result=result, code=code)
             else:
                 return ExecutionResult(
@@ -78,4 +133,40 @@ class SafeCodeExecutor:
                     code=code,
                 )
         except Exception as e:
-            return ExecutionResult(success=False, error=str(e), code=code)
+            return ExecutionResult(
+                success=False, error=str(e) or type(e).__name__, code=code, traceback=_generated_traceback(e, code)
+            )
+
+    def _environment(self) -> tuple[dict, dict]:
+        """Return the globals and locals generated code runs with."""
+        exec_globals = {
+            "__builtins__": ALLOWED_BUILTINS,
+            "pd": pd,
+        }
+        # Shallow copies let generated code add columns without touching the
+        # shared tables (which may be read-only memory-mapped buffers); join
+        # maps are read-only arrays and are passed as they are
+        exec_locals = {
+            name: df.copy(deep=False) if isinstance(df, pd.DataFrame) else df for name, df in self.dataframes.items()
+        }
+        return exec_globals, exec_locals
+
+    def _convert_result(self, result: object) -> object:
+        """Convert the `result` variable into what callers receive."""
+        return result
+
+
+def _generated_traceback(error: Exception, code: str) -> str:
+    """Describe an exception by the generated lines it passed through.
+
+    Frames inside pandas are left out; they are long and rarely help to fix
+    the generated code.
+    """
+    lines = code.splitlines()
+    described = [
+        f"line {frame.lineno}: {lines[frame.lineno - 1].strip()}"
+        for frame in traceback.extract_tb(error.__traceback__)
+        if frame.filename == "<generated>" and frame.lineno and frame.lineno <= len(lines)
+    ]
+    described.append("".join(traceback.format_exception_only(error)).strip())
+    return "\n".join(described)
@@ -0,0 +1,30 @@
+"""Content fingerprints for sets of DataFrames."""
+
+import hashlib
+
+import pandas as pd
+
+
+def fingerprint_dataframe(df: pd.DataFrame) -> str:
+    """Return a content hash covering a DataFrame's columns, dtypes and values."""
+    digest = hashlib.sha256()
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint_dataframes(dataframes: dict[str, pd.DataFrame]) -> str:
+    """Return a content hash for a named set of DataFrames.
+
+    Any change to a table name, column, dtype or value produces a new fingerprint.
+    """
+    return combine_fingerprints({name: fingerprint_dataframe(df) for name, df in dataframes.items()})
+
+
+def combine_fingerprints(table_keys: dict[str, str]) -> str:
+    """Return the dataset fingerprint for already computed per-table fingerprints."""
+    digest = hashlib.sha256()
+    for name in sorted(table_keys):
+        digest.update(name.encode())
+        digest.update(table_keys[name].encode())
+    return digest.hexdigest()[:32]
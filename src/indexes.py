@@ -0,0 +1,98 @@
+"""Key indexes and join maps built once per dataset for generated code."""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .dtype_optimizer import memory_usage
+from .schema import infer_relationships
+
+# Largest table (in bytes) that gets a sorted foreign-key copy; the copy doubles its memory
+MAX_SORTED_COPY_BYTES = 256 * 1024 * 1024
+
+
+@dataclass
+class KeyIndex:
+    """An indexed view or join map added to the execution namespace."""
+
+    name: str
+    tables: tuple[str, ...]  # Tables it is built from
+    value: pd.DataFrame | np.ndarray
+    description: str
+
+
+def build_indexes(
+    dataframes: dict[str, pd.DataFrame], max_sorted_copy_bytes: int = MAX_SORTED_COPY_BYTES
+) -> list[KeyIndex]:
+    """Index the primary and foreign keys found by `infer_relationships`.
+
+    - `<table>_by_<key>` for a primary key is the table itself (columns are
+      shared, not copied) with a unique hash index on the key, so `.loc[key]`
+      is a hash lookup.
+    - `<table>_by_<key>` for a foreign key is a copy sorted by the key, so
+      `.loc[key]` returns all matching rows by binary search. The copy holds
+      the whole table again, so it is skipped for tables larger than
+      `max_sorted_copy_bytes`.
+    - `<child>_to_<parent>` is an array holding, for each child row, the
+      position of its parent row, so joins need no hashing at query time.
+      Being a plain array, it cannot be misaligned by index labels. Only
+      built when every child row has a parent.
+
+    The index is left unnamed while the key stays a column, so generated
+    code can still merge and group by the key column without pandas
+    rejecting the name as ambiguous.
+    """
+    indexes = []
+    parents: dict[tuple[str, str], pd.DataFrame] = {}
+
+    for child, col, parent in infer_relationships(dataframes):
+        if (parent, col) not in parents:
+            view = dataframes[parent].copy(deep=False)
+            view.index = pd.Index(dataframes[parent][col]).rename(None)
+            view.index.get_indexer(view.index[:1])  # Build the hash table now, not on the first query
+            parents[(parent, col)] = view
+            indexes.append(
+                KeyIndex(
+                    name=f"{_stem(parent)}_by_{col}",
+                    tables=(parent,),
+                    value=view,
+                    description=f"{parent} indexed by its unique {col}; use .loc[{col}] for lookups",
+                )
+            )
+
+        child_df = dataframes[child]
+        if memory_usage(child_df) <= max_sorted_copy_bytes:
+            by_foreign_key = child_df.sort_values(col, kind="stable")
+            by_foreign_key.index = pd.Index(by_foreign_key[col]).rename(None)
+            indexes.append(
+                KeyIndex(
+                    name=f"{_stem(child)}_by_{col}",
+                    tables=(child,),
+                    value=by_foreign_key,
+                    description=f"{child} sorted and indexed by {col}; .loc[{col}] returns all of its rows",
+                )
+            )
+
+        positions = parents[(parent, col)].index.get_indexer(child_df[col])
+        if (positions >= 0).all():
+            positions.setflags(write=False)  # Shared by every query, like the read-only tables
+            indexes.append(
+                KeyIndex(
+                    name=f"{_stem(child)}_to_{_stem(parent)}",
+                    tables=(child, parent),
+                    value=positions,
+                    description=(
+                        f"NumPy array of the row position in {parent} for each {child} row, in {child} row "
+                        f"order; copy {parent} columns onto {child} positionally, e.g. "
+                        f"{child}['x'] = {parent}['x'].to_numpy()[{_stem(child)}_to_{_stem(parent)}] "
+                        f"({parent}.iloc[...] keeps {parent}'s index labels, so assigning it would align wrongly)"
+                    ),
+                )
+            )
+
+    return indexes
+
+
+def _stem(table_name: str) -> str:
+    return table_name.removesuffix("_df")
@@ -0,0 +1,140 @@
+"""Parse workbooks in parallel worker processes."""
+
+import io
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+
+# Parsing pool shared by every load in this process, started on first use
+_POOL: ProcessPoolExecutor | None = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SheetTask:
+    """One sheet to parse: a workbook path or its bytes, plus read options."""
+
+    source: Path | bytes
+    sheet_name: str | int = 0
+    parse_dates: tuple[str, ...] = ()
+    detect_dates: bool = False
+
+
+def sheet_names(source: Path | bytes) -> list[str]:
+    """List a workbook's sheets without parsing their cells."""
+    workbook = openpyxl.load_workbook(_open(source), read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def detect_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert columns whose names look like dates (in place) and return the frame."""
+    for col in df.columns:
+        col_lower = str(col).lower()
+        if "date" in col_lower or col_lower.endswith("_at") or col_lower.endswith("_on"):
+            try:
+                df[col] = pd.to_datetime(df[col])
+            except Exception:
+                pass  # Keep as-is if conversion fails
+    return df
+
+
+def read_sheet(task: SheetTask) -> pd.DataFrame:
+    """Parse one sheet (or a CSV or Parquet file) in the current process."""
+    parse_dates = list(task.parse_dates) or None
+    suffix = task.source.suffix.lower() if isinstance(task.source, Path) else ""
+    if suffix == ".csv":
+        df = pd.read_csv(task.source, parse_dates=parse_dates)
+    elif suffix == ".parquet":
+        df = pd.read_parquet(task.source)
+        for col in parse_dates or ():
+            df[col] = pd.to_datetime(df[col])
+    else:
+        df = pd.read_excel(_open(task.source), sheet_name=task.sheet_name, parse_dates=parse_dates)
+    return detect_date_columns(df) if task.detect_dates else df
+
+
+def read_sheets(tasks: list[SheetTask], max_workers: int | None = None) -> list[pd.DataFrame]:
+    """Parse sheets across a process pool, returning tables in task order.
+
+    Excel parsing is CPU-bound Python, so each sheet gets its own worker.
+    Workers hand tables back as Arrow IPC streams, which the parent maps into
+    pandas without unpickling every cell. A single task, or a single worker,
+    is parsed in-process to skip the pool round trip.
+    """
+    workers = min(len(tasks), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [read_sheet(task) for task in tasks]
+
+    pool = _pool(workers)
+    try:
+        return [_from_payload(payload) for payload in pool.map(_read_sheet_payload, tasks)]
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool for the next load
+        _discard_pool(pool)
+        raise
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """Return the long-lived parsing pool, restarted larger when more workers are needed.
+
+    Workers start through a forkserver (or are spawned), never forked from
+    the app process, whose other threads may hold locks.
+    """
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS < workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)  # Loads already submitted to it still finish
+            if "forkserver" in mp.get_all_start_methods():
+                context = mp.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = mp.get_context("spawn")
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL, _POOL_WORKERS = None, 0
+    pool.shutdown(wait=False)
+
+
+def _read_sheet_payload(task: SheetTask) -> bytes | pd.DataFrame:
+    """Worker entry point: parse a sheet and serialize it as an Arrow IPC stream."""
+    df = read_sheet(task)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowException, ValueError):
+        # Columns Arrow cannot represent (e.g. mixed types) travel pickled instead
+        return df
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _from_payload(payload: bytes | pd.DataFrame) -> pd.DataFrame:
+    if isinstance(payload, pd.DataFrame):
+        return payload
+    return pa.ipc.open_stream(payload).read_all().to_pandas()
+
+
+def _open(source: Path | bytes) -> Path | io.BytesIO:
+    return io.BytesIO(source) if isinstance(source, bytes) else source
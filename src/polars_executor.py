@@ -0,0 +1,58 @@
+"""Execute generated Polars code against lazy, multi-threaded frames."""
+
+import ast
+
+import pandas as pd
+
+from .common.constants import ALLOWED_BUILTINS, IO_ATTRIBUTE_PREFIXES
+from .executor import SafeCodeExecutor
+
+try:
+    import polars as pl
+except ImportError:  # Optional - only needed for engine="polars"
+    pl = None
+
+
+class PolarsExecutor(SafeCodeExecutor):
+    """Run generated code with every table exposed as a Polars LazyFrame.
+
+    Code builds a query plan; a lazy `result` is collected with Polars'
+    optimizer (predicate pushdown, projection pruning) on all cores. The
+    result is converted back to pandas so answers and the UI work unchanged.
+    """
+
+    GLOBAL_NAMES = ("pl",)
+
+    def __init__(self, dataframes: dict[str, pd.DataFrame], cache_size: int = 256):
+        if pl is None:
+            raise ImportError("The polars engine requires the polars package")
+        super().__init__(dataframes, cache_size=cache_size)
+        # LazyFrames are immutable, so one conversion serves every query. Categories
+        # become plain strings: Polars cannot join categoricals built in different tables.
+        self.lazy_frames = {
+            name: pl.from_pandas(df).with_columns(pl.col(pl.Categorical).cast(pl.String)).lazy()
+            for name, df in dataframes.items()
+        }
+
+    def _validate_tree(self, tree: ast.AST) -> tuple[bool, str]:
+        """Apply the usual checks and also block Polars' file and network I/O."""
+        is_valid, error_msg = super()._validate_tree(tree)
+        if not is_valid:
+            return is_valid, error_msg
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute) and node.attr.startswith(IO_ATTRIBUTE_PREFIXES):
+                return False, f"Attribute '{node.attr}' is not allowed"
+        return True, ""
+
+    def _environment(self) -> tuple[dict, dict]:
+        exec_globals = {"__builtins__": ALLOWED_BUILTINS, "pl": pl}
+        return exec_globals, dict(self.lazy_frames)
+
+    def _convert_result(self, result: object) -> object:
+        """Collect lazy results and hand back pandas objects."""
+        if isinstance(result, pl.LazyFrame):
+            result = result.collect()
+        if isinstance(result, pl.DataFrame | pl.Series):
+            return result.to_pandas()
+        return result
@@ -0,0 +1,279 @@
+"""Check generated code against the real table schemas before running it."""
+
+import ast
+import difflib
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .common.constants import ALLOWED_BUILTINS
+
+# Closest names offered as suggestions, and how close the single best match must be
+# for it to be substituted automatically (a typo, not a different column)
+SUGGESTION_CUTOFF = 0.6
+AUTOFIX_CUTOFF = 0.85
+
+# Methods returning a frame with the same columns as the one they are called on
+_ROW_METHODS = {"copy", "dropna", "drop_duplicates", "fillna", "head", "query", "sample", "sort_values", "tail"}
+
+
+@dataclass
+class PreflightIssue:
+    """A column or name used by generated code that does not exist."""
+
+    message: str
+    node: ast.Constant | ast.Name = field(repr=False)
+    suggestions: list[str]
+    fix: str | None = None  # Replacement that is safe to apply without asking the model
+
+
+def table_schemas(namespace: dict[str, object]) -> dict[str, frozenset[str] | None]:
+    """Column names of every DataFrame in an execution namespace (None for other objects)."""
+    return {
+        name: frozenset(map(str, value.columns)) if isinstance(value, pd.DataFrame) else None
+        for name, value in namespace.items()
+    }
+
+
+def suggest_names(name: str, candidates: Iterable[str]) -> list[str]:
+    """Return up to three candidates that look like misspellings of `name`."""
+    candidates = list(candidates)
+    by_case = [candidate for candidate in candidates if candidate.lower() == name.lower()]
+    return by_case or difflib.get_close_matches(name, candidates, n=3, cutoff=SUGGESTION_CUTOFF)
+
+
+def check_code(
+    tree: ast.AST, schemas: dict[str, frozenset[str] | None], global_names: Iterable[str] = ()
+) -> list[PreflightIssue]:
+    """Find columns and names in the code that do not exist.
+
+    Resolves `df["col"]` and `df[["a", "b"]]` subscripts, merge keys and
+    groupby/sort_values columns against the schemas of the tables and of
+    variables derived from them by filters, sorts and merges. Columns the
+    code creates itself are allowed anywhere. Names that are never bound
+    are reported too.
+    """
+    return _Checker(tree, schemas, global_names).issues
+
+
+def apply_fixes(code: str, issues: list[PreflightIssue]) -> str:
+    """Substitute the unambiguous fixes into the code, leaving other issues alone."""
+    lines = code.encode().splitlines(keepends=True)
+    starts = [0]
+    for line in lines:
+        starts.append(starts[-1] + len(line))
+
+    source = code.encode()
+    edits = sorted((issue for issue in issues if issue.fix is not None), key=lambda i: _span(i.node, starts))
+    for issue in reversed(edits):
+        start, end = _span(issue.node, starts)
+        original = source[start:end].decode()
+        quote = original[0] if isinstance(issue.node, ast.Constant) else ""
+        source = source[:start] + f"{quote}{issue.fix}{quote}".encode() + source[end:]
+    return source.decode()
+
+
+def format_issues(issues: list[PreflightIssue]) -> str:
+    """Join the issue messages into one validation error."""
+    return "\n".join(dict.fromkeys(issue.message for issue in issues))
+
+
+def _span(node: ast.AST, starts: list[int]) -> tuple[int, int]:
+    """Byte offsets of a node in the source (AST columns are UTF-8 byte offsets)."""
+    return starts[node.lineno - 1] + node.col_offset, starts[node.end_lineno - 1] + node.end_col_offset
+
+
+def _strings(node: ast.AST | None) -> list[ast.Constant]:
+    """String constants in a literal string or list/tuple of strings."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node]
+    if isinstance(node, ast.List | ast.Tuple):
+        return [
+            element for element in node.elts if isinstance(element, ast.Constant) and isinstance(element.value, str)
+        ]
+    return []
+
+
+def _similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def _keyword(call: ast.Call, name: str) -> ast.AST | None:
+    return next((keyword.value for keyword in call.keywords if keyword.arg == name), None)
+
+
+class _Checker:
+    """Single pass over a parsed module collecting PreflightIssues."""
+
+    def __init__(self, tree: ast.AST, schemas: dict[str, frozenset[str] | None], global_names: Iterable[str]):
+        self.schemas = schemas
+        self.issues: list[PreflightIssue] = []
+
+        bound, assignments = self._bindings(tree)
+        self.created = self._created_columns(tree)
+        # Tables the code rebinds can no longer be resolved
+        self.derived: dict[str, frozenset[str] | None] = {
+            name: columns for name, columns in schemas.items() if name not in assignments
+        }
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                name = node.targets[0].id
+                if assignments.get(name) == 1 and name not in schemas:
+                    self.derived[name] = self._columns(node.value)
+        for name in self._relabelled(tree):
+            self.derived[name] = None
+
+        known_names = bound | set(schemas) | set(global_names) | set(ALLOWED_BUILTINS)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Load):
+                self._check_columns(node.value, _strings(node.slice), "Column")
+            elif isinstance(node, ast.Call):
+                self._check_call(node)
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in known_names:
+                self._report(node, node.id, f"Name '{node.id}' is not defined", known_names - set(ALLOWED_BUILTINS))
+
+    @staticmethod
+    def _bindings(tree: ast.AST) -> tuple[set[str], dict[str, int]]:
+        """Names bound anywhere in the code, and how often each is assigned."""
+        bound: set[str] = set()
+        assignments: dict[str, int] = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store | ast.Del):
+                bound.add(node.id)
+                assignments[node.id] = assignments.get(node.id, 0) + 1
+            elif isinstance(node, ast.arg):
+                bound.add(node.arg)
+            elif isinstance(node, ast.FunctionDef | ast.ClassDef):
+                bound.add(node.name)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                bound.add(node.name)
+        return bound, assignments
+
+    @staticmethod
+    def _created_columns(tree: ast.AST) -> set[str]:
+        """Columns the code adds: `df["new"] = ...`, `assign(new=...)`, renames and inserts."""
+        created: set[str] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store):
+                created.update(constant.value for constant in _strings(node.slice))
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                if node.func.attr == "assign":
+                    created.update(keyword.arg for keyword in node.keywords if keyword.arg)
+                elif node.func.attr == "rename" and isinstance(_keyword(node, "columns"), ast.Dict):
+                    created.update(
+                        constant.value for value in _keyword(node, "columns").values for constant in _strings(value)
+                    )
+                elif node.func.attr == "insert" and len(node.args) > 1:
+                    created.update(constant.value for constant in _strings(node.args[1]))
+        return created
+
+    @staticmethod
+    def _relabelled(tree: ast.AST) -> set[str]:
+        """Names whose columns change in ways that cannot be followed.
+
+        `df.columns = [...]`, `df[<expression>] = ...` and in-place renames
+        without a literal mapping leave the columns unknown.
+        """
+        relabelled: set[str] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store) and node.attr == "columns":
+                target = node.value
+            elif isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store) and not _strings(node.slice):
+                target = node.value
+            elif (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ("rename", "set_axis")
+                and not (node.func.attr == "rename" and isinstance(_keyword(node, "columns"), ast.Dict))
+                and _keyword(node, "inplace") is not None
+            ):
+                target = node.func.value
+            else:
+                continue
+            if isinstance(target, ast.Name):
+                relabelled.add(target.id)
+        return relabelled
+
+    def _columns(self, node: ast.AST) -> frozenset[str] | None:
+        """Columns of the frame an expression evaluates to, when they can be known."""
+        if isinstance(node, ast.Name):
+            return self.derived.get(node.id)
+        if isinstance(node, ast.Subscript):
+            selected = _strings(node.slice)
+            if isinstance(node.slice, ast.List) and selected:
+                return frozenset(constant.value for constant in selected)
+            if not selected and not isinstance(node.slice, ast.Slice | ast.Constant):
+                return self._columns(node.value)  # Boolean mask keeps every column
+            return None
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if node.func.attr in _ROW_METHODS:
+                return self._columns(node.func.value)
+            if node.func.attr == "merge":
+                left, right = self._merge_operands(node)
+                return self._merged_columns(node, self._columns(left), self._columns(right) if right else None)
+        return None
+
+    def _merge_operands(self, call: ast.Call) -> tuple[ast.AST | None, ast.AST | None]:
+        """Left and right frames of `left.merge(right, ...)` or `pd.merge(left, right, ...)`."""
+        args = list(call.args)
+        owner = call.func.value
+        if isinstance(owner, ast.Name) and owner.id == "pd":
+            left = args.pop(0) if args else _keyword(call, "left")
+        else:
+            left = owner
+        right = args.pop(0) if args else _keyword(call, "right")
+        return left, right
+
+    @staticmethod
+    def _merged_columns(
+        call: ast.Call, left: frozenset[str] | None, right: frozenset[str] | None
+    ) -> frozenset[str] | None:
+        if left is None or right is None:
+            return None
+        keys = {constant.value for constant in _strings(_keyword(call, "on"))}
+        overlap = (left & right) - keys
+        # Overlapping columns keep their name or gain a suffix depending on the
+        # suffixes argument, so accept either form
+        suffixed = {f"{column}{suffix}" for column in overlap for suffix in ("_x", "_y")}
+        for suffixes in _strings(_keyword(call, "suffixes")):
+            suffixed.update(f"{column}{suffixes.value}" for column in overlap)
+        return left | right | suffixed
+
+    def _check_call(self, call: ast.Call) -> None:
+        if not isinstance(call.func, ast.Attribute):
+            return
+        method = call.func.attr
+        if method == "merge":
+            left, right = self._merge_operands(call)
+            for frame, keys in ((left, ("on", "left_on")), (right, ("on", "right_on"))):
+                if frame is not None:
+                    for keyword in keys:
+                        self._check_columns(frame, _strings(_keyword(call, keyword)), "Merge key")
+        elif method in ("groupby", "sort_values"):
+            by = call.args[0] if call.args else _keyword(call, "by")
+            self._check_columns(call.func.value, _strings(by), "Column")
+
+    def _check_columns(self, frame: ast.AST, constants: list[ast.Constant], kind: str) -> None:
+        if not constants:
+            return
+        columns = self._columns(frame)
+        if columns is None:
+            return
+        for constant in constants:
+            if constant.value not in columns and constant.value not in self.created:
+                where = f" in {frame.id}" if isinstance(frame, ast.Name) else ""
+                self._report(constant, constant.value, f"{kind} '{constant.value}' does not exist{where}", columns)
+
+    def _report(self, node: ast.Constant | ast.Name, name: str, message: str, candidates: Iterable[str]) -> None:
+        candidates = sorted(candidates)
+        suggestions = suggest_names(name, candidates)
+        if suggestions:
+            message += f"; did you mean {' or '.join(repr(s) for s in suggestions)}?"
+        elif isinstance(node, ast.Constant):
+            message += f" (columns: {', '.join(candidates)})"
+
+        # Fix only when exactly one suggestion is a near miss
+        near = [s for s in suggestions if s.lower() == name.lower() or _similarity(name, s) >= AUTOFIX_CUTOFF]
+        fix = near[0] if len(near) == 1 else None
+        self.issues.append(PreflightIssue(message=message, node=node, suggestions=suggestions, fix=fix))
@@ -0,0 +1,179 @@
+"""Find previously answered questions that are paraphrases of a new one."""
+
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .result_cache import normalize_question
+
+# Words that carry no meaning for matching questions
+STOPWORDS = {
+    "a", "all", "an", "and", "are", "as", "at", "based", "be", "by", "can", "did", "do", "does",
+    "each", "for", "from", "give", "has", "have", "how", "i", "in", "is", "it", "list", "me",
+    "of", "on", "or", "per", "please", "show", "tell", "that", "the", "their", "them", "there",
+    "to", "was", "were", "what", "which", "who", "with", "you",
+}  # fmt: skip
+
+# Common paraphrases mapped onto one canonical word
+SYNONYMS = {
+    "top": "highest",
+    "biggest": "highest",
+    "largest": "highest",
+    "most": "highest",
+    "max": "highest",
+    "maximum": "highest",
+    "smallest": "lowest",
+    "least": "lowest",
+    "min": "lowest",
+    "minimum": "lowest",
+    "billing": "bill",
+    "billed": "bill",
+    "bills": "bill",
+    "revenue": "bill",
+    "customer": "client",
+    "customers": "client",
+    "number": "count",
+    "many": "count",
+    "sum": "total",
+}
+
+# Words that qualify a question rather than name what it is about; their
+# position is free ("top client" and "client with the highest ...")
+QUALIFIERS = {"average", "count", "highest", "lowest", "total"}
+
+MONTHS = {
+    "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+    "sept", "oct", "nov", "dec",
+}  # fmt: skip
+
+
+def tokenize(question: str) -> list[str]:
+    """Split a question into canonical content words."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9_@.'-]+", normalize_question(question)):
+        word = word.strip(".'-")
+        if not word or word in STOPWORDS:
+            continue
+        word = SYNONYMS.get(word, word)
+        # Light stemming so "invoices" matches "invoice"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss") and not word.isdigit():
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+@dataclass
+class QuestionMatch:
+    """A previously answered question similar to the one being asked."""
+
+    question: str
+    code: str
+    score: float
+
+
+class QuestionIndex:
+    """TF-IDF index of answered questions and the code that answered them.
+
+    Matching is guarded by literals: numbers, month names and words that
+    occur as values in the data (countries, statuses, names) must be
+    identical, so "clients in the UK" never reuses the code for "clients
+    in the US" however similar the rest of the wording is. The subjects
+    they share must also come in the same order, as "clients per invoice"
+    and "invoices per client" use the same words for different questions.
+    """
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 1000, literal_vocabulary: set[str] | None = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.literal_vocabulary = literal_vocabulary or set()
+        self._entries: list[tuple[str, str, Counter, tuple[str, ...]]] = []
+        self._document_frequency: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataframes(cls, dataframes: dict[str, pd.DataFrame], threshold: float = 0.8) -> "QuestionIndex":
+        """Create an index whose literal vocabulary comes from the tables' text values."""
+        vocabulary = set()
+        for df in dataframes.values():
+            for col in df.columns:
+                if pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_datetime64_any_dtype(df[col]):
+                    continue
+                values = df[col].dropna().unique()
+                if len(values) > 1000:
+                    continue
+                for value in values:
+                    vocabulary.update(tokenize(str(value)))
+        return cls(threshold=threshold, literal_vocabulary=vocabulary)
+
+    def add(self, question: str, code: str) -> None:
+        """Record the validated code that answered `question`."""
+        tokens = tokenize(question)
+        terms = Counter(tokens)
+        if not terms:
+            return
+
+        with self._lock:
+            for i, (existing, *_) in enumerate(self._entries):
+                if normalize_question(existing) == normalize_question(question):
+                    self._document_frequency.subtract(self._entries.pop(i)[2].keys())
+                    break
+            if len(self._entries) >= self.max_entries:
+                self._document_frequency.subtract(self._entries.pop(0)[2].keys())
+            self._entries.append((question, code, terms, self._subjects(tokens)))
+            self._document_frequency.update(terms.keys())
+
+    def lookup(self, question: str) -> QuestionMatch | None:
+        """Return the most similar answered question above the threshold, if any."""
+        tokens = tokenize(question)
+        terms = Counter(tokens)
+        if not terms:
+            return None
+        literals = self._literals(terms)
+        subjects = self._subjects(tokens)
+
+        with self._lock:
+            query_vector = self._vector(terms)
+            best = None
+            for existing, code, existing_terms, existing_subjects in self._entries:
+                if self._literals(existing_terms) != literals:
+                    continue
+                shared = set(subjects) & set(existing_subjects)
+                if [s for s in subjects if s in shared] != [s for s in existing_subjects if s in shared]:
+                    continue
+                score = self._cosine(query_vector, self._vector(existing_terms))
+                if score >= self.threshold and (best is None or score > best.score):
+                    best = QuestionMatch(question=existing, code=code, score=score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _literals(self, terms: Counter) -> set[str]:
+        """Extract the terms that must match exactly between two questions."""
+        return {term for term in terms if self._is_literal(term)}
+
+    def _is_literal(self, term: str) -> bool:
+        return any(ch.isdigit() for ch in term) or term in MONTHS or term in self.literal_vocabulary
+
+    def _subjects(self, tokens: list[str]) -> tuple[str, ...]:
+        """The terms a question is about, in the order they first appear."""
+        return tuple(dict.fromkeys(t for t in tokens if t not in QUALIFIERS and not self._is_literal(t)))
+
+    def _vector(self, terms: Counter) -> dict[str, float]:
+        """Weight term counts by smoothed inverse document frequency."""
+        total = len(self._entries) + 1
+        return {
+            term: count * (math.log(total / (1 + self._document_frequency[term])) + 1) for term, count in terms.items()
+        }
+
+    @staticmethod
+    def _cosine(a: dict[str, float], b: dict[str, float]) -> float:
+        """Cosine similarity of two sparse vectors."""
+        dot = sum(weight * b.get(term, 0.0) for term, weight in a.items())
+        norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+        return dot / norm if norm else 0.0
@@ -0,0 +1,66 @@
+"""Compact feedback for repairing generated code that failed to run."""
+
+import re
+
+import pandas as pd
+
+from .executor import ExecutionResult
+from .preflight import suggest_names
+
+# Substrings of errors raised when code names a column or table that does not exist
+# (pandas, Polars, SQLite and DuckDB wordings)
+MISSING_NAME_MARKERS = (
+    "KeyError",
+    "not in index",
+    "are in the [columns]",
+    "ColumnNotFoundError",
+    "NameError",
+    "is not defined",
+    "has no attribute",
+    "no such column",
+    "no such table",
+    "not found",
+    "does not exist",
+)
+
+_QUOTED_NAME = re.compile(r"['\"]([A-Za-z_][\w ]*)['\"]")
+_SQLITE_NAME = re.compile(r"no such (?:column|table): ([\w.]+)")
+
+
+def repair_feedback(exec_result: ExecutionResult, tables: dict[str, pd.DataFrame]) -> str:
+    """Describe a failed execution: the error with its failing line and, if useful, a hint."""
+    error = exec_result.traceback or exec_result.error or "Unknown error"
+    hint = missing_name_hint(error, exec_result.code, tables)
+    return f"{error}\n\n# Hint\n{hint}" if hint else error
+
+
+def missing_name_hint(error: str, code: str, tables: dict[str, pd.DataFrame]) -> str:
+    """List the real columns of the tables the code uses when it named one that does not exist.
+
+    Names quoted in the error that exist nowhere get their closest matches
+    suggested. Returns an empty string for other kinds of errors.
+    """
+    if not any(marker in error for marker in MISSING_NAME_MARKERS):
+        return ""
+
+    used = [
+        name
+        for name, table in tables.items()
+        if isinstance(table, pd.DataFrame) and re.search(rf"\b{re.escape(name)}\b", code)
+    ]
+    lines = [f"{name} columns: {', '.join(map(str, tables[name].columns))}" for name in used]
+    if not used:
+        lines.append(f"Available tables: {', '.join(tables)}")
+
+    if "did you mean" in error:  # The pre-flight check already suggested names
+        return "\n".join(lines)
+
+    known = sorted(set(tables) | {str(col) for name in used for col in tables[name].columns})
+    missing = _QUOTED_NAME.findall(error) + [name.split(".")[-1] for name in _SQLITE_NAME.findall(error)]
+    for name in dict.fromkeys(missing):
+        if name in known:
+            continue
+        matches = suggest_names(name, known)
+        if matches:
+            lines.append(f"'{name}' does not exist; did you mean {' or '.join(repr(m) for m in matches)}?")
+    return "\n".join(lines)
@@ -0,0 +1,129 @@
+"""Persistent cache of answered questions."""
+
+import hashlib
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class CachedAnswer:
+    """A previously computed answer."""
+
+    code: str
+    result: object
+    answer: str
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different phrasings share a cache entry."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?.! ")
+
+
+class ResultCache:
+    """SQLite-backed question -> (code, result, answer) cache with size and TTL eviction.
+
+    Keys combine the normalized question, the model, the execution engine and
+    a content fingerprint of the loaded tables, so changing the data never
+    serves a stale answer and each engine's code is only served by it.
+    """
+
+    def __init__(self, path: Path | str, max_entries: int = 500, ttl_seconds: float = 24 * 3600):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                code TEXT NOT NULL,
+                result BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(question: str, model: str, dataset_key: str, engine: str = "pandas") -> str:
+        """Build the cache key for a question against a model, dataset and execution engine."""
+        source = f"{normalize_question(question)}\0{model}\0{dataset_key}\0{engine}"
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def get(self, key: str) -> CachedAnswer | None:
+        """Return the cached answer for `key`, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT code, result, answer, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            code, result, answer, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            # Results are pickled, and unpickling can run arbitrary code: the cache file
+            # must only be writable by this application, like the rest of its data directory
+            try:
+                result = pickle.loads(result)
+            except Exception:
+                # Corrupt, or written by an incompatible library version; recompute instead
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE answers SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        return CachedAnswer(code=code, result=result, answer=answer)
+
+    def put(self, key: str, question: str, code: str, result: object, answer: str) -> None:
+        """Store an answer and evict expired and least recently used entries."""
+        try:
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Results that cannot be serialized are simply not cached
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, question, code, payload, answer, now, now),
+            )
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                """
+                DELETE FROM answers WHERE key NOT IN (
+                    SELECT key FROM answers ORDER BY accessed_at DESC LIMIT ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Remove every cached answer."""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
@@ -0,0 +1,245 @@
+"""Run generated code in a pool of resource-limited worker processes."""
+
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import shutil
+import tempfile
+import weakref
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+import pandas as pd
+
+from .common.sandbox_constants import (
+    SANDBOX_CPU_LIMIT_SECONDS,
+    SANDBOX_MEMORY_LIMIT_MB,
+    SANDBOX_TIMEOUT_SECONDS,
+)
+from .executor import ExecutionResult, SafeCodeExecutor
+from .indexes import KeyIndex, build_indexes
+from .table_store import SharedTableStore
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits - only the wall-clock timeout applies
+    resource = None
+
+
+def _current_address_space() -> int:
+    """Return this process's virtual memory size in bytes (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _worker_main(
+    conn: Connection,
+    store_dir: Path,
+    key: str,
+    names: list[str],
+    others: dict[str, object],
+    indexes: dict[str, tuple[str, ...]],
+    memory_limit_mb: int,
+    cpu_limit_seconds: int,
+) -> None:
+    """Map the published tables, then serve execution requests from the parent until told to stop."""
+    mapped = SharedTableStore(store_dir).attach(key) if key else {}
+    dataframes = {name: mapped[name] if name in mapped else others[name] for name in names}
+    if indexes:
+        tables = {table: dataframes[table] for tables in indexes.values() for table in tables}
+        dataframes.update({index.name: index.value for index in build_indexes(tables) if index.name in indexes})
+
+    if resource is not None and memory_limit_mb > 0:
+        # Allow the query this much memory on top of what the worker already maps
+        limit = _current_address_space() + memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    executor = SafeCodeExecutor(dataframes)
+
+    while True:
+        try:
+            code = conn.recv()
+        except EOFError:
+            break
+        if code is None:
+            break
+
+        if resource is not None and cpu_limit_seconds > 0:
+            # RLIMIT_CPU counts the process's lifetime, so budget from current usage.
+            # Exceeding it kills the worker, which the parent reports and replaces.
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            soft = int(used.ru_utime + used.ru_stime) + cpu_limit_seconds
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.RLIM_INFINITY))
+
+        result = executor.execute(code)
+        try:
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            payload = pickle.dumps(
+                ExecutionResult(success=False, error=f"Result could not be serialized: {e}", code=code)
+            )
+        conn.send_bytes(payload)
+
+
+class _Worker:
+    """A single worker process and the parent's end of its pipe."""
+
+    def __init__(self, context, args: tuple):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, *args), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self) -> None:
+        """Terminate the worker process."""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+def _stop_workers(workers: list[_Worker], lease: Path | None, private_store: Path | None) -> None:
+    for worker in workers:
+        worker.stop()
+    if lease is not None:
+        lease.unlink(missing_ok=True)
+    if private_store is not None:
+        shutil.rmtree(private_store, ignore_errors=True)
+
+
+def _worker_context():
+    """A start method that is safe from a multithreaded parent (unlike a plain fork).
+
+    The forkserver is started from a clean single-threaded process and
+    preloads this module, so workers start without re-importing pandas.
+    """
+    if "forkserver" in mp.get_all_start_methods():
+        context = mp.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return mp.get_context("spawn")
+
+
+class SandboxedExecutor:
+    """Execute pandas code in a pool of worker processes with hard limits.
+
+    Workers are started through a forkserver (or spawned), never forked from
+    the serving process, whose other threads may hold locks. Tables with a
+    plain row index are published to a shared table store (the given one,
+    or a private temporary one) and memory-mapped by every worker, so they
+    share the same physical pages; other namespace objects are pickled to
+    each worker, except key indexes, which every worker rebuilds over its
+    mapped tables. Each query gets a wall-clock
+    timeout, a CPU-time budget and an address-space cap; a worker that
+    breaches them is killed and replaced without affecting other users.
+    """
+
+    def __init__(
+        self,
+        dataframes: dict[str, pd.DataFrame],
+        workers: int = 2,
+        timeout_seconds: float = SANDBOX_TIMEOUT_SECONDS,
+        memory_limit_mb: int = SANDBOX_MEMORY_LIMIT_MB,
+        cpu_limit_seconds: int = SANDBOX_CPU_LIMIT_SECONDS,
+        table_store: SharedTableStore | None = None,
+        indexes: list[KeyIndex] | None = None,
+        table_keys: dict[str, str] | None = None,
+    ):
+        indexes = indexes or []
+        self.dataframes = {**dataframes, **{index.name: index.value for index in indexes}}
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.cpu_limit_seconds = cpu_limit_seconds
+        # Validation happens in the parent too, so unsafe code never reaches a worker
+        self._validator = SafeCodeExecutor(self.dataframes)
+
+        private_store = None
+        if table_store is None:
+            private_store = Path(tempfile.mkdtemp(prefix="sandbox-tables-"))
+            table_store = SharedTableStore(private_store)
+        mappable = {
+            name: df
+            for name, df in dataframes.items()
+            if isinstance(df, pd.DataFrame) and isinstance(df.index, pd.RangeIndex) and df.index.start == 0
+        }
+        key = table_store.publish(mappable, table_keys) if mappable else ""
+        # Replacement workers map the dataset again, so keep it from being evicted while the pool lives
+        self._lease = table_store.lease(key) if key else None
+        others = {name: value for name, value in dataframes.items() if name not in mappable}
+        self._worker_args = (
+            table_store.store_dir,
+            key,
+            list(dataframes),
+            others,
+            {index.name: index.tables for index in indexes},
+            memory_limit_mb,
+            cpu_limit_seconds,
+        )
+
+        self._context = _worker_context()
+        self._workers: list[_Worker] = []
+        self._finalizer = weakref.finalize(self, _stop_workers, self._workers, self._lease, private_store)
+        self._workers.extend(self._start_worker() for _ in range(workers))
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def validate_code(self, code: str) -> tuple[bool, str]:
+        """Validate code for safety using AST analysis."""
+        return self._validator.validate_code(code)
+
+    def fix_code(self, code: str) -> str:
+        """Correct unambiguous misspellings of columns and table names."""
+        return self._validator.fix_code(code)
+
+    def execute(self, code: str) -> ExecutionResult:
+        """Execute the code in a worker process and return the result."""
+        compiled = self._validator.compile_code(code)
+        if isinstance(compiled, str):
+            return ExecutionResult(success=False, error=compiled, code=code)
+
+        if self._lease is not None:
+            try:
+                self._lease.touch()  # Keep the dataset among the most recently used
+            except OSError:  # The store was cleared by hand; the running workers still map it
+                pass
+        worker = self._idle.get()
+        try:
+            worker.conn.send(code)
+            if not worker.conn.poll(self.timeout_seconds):
+                worker = self._replace(worker)
+                return ExecutionResult(
+                    success=False,
+                    error=f"Execution timed out after {self.timeout_seconds:g} seconds",
+                    code=code,
+                )
+            return pickle.loads(worker.conn.recv_bytes())
+        except (EOFError, OSError):
+            worker.process.join(timeout=1)
+            exitcode = worker.process.exitcode
+            worker = self._replace(worker)
+            return ExecutionResult(
+                success=False,
+                error=f"Execution exceeded the sandbox resource limits (worker exit code {exitcode})",
+                code=code,
+            )
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        """Stop all worker processes."""
+        self._finalizer()
+
+    def _start_worker(self) -> _Worker:
+        return _Worker(self._context, self._worker_args)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        """Kill a misbehaving worker and start a fresh one in its place."""
+        worker.stop()
+        replacement = self._start_worker()
+        self._workers[self._workers.index(worker)] = replacement
+        return replacement
@@ -2,9 +2,21 @@
 
 import pandas as pd
 
+from .schema_profile import ColumnProfile, TableProfile
+from .views import VIEW_DESCRIPTIONS
+
+# What the tables are to the code each execution engine generates
+TABLE_KINDS = {
+    "pandas": "pandas DataFrames",
+    "polars": "Polars LazyFrames",
+    "sql": "database tables",
+}
+
 
 def get_dtype_description(dtype) -> str:
     """Convert pandas dtype to human-readable description."""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return f"categorical {get_dtype_description(dtype.categories.dtype)}"
     dtype_str = str(dtype)
     if "int" in dtype_str:
         return "integer"
@@ -12,20 +24,28 @@ def get_dtype_description(dtype) -> str:
         return "float"
     elif "datetime" in dtype_str:
         return "datetime"
-    elif "object" in dtype_str:
+    elif "object" in dtype_str or "string" in dtype_str:
         return "string"
     elif "bool" in dtype_str:
         return "boolean"
     return dtype_str
 
 
-def generate_table_schema(df: pd.DataFrame, table_name: str) -> str:
-    """Generate a schema description for a DataFrame."""
+def generate_table_schema(df: pd.DataFrame, table_name: str, profile: TableProfile | None = None) -> str:
+    """Generate a schema description for a DataFrame.
+
+    With a precomputed `profile`, columns are described by their value range,
+    distinct count, most common values and null ratio instead of samples.
+    """
     lines = [f"### {table_name}"]
     lines.append("Columns:")
 
     for col in df.columns:
         dtype = get_dtype_description(df[col].dtype)
+        column_profile = profile.column(str(col)) if profile is not None else None
+        if column_profile is not None:
+            lines.append(f"  - {col} ({dtype}): {describe_column(column_profile)}")
+            continue
         sample_values = df[col].dropna().head(3).tolist()
         sample_str = ", ".join(str(v) for v in sample_values)
         lines.append(f"  - {col} ({dtype}): e.g., {sample_str}")
@@ -34,11 +54,71 @@ def generate_table_schema(df: pd.DataFrame, table_name: str) -> str:
     return "\n".join(lines)
 
 
-def generate_full_schema(dataframes: dict[str, pd.DataFrame]) -> str:
-    """Generate complete schema description for all tables."""
+def describe_column(profile: ColumnProfile) -> str:
+    """Summarize a column profile in one line for the schema prompt."""
+    parts = []
+    if profile.min is not None:
+        parts.append(f"range {profile.min} to {profile.max}")
+
+    approx = "" if profile.distinct_exact else "~"
+    parts.append(f"{approx}{profile.distinct_count:,} distinct")
+
+    top = profile.top_values()
+    if top and top[0][1] > 1 and profile.kind in ("string", "boolean"):
+        # List every value of low-cardinality columns, otherwise the most common ones
+        label = "values" if len(top) == profile.distinct_count else "most common"
+        parts.append(f"{label}: " + ", ".join(value for value, _ in top))
+    elif profile.samples and profile.min is None:
+        parts.append("e.g., " + ", ".join(profile.samples))
+
+    if profile.null_count:
+        parts.append(f"{profile.null_ratio:.0%} null")
+    return "; ".join(parts)
+
+
+def infer_relationships(dataframes: dict[str, pd.DataFrame]) -> list[tuple[str, str, str]]:
+    """Infer foreign keys from shared `*_id` columns.
+
+    Returns (child_table, column, parent_table) tuples, where the parent is
+    the table in which the column is unique.
+    """
+    relationships = []
+    key_columns = {col for df in dataframes.values() for col in df.columns if str(col).lower().endswith("_id")}
+
+    for col in sorted(key_columns, key=str):
+        tables = [name for name, df in dataframes.items() if col in df.columns]
+        if len(tables) < 2:
+            continue
+        parents = [name for name in tables if dataframes[name][col].is_unique]
+        if not parents:
+            continue
+        # Prefer the table named after the key (client_id -> clients_df)
+        prefix = str(col).lower().removesuffix("_id")
+        parent = next((name for name in parents if name.lower().startswith(prefix)), parents[0])
+        relationships.extend((name, col, parent) for name in tables if name != parent)
+
+    return relationships
+
+
+def generate_full_schema(
+    dataframes: dict[str, pd.DataFrame],
+    tables: list[str] | None = None,
+    profiles: dict[str, TableProfile] | None = None,
+    views: dict[str, pd.DataFrame] | None = None,
+    indexes: dict[str, str] | None = None,
+    engine: str = "pandas",
+) -> str:
+    """Generate complete schema description for all tables.
+
+    Pass `tables` to describe only those tables and the relationships between them,
+    `profiles` to describe columns from precomputed statistics, `views` to
+    describe precomputed views available alongside the tables and `indexes`
+    (name -> description) to list the key indexes available to generated code.
+    `engine` words the description for the code that engine runs.
+    """
     schema_parts = [
         "# Database Schema\n",
-        "You have access to the following pandas DataFrames:\n",
+        f"You have access to the following {TABLE_KINDS[engine]}:\n",
     ]
 
     table_descriptions = {
@@ -47,21 +127,57 @@ def generate_full_schema(dataframes: dict[str, pd.DataFrame]) -> str:
         "line_items_df": "Individual line items for each invoice",
     }
 
-    for df_name, df in dataframes.items():
+    selected = [name for name in dataframes if tables is None or name in tables]
+    for df_name in selected:
+        df = dataframes[df_name]
         desc = table_descriptions.get(df_name, "")
         schema_parts.append(f"\n## {df_name}")
         if desc:
             schema_parts.append(f"Description: {desc}\n")
-        schema_parts.append(generate_table_schema(df, df_name))
+        schema_parts.append(generate_table_schema(df, df_name, (profiles or {}).get(df_name)))
 
     # Add relationships
-    schema_parts.append("\n# Table Relationships")
-    schema_parts.append("- invoices_df.client_id -> clients_df.client_id")
-    schema_parts.append("- line_items_df.invoice_id -> invoices_df.invoice_id")
+    relationships = [
+        (child, col, parent)
+        for child, col, parent in infer_relationships(dataframes)
+        if child in selected and parent in selected
+    ]
+    if relationships:
+        schema_parts.append("\n# Table Relationships")
+        for child, col, parent in relationships:
+            schema_parts.append(f"- {child}.{col} -> {parent}.{col}")
+
+    # Describe the views after the tables they are built from
+    views = views or {}
+    if views:
+        schema_parts.append("\n# Precomputed Views")
+        schema_parts.append("These views are already joined and aggregated; prefer them over re-joining the tables.")
+        for view_name, view in views.items():
+            schema_parts.append(f"\n## {view_name}")
+            if view_name in VIEW_DESCRIPTIONS:
+                schema_parts.append(f"Description: {VIEW_DESCRIPTIONS[view_name]}\n")
+            schema_parts.append(generate_table_schema(view, view_name))
+
+    if indexes:
+        schema_parts.append("\n# Key Indexes")
+        schema_parts.append(
+            "Prebuilt for fast lookups and joins by key; prefer them over boolean masks or merges on these keys."
+        )
+        for index_name, description in indexes.items():
+            schema_parts.append(f"- {index_name}: {description}")
+
+    # pandas groups category columns by every category unless told otherwise
+    described = [dataframes[name] for name in selected] + list(views.values())
+    if engine == "pandas" and any(isinstance(dtype, pd.CategoricalDtype) for df in described for dtype in df.dtypes):
+        schema_parts.append("\n# Notes")
+        schema_parts.append("- Pass observed=True to groupby on categorical columns to skip empty groups")
 
     # Add computed column hints
-    schema_parts.append("\n# Computed Values")
-    schema_parts.append("- Line item subtotal: quantity * unit_price")
-    schema_parts.append("- Line item total with tax: quantity * unit_price * (1 + tax_rate)")
+    if any({"quantity", "unit_price", "tax_rate"} <= set(dataframes[name].columns) for name in selected):
+        schema_parts.append("\n# Computed Values")
+        schema_parts.append("- Line item subtotal: quantity * unit_price")
+        schema_parts.append("- Line item total with tax: quantity * unit_price * (1 + tax_rate)")
+        if "billing_fact_df" in views:
+            schema_parts.append("- Both are precomputed in billing_fact_df as subtotal and line_total")
 
     return "\n".join(schema_parts)
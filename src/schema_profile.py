@@ -0,0 +1,216 @@
+"""Column statistics for schema prompts, computed once per dataset version."""
+
+import json
+import os
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from .fingerprint import fingerprint_dataframe
+
+# Columns with at most this many distinct values keep exact value counts,
+# which makes distinct counts and top values exact across incremental updates
+MAX_TRACKED_VALUES = 1000
+TOP_K = 5
+
+
+@dataclass
+class ColumnProfile:
+    """Statistics for one column."""
+
+    name: str
+    kind: str  # "integer", "float", "datetime", "boolean" or "string"
+    count: int
+    null_count: int
+    distinct_count: int
+    distinct_exact: bool = True
+    min: float | int | str | None = None
+    max: float | int | str | None = None
+    samples: list[str] = field(default_factory=list)
+    value_counts: dict[str, int] | None = None
+
+    @property
+    def null_ratio(self) -> float:
+        return self.null_count / self.count if self.count else 0.0
+
+    def top_values(self, k: int = TOP_K) -> list[tuple[str, int]]:
+        """Return the k most frequent values with their counts."""
+        if not self.value_counts:
+            return []
+        return Counter(self.value_counts).most_common(k)
+
+
+@dataclass
+class TableProfile:
+    """Statistics for every column of a table."""
+
+    rows: int
+    columns: list[ColumnProfile]
+
+    def column(self, name: str) -> ColumnProfile | None:
+        return next((col for col in self.columns if col.name == name), None)
+
+
+def column_kind(dtype) -> str:
+    """Classify a dtype into the kinds used in profiles."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "integer"
+    if pd.api.types.is_float_dtype(dtype):
+        return "float"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    return "string"
+
+
+def profile_dataframe(df: pd.DataFrame) -> TableProfile:
+    """Compute column statistics with vectorized passes over the table."""
+    null_counts = df.isna().sum()
+    columns = []
+
+    for col in df.columns:
+        series = df[col]
+        kind = column_kind(series.dtype)
+        non_null = series.dropna()
+        value_counts = non_null.value_counts() if kind in ("string", "boolean") else None
+        if value_counts is not None:
+            # Categorical columns also count categories that never occur
+            value_counts = value_counts[value_counts > 0]
+        distinct = len(value_counts) if value_counts is not None else int(non_null.nunique())
+
+        profile = ColumnProfile(
+            name=str(col),
+            kind=kind,
+            count=len(series),
+            null_count=int(null_counts[col]),
+            distinct_count=distinct,
+            samples=[str(v) for v in non_null.head(3).tolist()],
+        )
+        if kind in ("integer", "float", "datetime") and len(non_null):
+            profile.min, profile.max = _to_json_value(non_null.min(), kind), _to_json_value(non_null.max(), kind)
+        if value_counts is not None and distinct <= MAX_TRACKED_VALUES:
+            profile.value_counts = {str(k): int(v) for k, v in value_counts.items()}
+        columns.append(profile)
+
+    return TableProfile(rows=len(df), columns=columns)
+
+
+def update_profile(profile: TableProfile, appended: pd.DataFrame) -> TableProfile:
+    """Merge statistics for rows appended to an already profiled table."""
+    delta = profile_dataframe(appended)
+    columns = []
+
+    for old in profile.columns:
+        new = delta.column(old.name)
+        merged = ColumnProfile(
+            name=old.name,
+            kind=old.kind,
+            count=old.count + new.count,
+            null_count=old.null_count + new.null_count,
+            distinct_count=max(old.distinct_count, new.distinct_count),
+            distinct_exact=False,
+            min=_merge(min, old.min, new.min),
+            max=_merge(max, old.max, new.max),
+            samples=old.samples or new.samples,
+        )
+        if old.value_counts is not None and new.value_counts is not None:
+            counts = Counter(old.value_counts) + Counter(new.value_counts)
+            if len(counts) <= MAX_TRACKED_VALUES:
+                merged.value_counts = dict(counts)
+                merged.distinct_count = len(counts)
+                merged.distinct_exact = True
+        columns.append(merged)
+
+    return TableProfile(rows=profile.rows + delta.rows, columns=columns)
+
+
+class ProfileStore:
+    """Persist table profiles as JSON, keyed by table content fingerprint.
+
+    Callers may key profiles by something cheaper that changes with the
+    content, such as the source file's modification time. When a table
+    grows by appended rows, the previous profile is updated with statistics
+    for the new rows only instead of being recomputed.
+    """
+
+    def __init__(self, store_dir: Path | str):
+        self.store_dir = Path(store_dir)
+
+    def get(self, name: str, df: pd.DataFrame, key: str | None = None) -> TableProfile:
+        """Return the profile for this version of a table, computing it if needed."""
+        fingerprint = None if key else fingerprint_dataframe(df)
+        key = key or fingerprint
+        path = self.store_dir / f"{key}.json"
+        if path.exists():
+            return self._read(path)
+
+        profile = self._update_from_previous(name, df)
+        if profile is None:
+            profile = profile_dataframe(df)
+
+        self._write(path, profile)
+        # The content fingerprint is recorded with the key so the next version can
+        # check that it only appended rows
+        self._write_text(self._latest_path(name), f"{key} {fingerprint or fingerprint_dataframe(df)}")
+        return profile
+
+    def _update_from_previous(self, name: str, df: pd.DataFrame) -> TableProfile | None:
+        """Incrementally update the last profile of `name` if `df` only appended rows."""
+        latest = self._latest_path(name)
+        if not latest.exists():
+            return None
+        previous_key, *rest = latest.read_text().split()
+        previous_path = self.store_dir / f"{previous_key}.json"
+        if not previous_path.exists():
+            return None
+
+        previous = self._read(previous_path)
+        if previous.rows >= len(df) or [col.name for col in previous.columns] != [str(c) for c in df.columns]:
+            return None
+        # The first rows must be exactly the previously profiled table
+        if fingerprint_dataframe(df.iloc[: previous.rows]) != (rest[0] if rest else previous_key):
+            return None
+        return update_profile(previous, df.iloc[previous.rows :])
+
+    def _latest_path(self, name: str) -> Path:
+        return self.store_dir / f"{name}.latest"
+
+    def _read(self, path: Path) -> TableProfile:
+        data = json.loads(path.read_text())
+        return TableProfile(rows=data["rows"], columns=[ColumnProfile(**col) for col in data["columns"]])
+
+    def _write(self, path: Path, profile: TableProfile) -> None:
+        self._write_text(path, json.dumps(asdict(profile)))
+
+    def _write_text(self, path: Path, text: str) -> None:
+        """Write a file atomically; profiles are an optimization, so failures are ignored."""
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(text)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+
+def _to_json_value(value, kind: str) -> float | int | str:
+    """Convert a min/max value into something JSON can store and compare."""
+    if kind == "datetime":
+        # Dates sort correctly as strings in this format, so merged bounds stay valid
+        timestamp = pd.Timestamp(value)
+        return timestamp.strftime("%Y-%m-%d") if timestamp == timestamp.normalize() else str(timestamp)
+    if kind == "integer":
+        return int(value)
+    return float(value)
+
+
+def _merge(func, a, b):
+    """Combine two optional bounds."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return func(a, b)
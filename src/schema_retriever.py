@@ -0,0 +1,141 @@
+"""Select the tables relevant to a question so the prompt stays small."""
+
+import math
+from collections import Counter, deque
+
+import pandas as pd
+
+from .indexes import KeyIndex
+from .question_index import tokenize
+from .schema import generate_full_schema, infer_relationships
+from .schema_profile import TableProfile
+from .views import REQUIRED_COLUMNS
+
+# Text values indexed per column (the most frequent ones)
+MAX_INDEXED_VALUES = 50
+
+
+class SchemaRetriever:
+    """Index tables by name, columns and sample values to prune the schema per question.
+
+    Small datasets always get the full schema. For larger ones, tables are
+    scored against the question's words with IDF weighting, the best matches
+    are kept and the tables on the join paths between them are added. When
+    no table matches clearly the retriever falls back to the full schema.
+    """
+
+    def __init__(
+        self,
+        dataframes: dict[str, pd.DataFrame],
+        full_schema: str | None = None,
+        min_tables: int = 6,
+        max_tables: int = 4,
+        min_score: float = 2.0,
+        profiles: dict[str, TableProfile] | None = None,
+        views: dict[str, pd.DataFrame] | None = None,
+        indexes: list[KeyIndex] | None = None,
+        engine: str = "pandas",
+    ):
+        self.dataframes = dataframes
+        self.engine = engine
+        self.profiles = profiles
+        self.views = views or {}
+        self.indexes = indexes or []
+        self.full_schema = full_schema or generate_full_schema(
+            dataframes,
+            profiles=profiles,
+            views=views,
+            indexes={index.name: index.description for index in self.indexes},
+            engine=engine,
+        )
+        self.min_tables = min_tables
+        self.max_tables = max_tables
+        self.min_score = min_score
+        self.relationships = infer_relationships(dataframes)
+
+        self._terms = {name: self._table_terms(name, df, (profiles or {}).get(name)) for name, df in dataframes.items()}
+        document_frequency = Counter(term for terms in self._terms.values() for term in terms)
+        total = len(self._terms)
+        self._idf = {term: math.log((1 + total) / (1 + count)) + 1 for term, count in document_frequency.items()}
+
+    def select_tables(self, question: str) -> list[str] | None:
+        """Return the tables needed for `question`, or None to use the full schema."""
+        if len(self.dataframes) < self.min_tables:
+            return None
+
+        question_terms = set(tokenize(question))
+        scores = {name: sum(self._idf[term] for term in question_terms & terms) for name, terms in self._terms.items()}
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best = scores[ranked[0]]
+        if best < self.min_score:
+            return None
+
+        # Keep tables scoring close to the best match; too many close matches means unsure
+        selected = [name for name in ranked if scores[name] >= best / 2]
+        if len(selected) > self.max_tables:
+            return None
+        return self._connect(selected)
+
+    def schema_for(self, question: str) -> str:
+        """Return the schema text to send with `question`."""
+        tables = self.select_tables(question)
+        if tables is None:
+            return self.full_schema
+        # Views are only worth their prompt space when a table they are built from is selected
+        views = self.views if set(tables) & set(REQUIRED_COLUMNS) else None
+        indexes = {index.name: index.description for index in self.indexes if set(index.tables) <= set(tables)}
+        return generate_full_schema(
+            self.dataframes, tables=tables, profiles=self.profiles, views=views, indexes=indexes, engine=self.engine
+        )
+
+    def _connect(self, selected: list[str]) -> list[str]:
+        """Add the tables on the shortest join paths between the selected ones."""
+        graph: dict[str, set[str]] = {name: set() for name in self.dataframes}
+        for child, _, parent in self.relationships:
+            graph[child].add(parent)
+            graph[parent].add(child)
+
+        connected = list(selected)
+        for target in selected[1:]:
+            path = self._shortest_path(graph, selected[0], target)
+            for name in path:
+                if name not in connected:
+                    connected.append(name)
+        return connected
+
+    @staticmethod
+    def _shortest_path(graph: dict[str, set[str]], start: str, target: str) -> list[str]:
+        """Breadth-first search for the join path between two tables."""
+        previous: dict[str, str | None] = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if node == target:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = previous[node]
+                return path[::-1]
+            for neighbour in graph[node]:
+                if neighbour not in previous:
+                    previous[neighbour] = node
+                    queue.append(neighbour)
+        return []
+
+    @staticmethod
+    def _table_terms(name: str, df: pd.DataFrame, profile: TableProfile | None = None) -> set[str]:
+        """Collect the words describing a table: its name, columns and common text values."""
+        terms = set(tokenize(name.removesuffix("_df").replace("_", " ")))
+        for col in df.columns:
+            terms.update(tokenize(str(col).replace("_", " ")))
+            column_profile = profile.column(str(col)) if profile is not None else None
+            if column_profile is not None:
+                # Reuse the precomputed value counts instead of scanning the column
+                values = [value for value, _ in column_profile.top_values(MAX_INDEXED_VALUES)]
+            elif pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+                values = df[col].dropna().value_counts().head(MAX_INDEXED_VALUES).index
+            else:
+                values = []
+            for value in values:
+                terms.update(tokenize(str(value)))
+        return terms
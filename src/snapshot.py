@@ -0,0 +1,105 @@
+"""Columnar on-disk snapshots of parsed Excel workbooks."""
+
+import hashlib
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from .table_store import read_mapped
+
+# Bump when the snapshot layout changes so stale files are never read back
+SNAPSHOT_VERSION = 1
+
+
+def source_key(path: Path, variant: str = "") -> str:
+    """Return a key for the current version of a source file, from its path, modification time and size.
+
+    It changes whenever the file is edited or replaced, like a content
+    fingerprint, but costs a stat instead of a pass over the data.
+    """
+    stat = path.stat()
+    key_source = f"{SNAPSHOT_VERSION}|{path.resolve()}|{stat.st_mtime_ns}|{stat.st_size}|{variant}"
+    return hashlib.sha256(key_source.encode()).hexdigest()
+
+
+class SnapshotCache:
+    """Cache parsed workbooks as Feather (Arrow IPC) files.
+
+    Each snapshot is keyed by the source file's resolved path, modification
+    time and size, so editing or replacing a workbook invalidates it.
+    """
+
+    def __init__(self, cache_dir: Path | str):
+        self.cache_dir = Path(cache_dir)
+
+    def load(self, path: Path | str, reader: Callable[[Path], pd.DataFrame], variant: str = "") -> pd.DataFrame:
+        """Load a table from its snapshot, parsing the source with `reader` on a miss.
+
+        `variant` distinguishes snapshots of the same file read with different
+        options (e.g. different date columns).
+        """
+        df = self.get(path, variant)
+        if df is None:
+            df = reader(Path(path))
+            self.put(path, df, variant)
+        return df
+
+    def get(self, path: Path | str, variant: str = "") -> pd.DataFrame | None:
+        """Return the snapshot of the current version of `path`, or None on a miss."""
+        snapshot_path = self.snapshot_path(Path(path), variant)
+        if not snapshot_path.exists():
+            return None
+        try:
+            return pd.read_feather(snapshot_path)
+        except (OSError, pa.ArrowException):
+            # Corrupt or truncated snapshot - treat as a miss so it gets rebuilt
+            return None
+
+    def put(self, path: Path | str, df: pd.DataFrame, variant: str = "") -> None:
+        """Store a parsed table as the snapshot of the current version of `path`."""
+        path = Path(path)
+        try:
+            self._write(df.to_feather, path, self.snapshot_path(path, variant))
+        except (OSError, pa.ArrowException, ValueError):
+            # Columns Arrow cannot represent (e.g. mixed types) or a read-only
+            # cache directory - keep working from the parsed workbook instead
+            pass
+
+    def load_mapped(self, path: Path | str, writer: Callable[[Path], object], variant: str = "") -> pd.DataFrame:
+        """Memory-map the snapshot of `path`, creating it with `writer` on a miss.
+
+        `writer` receives the destination and must write an uncompressed Arrow
+        IPC file, e.g. by streaming the source in batches. Unlike `load`, write
+        errors propagate, since there is no parsed table to fall back to.
+        """
+        path = Path(path)
+        snapshot_path = self.snapshot_path(path, variant)
+        if not snapshot_path.exists():
+            self._write(writer, path, snapshot_path)
+        return read_mapped(snapshot_path)
+
+    def snapshot_path(self, path: Path, variant: str = "") -> Path:
+        """Return the snapshot location for the current version of `path`."""
+        return self.cache_dir / f"{path.stem}-{source_key(path, variant)[:16]}.feather"
+
+    def clear(self) -> None:
+        """Remove all snapshots from the cache directory."""
+        for snapshot in self.cache_dir.glob("*.feather"):
+            snapshot.unlink(missing_ok=True)
+
+    def _write(self, writer: Callable[[Path], object], source: Path, snapshot_path: Path) -> None:
+        """Write a snapshot atomically and drop outdated ones for the same source."""
+        tmp_path = snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            writer(tmp_path)
+            os.replace(tmp_path, snapshot_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        for stale in self.cache_dir.glob(f"{source.stem}-*.feather"):
+            if stale != snapshot_path and stale.stem.rsplit("-", 1)[0] == source.stem:
+                stale.unlink(missing_ok=True)
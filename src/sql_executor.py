@@ -0,0 +1,101 @@
+"""Execute generated SQL on an embedded columnar database."""
+
+import re
+import sqlite3
+import threading
+
+import pandas as pd
+
+from .executor import ExecutionResult
+
+try:
+    import duckdb
+except ImportError:  # Optional - fall back to SQLite, which copies the tables in
+    duckdb = None
+
+# Statements that could modify the database or reach outside it
+FORBIDDEN_KEYWORDS = {
+    "ALTER", "ATTACH", "CALL", "COPY", "CREATE", "DELETE", "DETACH", "DROP", "EXPORT", "IMPORT",
+    "INSERT", "INSTALL", "LOAD", "PRAGMA", "SET", "UPDATE", "VACUUM",
+}  # fmt: skip
+
+# String literals and comments are removed before keyword checks
+_LITERALS_AND_COMMENTS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+class SQLExecutor:
+    """Execute read-only SQL over the loaded DataFrames.
+
+    With DuckDB installed, DataFrames are registered as views without
+    copying and queries run on all cores with file and network access
+    disabled. Without it, the tables are copied into an in-memory SQLite
+    database. Results are returned as DataFrames in an ExecutionResult,
+    like SafeCodeExecutor.
+    """
+
+    def __init__(self, dataframes: dict[str, pd.DataFrame], backend: str | None = None):
+        self.dataframes = dataframes
+        self.backend = backend or ("duckdb" if duckdb is not None else "sqlite")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        if self.backend == "duckdb":
+            if duckdb is None:
+                raise ImportError("The duckdb backend requires the duckdb package")
+            self._database = duckdb.connect(config={"enable_external_access": False})
+        elif self.backend == "sqlite":
+            self._database = sqlite3.connect(":memory:", check_same_thread=False)
+            for name, df in dataframes.items():
+                df.to_sql(name, self._database, index=False)
+        else:
+            raise ValueError(f"Unknown SQL backend '{self.backend}'")
+
+    def validate_code(self, code: str) -> tuple[bool, str]:
+        """Allow a single SELECT (or WITH ... SELECT) statement only."""
+        stripped = _LITERALS_AND_COMMENTS.sub(" ", code).strip().rstrip(";").strip()
+        if not stripped:
+            return False, "Empty query"
+        if ";" in stripped:
+            return False, "Only a single statement is allowed"
+
+        words = re.findall(r"[A-Za-z_]+", stripped.upper())
+        if words[0] not in ("SELECT", "WITH"):
+            return False, "Only SELECT queries are allowed"
+        for word in words:
+            if word in FORBIDDEN_KEYWORDS:
+                return False, f"Keyword '{word}' is not allowed"
+        return True, ""
+
+    def fix_code(self, code: str) -> str:
+        """Return the query unchanged; SQL is not analyzed before it runs."""
+        return code
+
+    def execute(self, code: str) -> ExecutionResult:
+        """Run the query and return its rows as a DataFrame."""
+        is_valid, error_msg = self.validate_code(code)
+        if not is_valid:
+            return ExecutionResult(success=False, error=error_msg, code=code)
+
+        try:
+            if self.backend == "duckdb":
+                result = self._cursor().execute(code).df()
+            else:
+                with self._lock:
+                    result = pd.read_sql_query(code, self._database)
+            return ExecutionResult(success=True, result=result, code=code)
+        except Exception as e:
+            return ExecutionResult(success=False, error=str(e) or type(e).__name__, code=code)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._database.close()
+
+    def _cursor(self):
+        """Return this thread's DuckDB cursor, registering the tables on first use."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._database.cursor()
+            for name, df in self.dataframes.items():
+                cursor.register(name, df)
+            self._local.cursor = cursor
+        return cursor
@@ -0,0 +1,191 @@
+"""Stream workbooks, CSV and Parquet files into on-disk Arrow tables in bounded batches."""
+
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Rows held in memory at once while converting a file
+DEFAULT_BATCH_SIZE = 50_000
+
+
+def iter_batches(path: Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield a workbook's first sheet, a CSV or a Parquet file as DataFrames of at most `batch_size` rows."""
+    if path.suffix.lower() == ".csv":
+        return iter_csv_batches(path, batch_size)
+    if path.suffix.lower() == ".parquet":
+        return iter_parquet_batches(path, batch_size)
+    return iter_excel_batches(path, batch_size)
+
+
+def iter_excel_batches(path: Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Read a workbook's first sheet row by row with openpyxl's read-only mode.
+
+    The first row is the header. At least one (possibly empty) batch is
+    yielded so callers always see the columns.
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+
+        batch: list[tuple] = []
+        emitted = False
+        for row in rows:
+            batch.append(row[: len(columns)])
+            if len(batch) >= batch_size:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+                emitted = True
+        if batch or not emitted:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_csv_batches(path: Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Read a CSV file in chunks of `batch_size` rows."""
+    with pd.read_csv(path, chunksize=batch_size) as reader:
+        yield from reader
+
+
+def iter_parquet_batches(path: Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Read a Parquet file in record batches of at most `batch_size` rows."""
+    parquet_file = pq.ParquetFile(path)
+    emitted = False
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield batch.to_pandas()
+        emitted = True
+    if not emitted:
+        yield parquet_file.schema_arrow.empty_table().to_pandas()
+
+
+def write_arrow_file(batches: Iterable[pd.DataFrame], dest: Path, parse_dates: Iterable[str] = ()) -> int:
+    """Write batches to an uncompressed Arrow IPC file and return the row count.
+
+    Column types are inferred from each batch and widened when a later batch
+    needs it (see `widen_type`), e.g. whole numbers followed by a decimal or
+    an empty column that later holds text. Widening rewrites the rows written
+    so far in the wider types, one record batch at a time, so only one batch
+    is ever held in memory. Raises ValueError when a batch cannot be
+    converted (e.g. an unparseable date).
+    """
+    parse_dates = list(parse_dates)
+    observed = None  # Types seen so far; null for columns without a value yet
+    writer = None
+    rows = 0
+
+    try:
+        for batch in batches:
+            for col in parse_dates:
+                batch[col] = pd.to_datetime(batch[col])
+            widened = infer_schema(batch) if observed is None else widen_schema(observed, infer_schema(batch))
+            if writer is None:
+                writer = pa.ipc.new_file(str(dest), storage_schema(widened))
+            elif not storage_schema(widened).equals(storage_schema(observed)):
+                writer.close()
+                writer = _widen_file(dest, observed, widened)
+            observed = widened
+            writer.write_table(coerce_batch(batch, storage_schema(observed)))
+            rows += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return rows
+
+
+def infer_schema(df: pd.DataFrame) -> pa.Schema:
+    """Choose an Arrow type per column of a batch; columns holding no values get the null type."""
+    fields = []
+    for col in df.columns:
+        dtype = df[col].dtype
+        if df[col].isna().all():
+            arrow_type = pa.null()
+        elif pd.api.types.is_bool_dtype(dtype):
+            arrow_type = pa.bool_()
+        elif pd.api.types.is_integer_dtype(dtype):
+            arrow_type = pa.int64()
+        elif pd.api.types.is_float_dtype(dtype):
+            arrow_type = pa.float64()
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            arrow_type = pa.timestamp("ns")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(str(col), arrow_type))
+    return pa.schema(fields)
+
+
+def widen_type(current: pa.DataType, new: pa.DataType) -> pa.DataType:
+    """The narrowest type holding values of both types.
+
+    Null gives way to any type and int64 to float64; any other mix of
+    types becomes string.
+    """
+    if current.equals(new) or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    if {str(current), str(new)} == {"int64", "double"}:
+        return pa.float64()
+    return pa.string()
+
+
+def widen_schema(current: pa.Schema, new: pa.Schema) -> pa.Schema:
+    """Widen each column of `current` to also hold the types of a new batch."""
+    return pa.schema([pa.field(field.name, widen_type(field.type, new.field(field.name).type)) for field in current])
+
+
+def storage_schema(schema: pa.Schema) -> pa.Schema:
+    """The schema written to disk: columns that never held a value are float64, as pandas reads them."""
+    return pa.schema([pa.field(f.name, pa.float64() if pa.types.is_null(f.type) else f.type) for f in schema])
+
+
+def coerce_batch(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """Convert a batch to `schema`, casting column values as needed."""
+    arrays = []
+    for field in schema:
+        values = df[field.name]
+        try:
+            if pa.types.is_string(field.type):
+                values = values.where(values.isna(), values.astype(str))
+            elif pa.types.is_timestamp(field.type):
+                values = pd.to_datetime(values)
+            elif not pa.types.is_boolean(field.type):
+                values = pd.to_numeric(values)
+            arrays.append(pa.Array.from_pandas(values, type=field.type))
+        except (ValueError, TypeError, pa.ArrowException) as e:
+            raise ValueError(f"Column '{field.name}' does not match its inferred type {field.type}: {e}") from e
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _widen_file(dest: Path, observed: pa.Schema, widened: pa.Schema) -> pa.ipc.RecordBatchFileWriter:
+    """Rewrite the rows written so far in the widened types and return a writer to append to.
+
+    Columns that held no value yet are rewritten as nulls of their new type
+    rather than cast from their float64 placeholder.
+    """
+    schema = storage_schema(widened)
+    previous = dest.with_name(dest.name + ".widening")
+    dest.replace(previous)
+    writer = pa.ipc.new_file(str(dest), schema)
+    try:
+        with pa.memory_map(str(previous)) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                columns = [
+                    pa.nulls(batch.num_rows, field.type) if pa.types.is_null(old.type) else column.cast(field.type)
+                    for field, old, column in zip(schema, observed, batch.columns, strict=True)
+                ]
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+    except BaseException:
+        writer.close()
+        raise
+    finally:
+        previous.unlink(missing_ok=True)
+    return writer
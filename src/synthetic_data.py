@@ -0,0 +1,274 @@
+"""Vectorized synthetic billing data at any scale, written in bounded chunks."""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from .data_loader import DataLoader
+
+# Excel's row limit, including the header row
+EXCEL_MAX_ROWS = 1_048_576
+
+FORMATS = {"excel": ".xlsx", "csv": ".csv", "parquet": ".parquet"}
+
+INDUSTRIES = {"Technology": 0.2, "Legal Services": 0.2, "Finance": 0.2, "Consulting": 0.2, "Manufacturing": 0.2}
+
+# country: (share of clients, currency, tax rate)
+COUNTRIES = {
+    "UK": (0.25, "GBP", 0.20),
+    "US": (0.25, "USD", 0.0),
+    "Germany": (0.10, "EUR", 0.19),
+    "France": (0.08, "EUR", 0.20),
+    "Netherlands": (0.08, "EUR", 0.21),
+    "Spain": (0.07, "EUR", 0.21),
+    "Australia": (0.07, "AUD", 0.10),
+    "Sweden": (0.05, "SEK", 0.25),
+    "Japan": (0.05, "JPY", 0.10),
+}
+
+# service: (share of line items, min unit price, max unit price)
+SERVICES = {
+    "Contract Review": (0.20, 200.0, 350.0),
+    "Legal Consultation": (0.20, 150.0, 300.0),
+    "Document Drafting": (0.15, 100.0, 250.0),
+    "Compliance Audit": (0.10, 300.0, 500.0),
+    "IP Assessment": (0.08, 250.0, 400.0),
+    "Due Diligence": (0.10, 350.0, 600.0),
+    "Litigation Support": (0.07, 400.0, 700.0),
+    "Tax Advisory": (0.10, 200.0, 400.0),
+}
+
+_NAME_PREFIXES = np.array(
+    ["Acme", "Bright", "Global", "Nordic", "Summit", "Harbor", "Apex", "Crown", "Delta", "Vertex"]
+)
+_NAME_SUFFIXES = np.array(["Corp", "Legal", "Finance", "Consulting", "Partners", "Holdings", "Group", "Analytics"])
+
+
+@dataclass
+class Scale:
+    """Size of a generated dataset."""
+
+    clients: int = 1_000
+    invoices_per_month: float = 1_000.0  # Mean over all clients; monthly counts are Poisson
+    years: int = 1
+    line_items_per_invoice: float = 3.0  # Mean; every invoice has at least one
+    start_year: int = 2024
+
+
+def generate_clients(rng: np.random.Generator, count: int) -> pa.Table:
+    """Clients with unique ids and names, weighted industries and countries."""
+    numbers = np.arange(1, count + 1)
+    combos = len(_NAME_PREFIXES) * len(_NAME_SUFFIXES)
+    names = pc.binary_join_element_wise(
+        pa.array(_NAME_PREFIXES[(numbers - 1) % len(_NAME_PREFIXES)]),
+        pa.array(_NAME_SUFFIXES[(numbers - 1) // len(_NAME_PREFIXES) % len(_NAME_SUFFIXES)]),
+        " ",
+    )
+    if count > combos:
+        # Number the names once every prefix/suffix pair is taken
+        names = pc.binary_join_element_wise(names, _digits((numbers - 1) // combos + 1), " ")
+    slugs = pc.replace_substring(pc.utf8_lower(names), " ", "")
+
+    return pa.table(
+        {
+            "client_id": _ids("C", numbers, 3),
+            "name": names,
+            "industry": _choice(rng, INDUSTRIES, count),
+            "country": _choice(rng, COUNTRIES, count),
+            "contact_email": pc.binary_join_element_wise("contact@", slugs, ".example.com", ""),
+        }
+    )
+
+
+def generate_invoices(rng: np.random.Generator, clients: pa.Table, scale: Scale) -> pa.Table:
+    """Invoices spread over `scale.years`, with a few clients billed far more often than most.
+
+    Invoices due before the end of the period are mostly paid and otherwise
+    overdue; later ones are mostly pending.
+    """
+    months = scale.years * 12
+    per_month = rng.poisson(scale.invoices_per_month, months)
+    count = int(per_month.sum())
+
+    # Zipf-like client activity, shuffled so activity is unrelated to the id
+    weights = 1.0 / np.arange(1, clients.num_rows + 1) ** 1.1
+    client_rows = rng.permutation(clients.num_rows)[rng.choice(clients.num_rows, count, p=weights / weights.sum())]
+
+    month_starts = np.datetime64(f"{scale.start_year}-01", "M") + np.repeat(np.arange(months), per_month)
+    invoice_dates = month_starts.astype("datetime64[D]") + rng.integers(0, 28, count)
+    due_dates = invoice_dates + 30
+    period_end = np.datetime64(f"{scale.start_year + scale.years}-01-01", "D")
+
+    settled = rng.random(count)
+    status = np.where(
+        due_dates < period_end,
+        np.where(settled < 0.75, 0, 1),  # Paid or Overdue
+        np.where(settled < 1 / 3, 0, 2),  # Paid or Pending
+    )
+    currency_of = pa.array([currency for _, currency, _ in COUNTRIES.values()])
+    client_currency = currency_of.take(pc.index_in(clients["country"], value_set=pa.array(list(COUNTRIES))))
+
+    return pa.table(
+        {
+            "invoice_id": pc.binary_join_element_wise("I", _digits(np.arange(1001, 1001 + count)), ""),
+            "client_id": clients["client_id"].take(client_rows),
+            "invoice_date": pa.array(invoice_dates.astype("datetime64[s]")),
+            "due_date": pa.array(due_dates.astype("datetime64[s]")),
+            "status": _decode(status, ["Paid", "Overdue", "Pending"]),
+            "currency": client_currency.take(client_rows),
+        }
+    )
+
+
+def iter_line_items(
+    rng: np.random.Generator, invoices: pa.Table, clients: pa.Table, scale: Scale, chunk_rows: int = 1_000_000
+) -> Iterator[pa.Table]:
+    """Yield line items in chunks of about `chunk_rows` rows, whole invoices at a time.
+
+    Tax rates follow the client's country; unit prices are uniform within
+    each service's range.
+    """
+    counts = 1 + rng.poisson(max(scale.line_items_per_invoice - 1, 0), invoices.num_rows)
+    ends = np.cumsum(counts)
+    total = int(ends[-1]) if len(ends) else 0
+    width = max(4, len(str(total)))
+
+    tax_of = np.array([rate for _, _, rate in COUNTRIES.values()])
+    client_tax = tax_of[pc.index_in(clients["country"], value_set=pa.array(list(COUNTRIES))).to_numpy()]
+    invoice_tax = client_tax[pc.index_in(invoices["client_id"], value_set=clients["client_id"]).to_numpy()]
+
+    names = list(SERVICES)
+    shares = np.array([share for share, _, _ in SERVICES.values()])
+    low = np.array([low for _, low, _ in SERVICES.values()])
+    high = np.array([high for _, _, high in SERVICES.values()])
+
+    start_invoice = 0
+    while start_invoice < invoices.num_rows:
+        first_row = int(ends[start_invoice - 1]) if start_invoice else 0
+        stop_invoice = max(int(np.searchsorted(ends, first_row + chunk_rows, side="right")), start_invoice + 1)
+        invoice_rows = np.repeat(np.arange(start_invoice, stop_invoice), counts[start_invoice:stop_invoice])
+        rows = len(invoice_rows)
+
+        service = rng.choice(len(names), rows, p=shares / shares.sum())
+        unit_price = np.round(low[service] + rng.random(rows) * (high[service] - low[service]), 2)
+        yield pa.table(
+            {
+                "line_item_id": _ids("L", np.arange(first_row + 1, first_row + rows + 1), width),
+                "invoice_id": invoices["invoice_id"].take(invoice_rows),
+                "service_name": _decode(service, names),
+                "quantity": pa.array(rng.integers(1, 11, rows)),
+                "unit_price": pa.array(unit_price),
+                "tax_rate": pa.array(invoice_tax[invoice_rows]),
+            }
+        )
+        start_invoice = stop_invoice
+
+
+def write_dataset(
+    output_dir: Path | str,
+    scale: Scale,
+    fmt: str = "parquet",
+    chunk_rows: int = 1_000_000,
+    seed: int = 42,
+) -> dict[str, int]:
+    """Generate a dataset and write each table under the names DataLoader looks for.
+
+    Only one chunk of line items is in memory at a time. Returns the row
+    count per table. Raises ValueError for Excel output beyond its row limit.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    clients = generate_clients(rng, scale.clients)
+    invoices = generate_invoices(rng, clients, scale)
+    tables = {
+        "clients_df": iter([clients]),
+        "invoices_df": iter([invoices]),
+        "line_items_df": iter_line_items(rng, invoices, clients, scale, chunk_rows),
+    }
+
+    rows = {}
+    for name, (filename, _) in DataLoader.WORKBOOKS.items():
+        path = (output_dir / filename).with_suffix(FORMATS[fmt])
+        rows[name] = _write_chunks(tables[name], path, fmt)
+    return rows
+
+
+def _write_chunks(chunks: Iterator[pa.Table], path: Path, fmt: str) -> int:
+    """Write tables with the same schema to one file, chunk by chunk."""
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            if fmt == "excel":
+                if rows + chunk.num_rows >= EXCEL_MAX_ROWS:
+                    raise ValueError(f"{path.name} would exceed Excel's {EXCEL_MAX_ROWS:,} rows; use csv or parquet")
+                writer = writer or _ExcelWriter(path, chunk.schema)
+            elif fmt == "csv":
+                chunk = _dates_as_days(chunk)
+                writer = writer or pa_csv.CSVWriter(path, chunk.schema)
+            else:
+                writer = writer or pq.ParquetWriter(path, chunk.schema)
+            writer.write_table(chunk)
+            rows += chunk.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+class _ExcelWriter:
+    """Append Arrow tables to a streaming (write-only) workbook."""
+
+    def __init__(self, path: Path, schema: pa.Schema):
+        self.path = path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(schema.names)
+
+    def write_table(self, table: pa.Table) -> None:
+        columns = [column.to_pylist() for column in table.columns]
+        for row in zip(*columns, strict=True):
+            self.sheet.append(row)
+
+    def close(self) -> None:
+        self.workbook.save(self.path)
+
+
+def _dates_as_days(table: pa.Table) -> pa.Table:
+    """Cast timestamp columns to dates so CSV holds plain YYYY-MM-DD values."""
+    for i, column in enumerate(table.schema):
+        if pa.types.is_timestamp(column.type):
+            table = table.set_column(i, column.name, table.column(i).cast(pa.date32()))
+    return table
+
+
+def _choice(rng: np.random.Generator, weighted: dict, size: int) -> pa.Array:
+    """Draw keys of `weighted` by their share (the first element when values are tuples)."""
+    shares = np.array([value[0] if isinstance(value, tuple) else value for value in weighted.values()])
+    return _decode(rng.choice(len(weighted), size, p=shares / shares.sum()), list(weighted))
+
+
+def _decode(codes: np.ndarray, labels: list[str]) -> pa.Array:
+    """Strings from integer codes into `labels`, without building Python strings per row."""
+    return pa.DictionaryArray.from_arrays(codes.astype(np.int32), labels).cast(pa.string())
+
+
+def _digits(numbers: np.ndarray) -> pa.Array:
+    return pa.array(numbers).cast(pa.string())
+
+
+def _ids(prefix: str, numbers: np.ndarray, width: int) -> pa.Array:
+    """Ids such as C001: the prefix and the number zero-padded to at least `width` digits."""
+    width = max(width, len(str(int(numbers.max())))) if len(numbers) else width
+    return pc.binary_join_element_wise(prefix, pc.utf8_lpad(_digits(numbers), width, "0"), "")
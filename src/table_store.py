@@ -0,0 +1,169 @@
+"""Share loaded tables across pipelines and processes via memory-mapped Arrow files."""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from .fingerprint import combine_fingerprints, fingerprint_dataframe
+
+# Tables attached in this process, keyed by (store directory, dataset key).
+# Every pipeline attaching the same dataset receives the same DataFrame objects.
+_ATTACHED: dict[tuple[Path, str], dict[str, pd.DataFrame]] = {}
+_ATTACH_LOCK = threading.Lock()
+
+# Keep strings Arrow-backed so they stay views over the mapped buffers too
+_STRING_TYPES = {
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+}
+
+
+class SharedTableStore:
+    """Read-only table store backed by memory-mapped Arrow IPC files.
+
+    Each dataset is published once as one uncompressed Arrow IPC file per
+    table, under a directory named after the dataset's content fingerprint.
+    Attaching maps those files into memory, so every pipeline in this process
+    shares one set of DataFrames and every process on the host shares the
+    same physical pages through the OS page cache.
+
+    With `max_bytes`, publishing removes the least recently used datasets
+    until the store fits. Tables already mapped stay readable, since the
+    files live on until unmapped; a removed dataset is written again the
+    next time it is shared. Datasets that must stay on disk, such as the
+    ones sandbox workers map when they start, are pinned with `lease`.
+    """
+
+    def __init__(self, store_dir: Path | str, max_bytes: int | None = None):
+        self.store_dir = Path(store_dir).resolve()
+        self.max_bytes = max_bytes
+
+    def share(
+        self, dataframes: dict[str, pd.DataFrame], table_keys: dict[str, str] | None = None
+    ) -> dict[str, pd.DataFrame]:
+        """Publish `dataframes` if needed and return the shared, read-only copies."""
+        return self.attach(self.publish(dataframes, table_keys))
+
+    def publish(self, dataframes: dict[str, pd.DataFrame], table_keys: dict[str, str] | None = None) -> str:
+        """Write the tables to the store and return the dataset key.
+
+        `table_keys` holds fingerprints the caller already has for some of the
+        tables; only the others are hashed.
+        """
+        table_keys = table_keys or {}
+        key = combine_fingerprints(
+            {name: table_keys.get(name) or fingerprint_dataframe(df) for name, df in dataframes.items()}
+        )
+        dataset_dir = self.store_dir / key
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+
+        for name, df in dataframes.items():
+            path = dataset_dir / f"{name}.arrow"
+            if path.exists():
+                continue
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, path)
+
+        # The manifest is written last and records the table order
+        manifest = dataset_dir / "manifest.json"
+        if not manifest.exists():
+            tmp_path = manifest.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(list(dataframes)))
+            os.replace(tmp_path, manifest)
+        else:
+            os.utime(manifest)  # Mark as recently used
+
+        if self.max_bytes is not None:
+            self.evict(keep=key)
+        return key
+
+    def lease(self, key: str) -> Path:
+        """Pin a published dataset against eviction until the returned lease file is removed.
+
+        Touching the lease marks the dataset as recently used. Leases left
+        behind by processes that have exited are ignored and cleaned up.
+        """
+        path = self.store_dir / key / f"{os.getpid()}.{uuid.uuid4().hex}.lease"
+        path.touch()
+        return path
+
+    def evict(self, keep: str | None = None) -> list[str]:
+        """Remove the least recently used, unleased datasets until the store fits in `max_bytes`."""
+        datasets = []
+        for dataset_dir in self.store_dir.iterdir():
+            try:
+                files = [path.stat() for path in dataset_dir.iterdir()]
+            except OSError:  # Not a dataset, or removed concurrently
+                continue
+            last_used = max((stat.st_mtime for stat in files), default=0.0)
+            datasets.append((last_used, dataset_dir.name, sum(stat.st_size for stat in files)))
+
+        total = sum(size for _, _, size in datasets)
+        removed = []
+        for _, key, size in sorted(datasets):
+            if self.max_bytes is None or total <= self.max_bytes:
+                break
+            if key == keep or self._leased(key):
+                continue
+            shutil.rmtree(self.store_dir / key, ignore_errors=True)
+            self.detach(key)
+            total -= size
+            removed.append(key)
+        return removed
+
+    def _leased(self, key: str) -> bool:
+        """Whether a running process holds a lease on the dataset, removing stale leases."""
+        leased = False
+        for lease in (self.store_dir / key).glob("*.lease"):
+            if _process_alive(int(lease.name.split(".", 1)[0])):
+                leased = True
+            else:
+                lease.unlink(missing_ok=True)
+        return leased
+
+    def attach(self, key: str) -> dict[str, pd.DataFrame]:
+        """Map a published dataset into memory without copying its columns."""
+        cache_key = (self.store_dir, key)
+        with _ATTACH_LOCK:
+            if cache_key not in _ATTACHED:
+                dataset_dir = self.store_dir / key
+                manifest = dataset_dir / "manifest.json"
+                if not manifest.exists():
+                    raise KeyError(f"Dataset '{key}' has not been published to {self.store_dir}")
+                names = json.loads(manifest.read_text())
+                _ATTACHED[cache_key] = {name: read_mapped(dataset_dir / f"{name}.arrow") for name in names}
+            return _ATTACHED[cache_key]
+
+    def detach(self, key: str) -> None:
+        """Drop this process's reference to a dataset."""
+        with _ATTACH_LOCK:
+            _ATTACHED.pop((self.store_dir, key), None)
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt":  # Signal 0 is not a no-op there; keep the lease until it is released
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Alive, but owned by another user
+        return True
+    return True
+
+
+def read_mapped(path: Path) -> pd.DataFrame:
+    """Read an Arrow IPC file as a DataFrame whose columns view the mapped file."""
+    source = pa.memory_map(str(path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    # split_blocks avoids consolidating same-dtype columns into a new copy
+    return table.to_pandas(split_blocks=True, types_mapper=_STRING_TYPES.get)
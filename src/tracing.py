@@ -0,0 +1,284 @@
+"""Per-request spans, token counts and metrics for the chat pipeline."""
+
+import contextvars
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Protocol
+
+import pandas as pd
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # Optional - only needed for OpenTelemetryExporter
+    otel_trace = None
+
+# Usage fields of Anthropic responses summed into span attributes
+TOKEN_ATTRIBUTES = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+# Numeric span attributes the metrics aggregator keeps totals of
+COUNTED_ATTRIBUTES = (*TOKEN_ATTRIBUTES, "rows")
+
+_active_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("active_span", default=None)
+
+
+@dataclass(eq=False)
+class Span:
+    """A timed stage of a request."""
+
+    name: str
+    parent: "Span | None" = None
+    attributes: dict[str, object] = field(default_factory=dict)
+    start_ns: int = field(default_factory=time.time_ns)
+    duration: float | None = None  # Seconds, set when the span ends
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def set(self, **attributes: object) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: int) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+
+class Exporter(Protocol):
+    """Receives spans as they start and end."""
+
+    def on_start(self, span: Span) -> None: ...
+
+    def on_end(self, span: Span) -> None: ...
+
+
+class Trace:
+    """The spans of one request, rooted at a span covering all of it.
+
+    `span()` makes its span the active one while its block runs, so code
+    deeper in the stack (such as token accounting) can attach attributes.
+    Blocks must not yield: spans that stay open across a generator's
+    yields are opened with `start()` and closed with `end()` instead.
+    """
+
+    def __init__(self, name: str, exporters: list[Exporter] | None = None):
+        self.exporters = EXPORTERS if exporters is None else exporters
+        self.spans: list[Span] = []
+        self.root = self.start(name, parent=None)
+
+    def start(self, name: str, parent: Span | None = None, **attributes: object) -> Span:
+        """Open a span under `parent` (the root span by default)."""
+        span = Span(name, parent=parent if parent is not None or not self.spans else self.root, attributes=attributes)
+        self.spans.append(span)
+        for exporter in self.exporters:
+            exporter.on_start(span)
+        return span
+
+    def end(self, span: Span, **attributes: object) -> None:
+        """Close a span and hand it to the exporters."""
+        if span.duration is not None:
+            return
+        span.set(**attributes)
+        span.duration = time.perf_counter() - span._started
+        for exporter in self.exporters:
+            exporter.on_end(span)
+
+    @contextmanager
+    def span(self, name: str, parent: Span | None = None, **attributes: object) -> Iterator[Span]:
+        """Time a block as a span and make it the active span.
+
+        Without a `parent`, the span nests under the active span of this trace.
+        """
+        if parent is None:
+            active = _active_span.get()
+            parent = active if any(span is active for span in self.spans) else None
+        span = self.start(name, parent, **attributes)
+        token = _active_span.set(span)
+        try:
+            yield span
+        finally:
+            _active_span.reset(token)
+            self.end(span)
+
+    def iterate(self, span: Span, iterator: Iterator) -> Iterator:
+        """Make `span` active while each item of `iterator` is produced (e.g. streamed tokens)."""
+        while True:
+            token = _active_span.set(span)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _active_span.reset(token)
+            yield item
+
+    def finish(self, **attributes: object) -> None:
+        """Close the root span, and any span left open by an early return."""
+        for span in reversed(self.spans):
+            self.end(span, **(attributes if span is self.root else {}))
+
+    def timings(self) -> dict[str, float]:
+        """Seconds spent per stage (summed over attempts), plus the request total."""
+        timings: dict[str, float] = {}
+        for span in self.spans:
+            if span is not self.root and span.duration is not None:
+                timings[span.name] = timings.get(span.name, 0.0) + span.duration
+        timings["total"] = self.root.duration if self.root.duration is not None else 0.0
+        return timings
+
+    def tokens(self) -> dict[str, int]:
+        """Anthropic token usage summed over every request made."""
+        return {
+            key: sum(int(span.attributes.get(key, 0)) for span in self.spans)
+            for key in TOKEN_ATTRIBUTES
+            if any(key in span.attributes for span in self.spans)
+        }
+
+
+def record_usage(usage: object) -> None:
+    """Add the token counts of an Anthropic response to the active span, if any."""
+    span = _active_span.get()
+    if span is None or usage is None:
+        return
+    for key in TOKEN_ATTRIBUTES:
+        span.add(key, getattr(usage, key, None) or 0)
+
+
+def result_rows(result: object) -> int:
+    """Rows in an execution result: its length for frames and series, 1 for a scalar."""
+    if result is None:
+        return 0
+    if isinstance(result, pd.DataFrame | pd.Series):
+        return len(result)
+    return 1
+
+
+def format_timings(timings: dict[str, float], tokens: dict[str, int] | None = None) -> str:
+    """One-line summary of a request's stage timings and token usage."""
+    parts = [f"{stage} {seconds:.2f}s" for stage, seconds in timings.items() if stage not in ("total", "attempt")]
+    if "total" in timings:
+        parts.append(f"total {timings['total']:.2f}s")
+    if tokens:
+        parts.append(f"{tokens.get('input_tokens', 0):,} in / {tokens.get('output_tokens', 0):,} out tokens")
+    return " · ".join(parts)
+
+
+class MetricsAggregator:
+    """In-process totals per span name, exportable as Prometheus text."""
+
+    def __init__(self, prefix: str = "rag"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._count: dict[str, int] = {}
+        self._seconds: dict[str, float] = {}
+        self._totals: dict[tuple[str, str], float] = {}
+        self._flags: dict[tuple[str, str], int] = {}
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        with self._lock:
+            self._count[span.name] = self._count.get(span.name, 0) + 1
+            self._seconds[span.name] = self._seconds.get(span.name, 0.0) + (span.duration or 0.0)
+            for key in COUNTED_ATTRIBUTES:
+                if key in span.attributes:
+                    self._totals[(span.name, key)] = self._totals.get((span.name, key), 0) + span.attributes[key]
+            # True/False attributes such as hit or success are counted when true
+            for key, value in span.attributes.items():
+                if value is True:
+                    self._flags[(span.name, key)] = self._flags.get((span.name, key), 0) + 1
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Per span name: count, total seconds, attribute totals and true-flag counts."""
+        with self._lock:
+            stats = {name: {"count": count, "seconds": self._seconds[name]} for name, count in self._count.items()}
+            for (name, key), total in {**self._totals, **self._flags}.items():
+                stats[name][key] = total
+        return stats
+
+    def prometheus_text(self) -> str:
+        """Render the totals in the Prometheus text exposition format."""
+        with self._lock:
+            count, seconds = dict(self._count), dict(self._seconds)
+            totals, flags = dict(self._totals), dict(self._flags)
+
+        lines = [f"# TYPE {self.prefix}_span_seconds summary"]
+        for name in sorted(count):
+            lines.append(f'{self.prefix}_span_seconds_count{{span="{name}"}} {count[name]}')
+            lines.append(f'{self.prefix}_span_seconds_sum{{span="{name}"}} {seconds[name]:.6f}')
+        for key in COUNTED_ATTRIBUTES:
+            metric = f"{self.prefix}_{key}_total"
+            values = sorted((name, total) for (name, k), total in totals.items() if k == key)
+            if values:
+                lines.append(f"# TYPE {metric} counter")
+                lines.extend(f'{metric}{{span="{name}"}} {total:g}' for name, total in values)
+        if flags:
+            lines.append(f"# TYPE {self.prefix}_span_flag_total counter")
+            lines.extend(
+                f'{self.prefix}_span_flag_total{{span="{name}",flag="{key}"}} {total}'
+                for (name, key), total in sorted(flags.items())
+            )
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryExporter:
+    """Mirror spans to an OpenTelemetry tracer, keeping their parent links."""
+
+    def __init__(self, tracer=None):
+        if otel_trace is None:
+            raise ImportError("OpenTelemetryExporter requires the opentelemetry-api package")
+        self.tracer = tracer or otel_trace.get_tracer("aderant_task")
+        self._open: dict[Span, object] = {}
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span) -> None:
+        with self._lock:
+            parent = self._open.get(span.parent) if span.parent is not None else None
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = self.tracer.start_span(span.name, context=context, start_time=span.start_ns)
+        with self._lock:
+            self._open[span] = otel_span
+
+    def on_end(self, span: Span) -> None:
+        with self._lock:
+            otel_span = self._open.pop(span, None)
+        if otel_span is None:
+            return
+        otel_span.set_attributes({key: value for key, value in span.attributes.items() if value is not None})
+        otel_span.end(end_time=span.start_ns + int((span.duration or 0.0) * 1e9))
+
+
+# In-process totals for every pipeline in this process
+METRICS = MetricsAggregator()
+
+# Exporters used by traces that are not given their own list
+EXPORTERS: list[Exporter] = [METRICS]
+
+
+def add_exporter(exporter: Exporter) -> None:
+    """Send the spans of every subsequent request to `exporter` as well."""
+    if exporter not in EXPORTERS:
+        EXPORTERS.append(exporter)
+
+
+def serve_metrics(port: int, aggregator: MetricsAggregator = METRICS, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve the aggregator's Prometheus text at /metrics from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = aggregator.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
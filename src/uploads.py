@@ -0,0 +1,102 @@
+"""Parse uploaded workbooks once per file content."""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+
+import pandas as pd
+
+from .ingest import SheetTask, read_sheets, sheet_names
+
+
+def table_name(filename: str, taken: Iterable[str] = ()) -> str:
+    """Derive a DataFrame name from a file name (e.g., "Clients.xlsx" -> "clients_df").
+
+    The name is a valid Python identifier, so generated code can refer to
+    it: other characters become underscores and a leading digit gets a
+    "t_" prefix. Names in `taken` get a numeric suffix ("sales_2_df").
+    """
+    stem = re.sub(r"\.xlsx$", "", filename, flags=re.IGNORECASE).lower()
+    stem = re.sub(r"[^a-z0-9_]+", "_", stem).strip("_") or "table"
+    if stem[0].isdigit():
+        stem = f"t_{stem}"
+
+    taken = set(taken)
+    name = f"{stem}_df"
+    suffix = 2
+    while name in taken:
+        name = f"{stem}_{suffix}_df"
+        suffix += 1
+    return name
+
+
+class UploadCache:
+    """Keep parsed uploads in memory, keyed by a hash of each file's bytes.
+
+    Streamlit reruns the script on every interaction; with this cache each
+    distinct workbook is parsed once, however often it is re-submitted.
+    New workbooks are parsed in parallel, one sheet per worker process, and
+    every sheet of a multi-sheet workbook becomes its own table.
+    """
+
+    def __init__(self, max_entries: int = 32, workers: int | None = None):
+        self.max_entries = max_entries
+        self.workers = workers
+        # Content hash -> [(sheet name, table)]
+        self._workbooks: OrderedDict[str, list[tuple[str, pd.DataFrame]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, files: list[tuple[str, bytes]]) -> tuple[str, dict[str, pd.DataFrame]]:
+        """Return a key for this set of uploads and their parsed tables.
+
+        `files` holds (file name, content) pairs. The key changes whenever a
+        name or content changes, so it can key pipelines built on the tables.
+        """
+        digest = hashlib.sha256()
+        hashes = []
+        for name, data in files:
+            content_hash = hashlib.sha256(data).hexdigest()
+            digest.update(f"{name}\0{content_hash}\0".encode())
+            hashes.append(content_hash)
+
+        workbooks = self._parse_missing(dict(zip(hashes, (data for _, data in files), strict=True)))
+
+        dataframes = {}
+        for (name, _), content_hash in zip(files, hashes, strict=True):
+            sheets = workbooks[content_hash]
+            if len(sheets) == 1:
+                dataframes[table_name(name, dataframes)] = sheets[0][1]
+            else:
+                stem = re.sub(r"\.xlsx$", "", name, flags=re.IGNORECASE)
+                for sheet, df in sheets:
+                    dataframes[table_name(f"{stem} {sheet}", dataframes)] = df
+        return digest.hexdigest()[:32], dataframes
+
+    def _parse_missing(self, contents: dict[str, bytes]) -> dict[str, list[tuple[str, pd.DataFrame]]]:
+        """Return the sheets of every workbook, parsing uncached ones in parallel."""
+        with self._lock:
+            workbooks = {}
+            for content_hash in contents:
+                if content_hash in self._workbooks:
+                    self._workbooks.move_to_end(content_hash)
+                    workbooks[content_hash] = self._workbooks[content_hash]
+
+        missing = [content_hash for content_hash in contents if content_hash not in workbooks]
+        if not missing:
+            return workbooks
+
+        sheets = [(content_hash, sheet) for content_hash in missing for sheet in sheet_names(contents[content_hash])]
+        tasks = [
+            SheetTask(contents[content_hash], sheet_name=sheet, detect_dates=True) for content_hash, sheet in sheets
+        ]
+        for (content_hash, sheet), df in zip(sheets, read_sheets(tasks, max_workers=self.workers), strict=True):
+            workbooks.setdefault(content_hash, []).append((sheet, df))
+
+        with self._lock:
+            for content_hash in missing:
+                self._workbooks[content_hash] = workbooks[content_hash]
+            while len(self._workbooks) > self.max_entries:
+                self._workbooks.popitem(last=False)
+        return workbooks
@@ -0,0 +1,80 @@
+"""Pre-joined and pre-aggregated views over the billing tables."""
+
+import pandas as pd
+
+VIEW_DESCRIPTIONS = {
+    "billing_fact_df": (
+        "One row per line item with its invoice's client_id, invoice_date, status and currency "
+        "and the client_name, plus subtotal (quantity * unit_price), tax_amount and line_total (subtotal plus tax)"
+    ),
+    "monthly_client_totals_df": (
+        "Billing per client, currency and invoice month (month = first day of the month), "
+        "with subtotal, tax_amount, line_total, invoice_count and line_item_count"
+    ),
+}
+
+# Columns each base table needs for the views to be built
+REQUIRED_COLUMNS = {
+    "clients_df": {"client_id", "name"},
+    "invoices_df": {"invoice_id", "client_id", "invoice_date"},
+    "line_items_df": {"invoice_id", "quantity", "unit_price", "tax_rate"},
+}
+
+
+# Columns carried into the fact view when a table has them; the rest are a
+# merge away, and copying them for every line item costs too much memory
+FACT_COLUMNS = {
+    "line_items_df": ["line_item_id", "invoice_id", "service_name", "quantity", "unit_price", "tax_rate"],
+    "invoices_df": ["invoice_id", "client_id", "invoice_date", "status", "currency"],
+    "clients_df": ["client_id", "name"],
+}
+
+
+def build_views(dataframes: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+    """Build the views for a dataset, or return an empty dict if its tables do not fit.
+
+    Views are derived from the tables they are built with, so building them
+    again after the data changes refreshes them.
+    """
+    for name, columns in REQUIRED_COLUMNS.items():
+        if name not in dataframes or not columns <= set(dataframes[name].columns):
+            return {}
+
+    fact = build_billing_fact(dataframes["line_items_df"], dataframes["invoices_df"], dataframes["clients_df"])
+    return {
+        "billing_fact_df": fact,
+        "monthly_client_totals_df": build_monthly_client_totals(fact),
+    }
+
+
+def build_billing_fact(line_items: pd.DataFrame, invoices: pd.DataFrame, clients: pd.DataFrame) -> pd.DataFrame:
+    """Join line items to invoices and clients and compute the line amounts."""
+    line_items, invoices, clients = (
+        df[[col for col in FACT_COLUMNS[name] if col in df.columns]]
+        for name, df in (("line_items_df", line_items), ("invoices_df", invoices), ("clients_df", clients))
+    )
+    clients = clients.rename(columns={"name": "client_name"})
+    fact = line_items.merge(invoices, on="invoice_id", how="left", suffixes=("", "_invoice"))
+    fact = fact.merge(clients, on="client_id", how="left", suffixes=("", "_client"))
+
+    fact["subtotal"] = fact["quantity"] * fact["unit_price"]
+    fact["tax_amount"] = fact["subtotal"] * fact["tax_rate"]
+    fact["line_total"] = fact["subtotal"] + fact["tax_amount"]
+    return fact
+
+
+def build_monthly_client_totals(fact: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate the fact view per client, currency and invoice month."""
+    keys = ["client_id", "client_name"] + (["currency"] if "currency" in fact.columns else [])
+    monthly = fact.assign(month=fact["invoice_date"].dt.to_period("M").dt.to_timestamp())
+    return (
+        monthly.groupby(keys + ["month"], observed=True, dropna=False)
+        .agg(
+            subtotal=("subtotal", "sum"),
+            tax_amount=("tax_amount", "sum"),
+            line_total=("line_total", "sum"),
+            invoice_count=("invoice_id", "nunique"),
+            line_item_count=("invoice_id", "size"),
+        )
+        .reset_index()
+    )
@@ -1,12 +1,43 @@
 """Tests for the RAG pipeline components."""
 
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import pytest
 
 import config
+from src import ingest
+from src.answer_formatter import format_direct_answer
+from src.async_chat import AsyncChatPipeline
+from src.benchmark import ReplayClient, compare_reports, load_corpus, run_benchmark
+from src.chat import ChatPipeline
+from src.code_generator import CodeGenerator
+from src.common.constants import SAMPLE_QUESTIONS
 from src.data_loader import DataLoader
+from src.dtype_optimizer import optimize_dataframe, optimize_dataframes
 from src.executor import SafeCodeExecutor
+from src.indexes import build_indexes
+from src.polars_executor import PolarsExecutor
+from src.question_index import QuestionIndex
+from src.repair import repair_feedback
+from src.result_cache import ResultCache
+from src.sandbox import SandboxedExecutor
 from src.schema import generate_full_schema
+from src.schema_profile import ProfileStore, profile_dataframe
+from src.schema_retriever import SchemaRetriever
+from src.snapshot import SnapshotCache
+from src.sql_executor import SQLExecutor
+from src.streaming import write_arrow_file
+from src.synthetic_data import Scale, generate_clients, generate_invoices, iter_line_items, write_dataset
+from src.table_store import SharedTableStore
+from src.tracing import METRICS, MetricsAggregator, Trace, record_usage
+from src.uploads import UploadCache, table_name
+from src.views import build_views
 
 
 class TestDataLoader:
@@ -21,6 +52,30 @@ class TestDataLoader:
         assert "invoices_df" in dfs
         assert "line_items_df" in dfs
 
+    def test_warm_start_does_not_hash_rows(self, tmp_path, monkeypatch):
+        """Test that unchanged files key the table store, answer cache and profiles without hashing rows."""
+
+        def start():
+            return ChatPipeline(
+                data_dir=config.DATA_DIR,
+                api_key="test",
+                table_store=SharedTableStore(tmp_path / "tables"),
+                result_cache=ResultCache(tmp_path / "cache.sqlite"),
+                profile_store=ProfileStore(tmp_path / "profiles"),
+            )
+
+        first = start()
+        hashed = []
+        original = pd.util.hash_pandas_object
+        monkeypatch.setattr(
+            pd.util, "hash_pandas_object", lambda *args, **kwargs: hashed.append(1) or original(*args, **kwargs)
+        )
+        second = start()
+
+        assert hashed == []
+        assert second.dataset_key == first.dataset_key
+        assert len(list((tmp_path / "tables").iterdir())) == 1
+
     def test_clients_has_expected_columns(self):
         """Test that clients DataFrame has expected columns."""
         loader = DataLoader(config.DATA_DIR)
@@ -37,6 +92,280 @@ class TestDataLoader:
         assert pd.api.types.is_datetime64_any_dtype(dfs["invoices_df"]["invoice_date"])
         assert pd.api.types.is_datetime64_any_dtype(dfs["invoices_df"]["due_date"])
 
+    def test_parallel_load_matches_serial(self, tmp_path):
+        """Test that workbooks parsed in worker processes match in-process parsing."""
+        serial = DataLoader(config.DATA_DIR, use_snapshots=False, workers=1).load_all()
+        parallel = DataLoader(config.DATA_DIR, cache_dir=tmp_path, workers=3).load_all()
+
+        for name, df in serial.items():
+            pd.testing.assert_frame_equal(parallel[name], df)
+        assert len(list(tmp_path.glob("*.feather"))) == 3
+
+    def test_parsing_pool_is_reused(self):
+        """Test that loads share one pool whose workers are not forked from this process."""
+        DataLoader(config.DATA_DIR, use_snapshots=False, workers=2).load_all()
+        pool = ingest._POOL
+        DataLoader(config.DATA_DIR, use_snapshots=False, workers=2).load_all()
+
+        assert ingest._POOL is pool
+        assert pool._mp_context.get_start_method() != "fork"
+
+    def test_snapshot_matches_excel(self, tmp_path):
+        """Test that loading from snapshots preserves values and dtypes."""
+        from_excel = DataLoader(config.DATA_DIR, use_snapshots=False).load_all()
+        DataLoader(config.DATA_DIR, cache_dir=tmp_path).load_all()
+        from_snapshot = DataLoader(config.DATA_DIR, cache_dir=tmp_path).load_all()
+
+        assert len(list(tmp_path.glob("*.feather"))) == 3
+        for name, df in from_excel.items():
+            pd.testing.assert_frame_equal(from_snapshot[name], df)
+
+
+class TestStreamingIngest:
+    """Tests for batch-wise conversion to memory-mapped Arrow tables."""
+
+    def test_streamed_tables_match_excel(self, tmp_path):
+        """Test that streaming in small batches yields the same tables as pd.read_excel."""
+        parsed = DataLoader(config.DATA_DIR, use_snapshots=False, workers=1).load_all()
+        streamed = DataLoader(config.DATA_DIR, cache_dir=tmp_path, streaming=True, batch_size=7).load_all()
+
+        for name, df in parsed.items():
+            pd.testing.assert_frame_equal(streamed[name], df, check_dtype=False)
+        assert pd.api.types.is_datetime64_any_dtype(streamed["invoices_df"]["invoice_date"])
+
+    def test_csv_sources_are_streamed(self, tmp_path):
+        """Test that a CSV file stands in for a missing workbook."""
+        for name in ["Clients", "Invoices", "InvoiceLineItems"]:
+            pd.read_excel(config.DATA_DIR / f"{name}.xlsx").to_csv(tmp_path / f"{name}.csv", index=False)
+
+        dfs = DataLoader(tmp_path, streaming=True, batch_size=10).load_all()
+
+        assert len(dfs["line_items_df"]) == 89
+        assert pd.api.types.is_datetime64_any_dtype(dfs["invoices_df"]["due_date"])
+
+    def test_whole_numbers_widen_to_float(self, tmp_path):
+        """Test that a decimal after a batch of whole numbers widens the column instead of failing."""
+        batches = [pd.DataFrame({"discount": [0, 1]}), pd.DataFrame({"discount": [0.15, 2]})]
+
+        rows = write_arrow_file(batches, tmp_path / "table.arrow")
+        table = pa.ipc.open_file(str(tmp_path / "table.arrow")).read_all()
+
+        assert rows == 4
+        assert table.schema.field("discount").type == pa.float64()
+        assert table["discount"].to_pylist() == [0.0, 1.0, 0.15, 2.0]
+        assert not (tmp_path / "table.arrow.widening").exists()
+
+    def test_empty_first_batch_widens_to_later_type(self, tmp_path):
+        """Test that a column without values in the first batch takes the type of later values."""
+        batches = [
+            pd.DataFrame({"id": [1, 2], "notes": [None, None], "amount": [1, 2]}),
+            pd.DataFrame({"id": [3], "notes": ["late fee"], "amount": ["n/a"]}),
+        ]
+
+        write_arrow_file(batches, tmp_path / "table.arrow")
+        df = pa.ipc.open_file(str(tmp_path / "table.arrow")).read_all().to_pandas()
+
+        assert df["notes"].tolist() == [None, None, "late fee"]
+        assert df["amount"].tolist() == ["1", "2", "n/a"]
+        assert df["id"].dtype == "int64"
+
+    def test_unparseable_dates_fail_clearly(self, tmp_path):
+        """Test that values that cannot be converted raise ValueError."""
+        batches = [pd.DataFrame({"due": ["2024-01-01"]}), pd.DataFrame({"due": ["soon"]})]
+
+        with pytest.raises(ValueError):
+            write_arrow_file(batches, tmp_path / "table.arrow", parse_dates=["due"])
+
+
+class TestSyntheticData:
+    """Tests for the scalable synthetic data generator."""
+
+    SMALL = Scale(clients=20, invoices_per_month=30, years=1, line_items_per_invoice=3)
+
+    @pytest.mark.parametrize("fmt", ["csv", "parquet"])
+    def test_dataset_loads_like_sample_data(self, tmp_path, fmt):
+        """Test that generated files load through DataLoader with the sample data's columns."""
+        rows = write_dataset(tmp_path / "data", self.SMALL, fmt=fmt, chunk_rows=50)
+        sample = DataLoader(config.DATA_DIR).load_all()
+
+        for streaming in (False, True):
+            dfs = DataLoader(tmp_path / "data", cache_dir=tmp_path / "cache", streaming=streaming).load_all()
+            for name, df in dfs.items():
+                assert list(df.columns) == list(sample[name].columns)
+                assert len(df) == rows[name]
+            assert pd.api.types.is_datetime64_any_dtype(dfs["invoices_df"]["invoice_date"])
+
+    def test_keys_are_unique_and_consistent(self):
+        """Test that ids are unique and chunks split on invoice boundaries."""
+        rng = np.random.default_rng(0)
+        clients = generate_clients(rng, 250)
+        invoices = generate_invoices(rng, clients, self.SMALL)
+        chunks = list(iter_line_items(rng, invoices, clients, self.SMALL, chunk_rows=40))
+        line_items = pd.concat([chunk.to_pandas() for chunk in chunks])
+
+        assert len(chunks) > 1
+        assert len(clients["name"].unique()) == 250
+        assert len(invoices["invoice_id"].unique()) == invoices.num_rows
+        assert line_items["line_item_id"].is_unique and line_items["line_item_id"].is_monotonic_increasing
+        assert set(line_items["invoice_id"]) == set(invoices["invoice_id"].to_pylist())
+        assert set(invoices["client_id"].to_pylist()) <= set(clients["client_id"].to_pylist())
+        for earlier, later in zip(chunks, chunks[1:], strict=False):
+            assert earlier["invoice_id"][-1] != later["invoice_id"][0]
+
+    def test_excel_row_limit_raises(self, tmp_path, monkeypatch):
+        """Test that Excel output beyond the sheet row limit fails clearly."""
+        monkeypatch.setattr("src.synthetic_data.EXCEL_MAX_ROWS", 100)
+
+        with pytest.raises(ValueError, match="use csv or parquet"):
+            write_dataset(tmp_path, self.SMALL, fmt="excel")
+
+
+class TestUploadCache:
+    """Tests for parsing uploaded workbooks once."""
+
+    def test_uploads_parsed_once_per_content(self, monkeypatch):
+        """Test that re-submitted files reuse the parsed tables and dates are detected."""
+        files = [(name, (config.DATA_DIR / name).read_bytes()) for name in ["Clients.xlsx", "Invoices.xlsx"]]
+        reads = []
+        original = pd.read_excel
+
+        def counting_read_excel(*args, **kwargs):
+            reads.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(pd, "read_excel", counting_read_excel)
+        cache = UploadCache()
+        key, dfs = cache.load(files)
+        again_key, again = cache.load(files)
+
+        assert len(reads) == 2
+        assert again_key == key
+        assert again["invoices_df"] is dfs["invoices_df"]
+        assert pd.api.types.is_datetime64_any_dtype(dfs["invoices_df"]["invoice_date"])
+
+    def test_sheets_parsed_in_worker_processes(self, tmp_path):
+        """Test that each sheet of a multi-sheet upload becomes a table, parsed across a pool."""
+        path = tmp_path / "Book.xlsx"
+        with pd.ExcelWriter(path) as writer:
+            pd.DataFrame({"a": [1, 2], "created_at": ["2024-01-01", "2024-02-01"]}).to_excel(
+                writer, sheet_name="First", index=False
+            )
+            pd.DataFrame({"b": ["x", "y", "z"]}).to_excel(writer, sheet_name="Second", index=False)
+
+        _, dfs = UploadCache(workers=2).load([("Book.xlsx", path.read_bytes())])
+
+        assert list(dfs) == ["book_first_df", "book_second_df"]
+        assert pd.api.types.is_datetime64_any_dtype(dfs["book_first_df"]["created_at"])
+        assert dfs["book_second_df"]["b"].tolist() == ["x", "y", "z"]
+
+    def test_key_changes_with_content(self):
+        """Test that a changed file yields a new key."""
+        cache = UploadCache()
+        data = (config.DATA_DIR / "Clients.xlsx").read_bytes()
+        key, _ = cache.load([("Clients.xlsx", data)])
+        other_key, _ = cache.load([("Clients.xlsx", (config.DATA_DIR / "Invoices.xlsx").read_bytes())])
+
+        assert key != other_key
+
+    def test_table_names_are_identifiers(self):
+        """Test that names from arbitrary file and sheet names can be used in generated code."""
+        names = []
+        for filename in ["Q1-Sales (final).xlsx", "2024.report.XLSX", "Q1 Sales final.xlsx", "Ünïcode.xlsx"]:
+            names.append(table_name(filename, names))
+
+        assert names == ["q1_sales_final_df", "t_2024_report_df", "q1_sales_final_2_df", "n_code_df"]
+        assert all(name.isidentifier() for name in names)
+
+
+class TestSnapshotCache:
+    """Tests for the workbook snapshot cache."""
+
+    def test_snapshot_reused_until_source_changes(self, tmp_path):
+        """Test that the reader only runs again after the source file changes."""
+        source = tmp_path / "Table.xlsx"
+        pd.DataFrame({"a": [1, 2]}).to_excel(source, index=False)
+        cache = SnapshotCache(tmp_path / "cache")
+        calls = []
+
+        def reader(path):
+            calls.append(path)
+            return pd.read_excel(path)
+
+        cache.load(source, reader)
+        cache.load(source, reader)
+        assert len(calls) == 1
+
+        pd.DataFrame({"a": [1, 2, 3]}).to_excel(source, index=False)
+        df = cache.load(source, reader)
+        assert len(calls) == 2
+        assert len(df) == 3
+        assert len(list((tmp_path / "cache").glob("*.feather"))) == 1
+
+
+class TestSharedTableStore:
+    """Tests for the memory-mapped table store."""
+
+    @pytest.fixture
+    def dfs(self):
+        """Load the sample tables."""
+        return DataLoader(config.DATA_DIR).load_all()
+
+    def test_shared_tables_match_source(self, dfs, tmp_path):
+        """Test that shared tables keep their values, order and dates."""
+        shared = SharedTableStore(tmp_path).share(dfs)
+
+        assert list(shared) == list(dfs)
+        assert shared["line_items_df"]["quantity"].tolist() == dfs["line_items_df"]["quantity"].tolist()
+        assert shared["clients_df"]["name"].tolist() == dfs["clients_df"]["name"].tolist()
+        assert pd.api.types.is_datetime64_any_dtype(shared["invoices_df"]["invoice_date"])
+
+    def test_pipelines_share_one_copy(self, dfs, tmp_path):
+        """Test that attaching twice returns the same read-only DataFrames."""
+        first = SharedTableStore(tmp_path).share(dfs)
+        second = SharedTableStore(tmp_path).share(dfs)
+
+        assert first["line_items_df"] is second["line_items_df"]
+        assert not first["line_items_df"]["unit_price"].to_numpy().flags.writeable
+
+    def test_executor_does_not_mutate_shared_tables(self, dfs, tmp_path):
+        """Test that generated code adding columns leaves the shared tables untouched."""
+        shared = SharedTableStore(tmp_path).share(dfs)
+        executor = SafeCodeExecutor(shared)
+
+        result = executor.execute("line_items_df['total'] = line_items_df['quantity'] * 2\nresult = line_items_df")
+
+        assert result.success
+        assert "total" not in shared["line_items_df"].columns
+
+    def test_least_recently_used_datasets_are_evicted(self, dfs, tmp_path):
+        """Test that publishing beyond the size limit removes the oldest other datasets."""
+        store = SharedTableStore(tmp_path, max_bytes=1)
+        first = store.share({"clients_df": dfs["clients_df"]})
+        first_key = store.publish({"clients_df": dfs["clients_df"]})
+        second_key = store.publish({"invoices_df": dfs["invoices_df"]})
+
+        assert [path.name for path in tmp_path.iterdir()] == [second_key]
+        assert first["clients_df"]["name"].tolist() == dfs["clients_df"]["name"].tolist()
+        assert store.share({"clients_df": dfs["clients_df"]})["clients_df"] is not first["clients_df"]
+        assert first_key != second_key
+
+    def test_datasets_in_use_by_a_sandbox_are_not_evicted(self, dfs, tmp_path):
+        """Test that a sandbox can still replace a worker after other datasets are published."""
+        store = SharedTableStore(tmp_path, max_bytes=1)
+        sandbox = SandboxedExecutor(dfs, workers=1, timeout_seconds=2, table_store=store)
+        try:
+            store.publish({"things_df": pd.DataFrame({"a": [1, 2, 3]})})
+            timed_out = sandbox.execute("while True:\n    pass")
+            result = sandbox.execute("result = len(clients_df)")
+        finally:
+            sandbox.close()
+        store.publish({"other_df": pd.DataFrame({"b": [1]})})
+
+        assert "timed out" in timed_out.error
+        assert result.success and result.result == 10
+        assert len(list(tmp_path.iterdir())) == 1  # Released on close, so evicted by the next publish
+        assert not list(tmp_path.glob("*/*.lease"))
+
 
 class TestSchemaGeneration:
     """Tests for schema generation."""
@@ -61,6 +390,244 @@ class TestSchemaGeneration:
         assert "invoice_id" in schema
 
 
+class TestDtypeOptimization:
+    """Tests for the compact dtype pass."""
+
+    def test_optimized_tables_keep_values_and_use_less_memory(self):
+        """Test that optimization is lossless and shrinks the sample tables."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        optimized, report = optimize_dataframes(dfs)
+
+        for name, df in dfs.items():
+            pd.testing.assert_frame_equal(optimized[name], df, check_dtype=False, check_categorical=False)
+            assert report[name].after < report[name].before
+        assert isinstance(optimized["invoices_df"]["status"].dtype, pd.CategoricalDtype)
+        assert optimized["line_items_df"]["quantity"].dtype == "int64"
+
+    def test_integer_arithmetic_does_not_overflow(self):
+        """Test that arithmetic on optimized integer columns gives the same values as before."""
+        df = pd.DataFrame({"quantity": [5, 9, 1, 3, 10]})
+        optimized = optimize_dataframe(df)
+
+        assert (optimized["quantity"] * 100).tolist() == [500, 900, 100, 300, 1000]
+        assert (optimized["quantity"] * 1_000_000_000).tolist() == (df["quantity"] * 1_000_000_000).tolist()
+
+    def test_float_sums_keep_full_precision(self):
+        """Test that float columns stay float64, so large sums do not drift."""
+        df = optimize_dataframe(pd.DataFrame({"amount": [1500.25] * 1_000_000}))
+
+        assert df["amount"].dtype == "float64"
+        assert df["amount"].sum() == pytest.approx(1_500_250_000.0, abs=1e-3)
+
+    def test_schema_describes_optimized_columns(self):
+        """Test that the schema names categorical columns and how to group them."""
+        dfs = DataLoader(config.DATA_DIR, optimize_dtypes=True).load_all()
+        schema = generate_full_schema(dfs)
+
+        assert "status (categorical string)" in schema
+        assert "line_item_id (string)" in schema
+        assert "observed=True" in schema
+
+
+class TestMaterializedViews:
+    """Tests for the pre-joined billing views."""
+
+    def test_views_match_manual_join(self):
+        """Test that the fact view and monthly totals agree with the base tables."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        views = build_views(dfs)
+        items = dfs["line_items_df"]
+        expected_total = (items["quantity"] * items["unit_price"] * (1 + items["tax_rate"])).sum()
+
+        assert len(views["billing_fact_df"]) == len(items)
+        assert views["billing_fact_df"]["line_total"].sum() == pytest.approx(expected_total)
+        assert views["monthly_client_totals_df"]["line_total"].sum() == pytest.approx(expected_total)
+
+    def test_fact_view_carries_only_needed_columns(self):
+        """Test that the fact view leaves out columns that are only a merge away."""
+        fact = build_views(DataLoader(config.DATA_DIR).load_all())["billing_fact_df"]
+
+        assert {"client_name", "invoice_date", "currency", "line_total"} <= set(fact.columns)
+        assert not {"due_date", "industry", "contact_email"} & set(fact.columns)
+
+    def test_large_datasets_skip_views_and_indexes(self):
+        """Test that views and indexes are left out above the row threshold."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        pipeline = ChatPipeline(
+            dataframes=dfs, api_key="test", materialized_views=True, key_indexes=True, derived_tables_max_rows=10
+        )
+
+        assert pipeline.views == {}
+        assert pipeline.indexes == []
+        assert "billing_fact_df" not in pipeline.schema
+
+    def test_unrelated_tables_get_no_views(self):
+        """Test that datasets without the billing tables are left alone."""
+        assert build_views({"things_df": pd.DataFrame({"a": [1]})}) == {}
+
+    def test_views_available_to_generated_code(self):
+        """Test that the pipeline exposes and describes the views."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        pipeline = ChatPipeline(dataframes=dfs, api_key="test", materialized_views=True)
+        result = pipeline.executor.execute("result = billing_fact_df.groupby('client_name')['line_total'].sum()")
+
+        assert result.success
+        assert "monthly_client_totals_df" in pipeline.schema
+
+
+class TestKeyIndexes:
+    """Tests for key indexes and join maps."""
+
+    @pytest.fixture
+    def indexes(self):
+        """Indexes over the sample tables, by name."""
+        return {index.name: index for index in build_indexes(DataLoader(config.DATA_DIR).load_all())}
+
+    def test_primary_key_index_shares_columns(self, indexes):
+        """Test that primary-key views are hash-indexed without copying the table."""
+        clients = indexes["clients_by_client_id"].value
+
+        assert clients.index.is_unique
+        assert clients.loc["C001", "name"] == "Acme Corp"
+
+    def test_join_map_matches_merge(self, indexes):
+        """Test that the precomputed join positions reproduce a merge."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        joined = dfs["invoices_df"].iloc[indexes["line_items_to_invoices"].value]
+        merged = dfs["line_items_df"].merge(dfs["invoices_df"], on="invoice_id", how="left")
+
+        assert joined["client_id"].tolist() == merged["client_id"].tolist()
+
+    def test_pipeline_exposes_and_describes_indexes(self):
+        """Test that generated code can use the indexes listed in the schema."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        pipeline = ChatPipeline(dataframes=dfs, api_key="test", key_indexes=True)
+        result = pipeline.executor.execute("result = len(line_items_by_invoice_id.loc['I1001'])")
+
+        assert result.success
+        assert result.result == (dfs["line_items_df"]["invoice_id"] == "I1001").sum()
+        assert "line_items_to_invoices" in pipeline.schema
+
+    def test_join_map_assigns_onto_child(self):
+        """Test that the described use of a join map puts parent values on the right child rows."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        pipeline = ChatPipeline(dataframes=dfs, api_key="test", key_indexes=True)
+        result = pipeline.executor.execute(
+            "items = line_items_df.copy()\n"
+            "items['client_id'] = invoices_df['client_id'].to_numpy()[line_items_to_invoices]\n"
+            "result = items"
+        )
+        merged = dfs["line_items_df"].merge(dfs["invoices_df"], on="invoice_id", how="left")
+
+        assert result.success
+        assert result.result["client_id"].tolist() == merged["client_id"].tolist()
+        assert "to_numpy()[line_items_to_invoices]" in pipeline.schema
+
+    def test_indexed_views_merge_and_group_by_key(self, indexes):
+        """Test that the key columns of indexed views can still be used by name."""
+        invoices = indexes["invoices_by_invoice_id"].value
+        line_items = indexes["line_items_by_invoice_id"].value
+
+        merged = line_items.merge(invoices, on="invoice_id")
+        per_client = merged.groupby("client_id")["quantity"].sum()
+
+        assert len(merged) == len(line_items)
+        assert per_client.sum() == line_items["quantity"].sum()
+
+    def test_large_tables_get_no_sorted_copy(self):
+        """Test that the sorted foreign-key copy is skipped above the size limit."""
+        names = {index.name for index in build_indexes(DataLoader(config.DATA_DIR).load_all(), max_sorted_copy_bytes=0)}
+
+        assert "line_items_by_invoice_id" not in names
+        assert {"invoices_by_invoice_id", "line_items_to_invoices"} <= names
+
+
+class TestSchemaProfiles:
+    """Tests for precomputed column statistics."""
+
+    def test_profile_statistics(self):
+        """Test ranges, distinct counts, top values and null ratios."""
+        df = pd.DataFrame({"amount": [5, 1, 9, 3], "status": ["Paid", "Paid", "Sent", None]})
+        profile = profile_dataframe(df)
+
+        amount = profile.column("amount")
+        assert (amount.min, amount.max, amount.distinct_count) == (1, 9, 4)
+        status = profile.column("status")
+        assert status.top_values() == [("Paid", 2), ("Sent", 1)]
+        assert status.null_ratio == 0.25
+
+    @pytest.mark.parametrize("keys", [(None, None), ("v1", "v2")], ids=["fingerprints", "caller-keys"])
+    def test_appended_rows_update_profile_incrementally(self, tmp_path, monkeypatch, keys):
+        """Test that appending rows merges into the stored profile instead of recomputing it."""
+        store = ProfileStore(tmp_path)
+        df = pd.DataFrame({"amount": [1, 2], "status": ["Paid", "Sent"]})
+        store.get("invoices_df", df, key=keys[0])
+
+        profiled_rows = []
+        original = profile_dataframe
+
+        def spy(frame):
+            profiled_rows.append(len(frame))
+            return original(frame)
+
+        monkeypatch.setattr("src.schema_profile.profile_dataframe", spy)
+        grown = pd.concat([df, pd.DataFrame({"amount": [7], "status": ["Paid"]})], ignore_index=True)
+        profile = store.get("invoices_df", grown, key=keys[1])
+
+        assert profiled_rows == [1]
+        assert profile.rows == 3
+        assert profile.column("amount").max == 7
+        assert profile.column("status").top_values()[0] == ("Paid", 2)
+        assert ProfileStore(tmp_path).get("invoices_df", grown, key=keys[1]) == profile
+
+    def test_schema_uses_profiles(self, tmp_path):
+        """Test that the pipeline describes columns from stored profiles."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        pipeline = ChatPipeline(dataframes=dfs, api_key="test", profile_store=ProfileStore(tmp_path))
+
+        assert "distinct" in pipeline.schema
+        assert "range " in pipeline.schema
+        assert len(list(tmp_path.glob("*.json"))) == len(dfs)
+
+
+class TestSchemaRetriever:
+    """Tests for relevance-pruned schemas."""
+
+    @pytest.fixture
+    def dfs(self):
+        """Sample tables plus unrelated ones, enough to enable pruning."""
+        dfs = dict(DataLoader(config.DATA_DIR).load_all())
+        for topic in ["employees", "projects", "offices", "vendors", "assets"]:
+            dfs[f"{topic}_df"] = pd.DataFrame({f"{topic[:-1]}_id": [1, 2], "label": [f"{topic} a", f"{topic} b"]})
+        return dfs
+
+    def test_small_datasets_use_full_schema(self):
+        """Test that the three sample tables are never pruned."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        retriever = SchemaRetriever(dfs)
+
+        assert retriever.select_tables("Which invoices are overdue?") is None
+        assert retriever.schema_for("Which invoices are overdue?") == generate_full_schema(dfs)
+
+    def test_selects_matching_table(self, dfs):
+        """Test that a question about one table only gets that table."""
+        tables = SchemaRetriever(dfs).select_tables("Which invoices are marked as Overdue?")
+
+        assert tables == ["invoices_df"]
+
+    def test_adds_join_path(self, dfs):
+        """Test that tables on the join path between matches are included."""
+        tables = SchemaRetriever(dfs).select_tables("Total quantity of Contract Review per client industry")
+
+        assert set(tables) == {"clients_df", "invoices_df", "line_items_df"}
+
+    def test_falls_back_when_unsure(self, dfs):
+        """Test that questions matching no table get the full schema."""
+        retriever = SchemaRetriever(dfs)
+
+        assert retriever.select_tables("What is going on?") is None
+
+
 class TestSafeExecutor:
     """Tests for safe code execution."""
 
@@ -122,3 +689,780 @@ result = merged[['invoice_id', 'name']]
         assert result.success
         assert isinstance(result.result, pd.DataFrame)
         assert "name" in result.result.columns
+
+    def test_repeated_code_is_validated_once(self, executor, monkeypatch):
+        """Test that identical snippets reuse the cached compiled code."""
+        import src.executor
+
+        parses = []
+        original_parse = src.executor.ast.parse
+        monkeypatch.setattr(src.executor.ast, "parse", lambda code: parses.append(code) or original_parse(code))
+
+        first = executor.execute("result = len(invoices_df)")
+        second = executor.execute("result = len(invoices_df)")
+        blocked = [executor.execute("import os"), executor.execute("import os")]
+
+        assert first.success and second.success
+        assert second.result == first.result
+        assert all(not r.success for r in blocked)
+        assert len(parses) == 2
+
+
+class TestSQLExecutor:
+    """Tests for the SQL execution engine."""
+
+    QUERY = (
+        "SELECT c.name, SUM(li.quantity * li.unit_price * (1 + li.tax_rate)) AS total "
+        "FROM line_items_df li JOIN invoices_df i ON li.invoice_id = i.invoice_id "
+        "JOIN clients_df c ON i.client_id = c.client_id GROUP BY c.name ORDER BY total DESC"
+    )
+
+    @pytest.fixture(params=["sqlite", "duckdb"])
+    def executor(self, request):
+        """SQL executor over the sample data for each available backend."""
+        if request.param == "duckdb":
+            pytest.importorskip("duckdb")
+        executor = SQLExecutor(DataLoader(config.DATA_DIR).load_all(), backend=request.param)
+        yield executor
+        executor.close()
+
+    def test_query_matches_pandas(self, executor):
+        """Test that a join and aggregation gives the same totals as pandas."""
+        dfs = executor.dataframes
+        merged = (
+            dfs["line_items_df"].merge(dfs["invoices_df"], on="invoice_id").merge(dfs["clients_df"], on="client_id")
+        )
+        expected = (merged["quantity"] * merged["unit_price"] * (1 + merged["tax_rate"])).groupby(merged["name"]).sum()
+        result = executor.execute(self.QUERY)
+
+        assert result.success
+        assert isinstance(result.result, pd.DataFrame)
+        assert result.result.set_index("name")["total"].to_dict() == pytest.approx(expected.to_dict())
+
+    def test_only_single_select_allowed(self, executor):
+        """Test that statements other than one SELECT are rejected before running."""
+        assert not executor.execute("DROP TABLE clients_df").success
+        assert not executor.execute("SELECT 1; DELETE FROM clients_df").success
+        assert executor.execute("SELECT 'drop table' AS text -- DROP\n").success
+
+    def test_pipeline_generates_sql(self):
+        """Test that engine='sql' sends the SQL prompt and runs the reply as SQL."""
+        client = SimpleNamespace(messages=FakeMessages([SimpleNamespace(input_tokens=10)]))
+        client.messages.reply = "SELECT COUNT(*) AS n FROM invoices_df\n```"
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, client=client, engine="sql", direct_answers=True)
+        response = pipeline.ask("How many invoices?")
+
+        assert "SQL" in client.messages.requests[0]["system"][0]["text"]
+        assert response.success
+        assert response.answer == "Count: **31**"
+
+    def test_schema_describes_tables_for_sql(self):
+        """Test that the SQL schema names database tables and leaves out pandas-only hints."""
+        dfs = DataLoader(config.DATA_DIR, optimize_dtypes=True).load_all()
+        schema = generate_full_schema(dfs, engine="sql")
+
+        assert "following database tables" in schema
+        assert "pandas" not in schema
+        assert "observed=True" not in schema
+
+
+class TestPolarsExecutor:
+    """Tests for the lazy Polars engine."""
+
+    @pytest.fixture
+    def executor(self):
+        """Polars executor over the sample data (skipped without polars)."""
+        pytest.importorskip("polars")
+        return PolarsExecutor(DataLoader(config.DATA_DIR).load_all())
+
+    def test_lazy_result_collected_to_pandas(self, executor):
+        """Test that a lazy query is collected and returned as a pandas DataFrame."""
+        code = (
+            "result = line_items_df.join(invoices_df, on='invoice_id')"
+            ".group_by('client_id').agg(pl.col('quantity').sum()).sort('client_id')"
+        )
+        result = executor.execute(code)
+        dfs = executor.dataframes
+        expected = (
+            dfs["line_items_df"].merge(dfs["invoices_df"], on="invoice_id").groupby("client_id")["quantity"].sum()
+        )
+
+        assert result.success
+        assert isinstance(result.result, pd.DataFrame)
+        assert result.result.set_index("client_id")["quantity"].to_dict() == expected.to_dict()
+
+    def test_file_io_blocked(self, executor):
+        """Test that Polars readers and writers are rejected."""
+        result = executor.execute("result = pl.scan_csv('/etc/passwd')")
+
+        assert not result.success
+        assert "scan_csv" in result.error
+
+    def test_categorical_keys_join(self):
+        """Test that tables with optimized dtypes can still be joined."""
+        pytest.importorskip("polars")
+        dfs, _ = optimize_dataframes(DataLoader(config.DATA_DIR).load_all())
+        result = PolarsExecutor(dfs).execute(
+            "result = line_items_df.join(invoices_df, on='invoice_id').select(pl.len())"
+        )
+
+        assert result.success
+        assert result.result.iat[0, 0] == len(dfs["line_items_df"])
+
+    def test_schema_describes_lazy_frames(self):
+        """Test that the Polars schema names LazyFrames and leaves out pandas-only hints."""
+        dfs = DataLoader(config.DATA_DIR, optimize_dtypes=True).load_all()
+        schema = generate_full_schema(dfs, engine="polars")
+
+        assert "following Polars LazyFrames" in schema
+        assert "pandas" not in schema
+        assert "observed=True" not in schema
+
+
+class TestBenchmark:
+    """Tests for the offline benchmark harness."""
+
+    @pytest.fixture
+    def corpus(self):
+        return load_corpus(config.PROJECT_ROOT / "benchmarks" / "corpus.json")
+
+    def test_corpus_covers_sample_questions(self, corpus):
+        """Test that every sidebar question has a recording for each language."""
+        recorded = {entry["question"]: entry for entry in corpus}
+
+        for question in SAMPLE_QUESTIONS:
+            assert {"python", "polars", "sql", "answer"} <= set(recorded[question])
+
+    def test_replay_client_serves_pipeline(self, corpus):
+        """Test that recorded code answers correctly through the pipeline without a network."""
+        client = ReplayClient(corpus)
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, client=client)
+        response = pipeline.ask("Which clients are based in the UK?")
+
+        assert response.success
+        assert response.generated_code == 'result = clients_df[clients_df["country"] == "UK"]'
+        assert response.answer == "The clients based in the UK are shown above."
+        assert client.requests == 2
+        assert response.tokens["input_tokens"] > 0
+
+    def test_report_is_machine_readable(self, corpus):
+        """Test that a run produces a JSON report that can be compared with another."""
+        report = run_benchmark(corpus[:3], config.DATA_DIR, repeats=2, concurrency=2, engine="sql")
+        data = json.loads(report.to_json())
+
+        assert data["throughput"]["questions"] == 6
+        assert data["throughput"]["failures"] == 0
+        assert [q["failures"] for q in data["questions"]] == [0, 0, 0]
+        assert {"generate_code", "execute", "total"} <= set(data["stages"])
+        assert data["metadata"]["options"] == {"engine": "sql"}
+        assert compare_reports(data, data)[0].endswith("(+0.0%)")
+
+
+class TestTracing:
+    """Tests for per-request spans and metrics."""
+
+    def test_response_has_stage_timings_and_tokens(self):
+        """Test that a response carries its timing breakdown and token usage."""
+        usages = [
+            SimpleNamespace(input_tokens=120, output_tokens=15),
+            SimpleNamespace(input_tokens=40, output_tokens=9),
+        ]
+        client = SimpleNamespace(messages=FakeMessages(usages))
+        client.messages.replies = ["result = len(invoices_df.loc[:, 'id'])\n```", "result = len(invoices_df)\n```"]
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, client=client, direct_answers=True)
+        before = METRICS.snapshot().get("attempt", {}).get("count", 0)
+        response = pipeline.ask("How many invoices?")
+
+        assert response.success
+        assert {"result_cache", "schema", "attempt", "generate_code", "execute", "total"} <= set(response.timings)
+        assert response.timings["total"] >= response.timings["generate_code"] + response.timings["execute"]
+        assert response.tokens["input_tokens"] == 160
+        assert response.tokens["output_tokens"] == 24
+        assert METRICS.snapshot()["attempt"]["count"] == before + 2
+
+    def test_async_response_has_timings(self):
+        """Test that the async pipeline attaches timings too."""
+        usage = SimpleNamespace(input_tokens=50, output_tokens=5)
+        async_client = SimpleNamespace(messages=SimpleNamespace(create=None))
+
+        async def create(**request):
+            return SimpleNamespace(content=[SimpleNamespace(text="result = len(clients_df)\n```")], usage=usage)
+
+        async_client.messages.create = create
+        pipeline = AsyncChatPipeline(
+            data_dir=config.DATA_DIR, api_key="test-key", async_client=async_client, direct_answers=True
+        )
+        response = asyncio.run(pipeline.ask("How many clients?"))
+
+        assert response.success
+        assert response.timings["execute"] > 0
+        assert response.tokens == {
+            "input_tokens": 50,
+            "output_tokens": 5,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+        }
+
+    def test_aggregator_prometheus_text(self):
+        """Test that span totals are exported in the Prometheus text format."""
+        aggregator = MetricsAggregator()
+        for _ in range(2):
+            trace = Trace("ask", exporters=[aggregator])
+            with trace.span("generate_code"):
+                record_usage(SimpleNamespace(input_tokens=100, output_tokens=20))
+            with trace.span("execute") as span:
+                span.set(rows=3, success=True)
+            trace.finish(success=True)
+        text = aggregator.prometheus_text()
+
+        assert 'rag_span_seconds_count{span="generate_code"} 2' in text
+        assert 'rag_input_tokens_total{span="generate_code"} 200' in text
+        assert 'rag_rows_total{span="execute"} 6' in text
+        assert 'rag_span_flag_total{span="ask",flag="success"} 2' in text
+        assert trace.spans[1].parent is trace.root
+
+
+class TestPreflight:
+    """Tests for checking columns and names before execution."""
+
+    @pytest.fixture
+    def executor(self):
+        return SafeCodeExecutor(DataLoader(config.DATA_DIR).load_all())
+
+    def test_misspelled_column_rejected_with_suggestion(self, executor):
+        """Test that an unknown column is rejected before running, with the closest names."""
+        is_valid, error = executor.validate_code("result = clients_df[['name', 'industri']]")
+
+        assert not is_valid
+        assert error == "Column 'industri' does not exist in clients_df; did you mean 'industry'?"
+
+    def test_derived_frames_and_created_columns(self, executor):
+        """Test that merged and filtered frames are resolved and new columns are allowed."""
+        code = (
+            "merged = line_items_df.merge(invoices_df, on='invoice_id')\n"
+            "recent = merged[merged['invoice_date'].dt.year == 2024]\n"
+            "recent['total'] = recent['quantity'] * recent['unit_price']\n"
+            "result = recent.groupby('client_id')['total'].sum()"
+        )
+        is_valid, _ = executor.validate_code(code)
+        is_valid_bad_key, error = executor.validate_code("result = line_items_df.merge(clients_df, on='client_id')")
+
+        assert is_valid
+        assert not is_valid_bad_key
+        assert "Merge key 'client_id' does not exist in line_items_df" in error
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "top = clients_df[['name', 'country']]\n"
+            "top.columns = ['Client', 'Country']\n"
+            "result = top.sort_values('Client')",
+            "df = invoices_df.copy()\n"
+            "for c in ['invoice_date']:\n"
+            "    df[c + '_year'] = df[c].dt.year\n"
+            "result = df[['invoice_date_year']]",
+            "renamed = clients_df.set_axis(['a', 'b', 'c', 'd', 'e', 'f'], axis=1)\nresult = renamed['a']",
+            "renamed = clients_df.rename(columns=str.upper)\nresult = renamed[['NAME']]",
+            "df = clients_df.copy()\ndf.rename(columns=str.upper, inplace=True)\nresult = df['NAME']",
+        ],
+        ids=["columns-store", "computed-column", "set-axis", "rename-function", "rename-inplace"],
+    )
+    def test_relabelled_columns_are_not_checked(self, executor, code):
+        """Test that frames whose columns change in ways that cannot be followed are not rejected."""
+        is_valid, error = executor.validate_code(code)
+
+        assert is_valid, error
+
+    def test_unknown_name_rejected(self, executor):
+        """Test that names that are never defined are reported."""
+        is_valid, error = executor.validate_code("result = len(invoice_df)")
+
+        assert not is_valid
+        assert error == "Name 'invoice_df' is not defined; did you mean 'invoices_df'?"
+
+    def test_fix_code_applies_only_unambiguous_fixes(self, executor):
+        """Test that near-miss typos are fixed locally and guesses are left for the model."""
+        code = "result = invoice_df.merge(clients_df, on='Client_ID')[['name', 'totl']]"
+        fixed = executor.fix_code(code)
+
+        assert fixed == "result = invoices_df.merge(clients_df, on='client_id')[['name', 'totl']]"
+        assert executor.fix_code("result = len(clients_df)") == "result = len(clients_df)"
+
+
+class TestRepair:
+    """Tests for repairing failed code in a continuing conversation."""
+
+    def test_key_error_hint_lists_columns(self):
+        """Test that a missing column yields the table's real columns and a suggestion."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        result = SafeCodeExecutor(dfs).execute("x = 1\nresult = clients_df.loc[:, 'client_name']")
+        feedback = repair_feedback(result, dfs)
+
+        assert "line 2: result = clients_df.loc[:, 'client_name']" in feedback
+        assert "KeyError" in feedback
+        assert "clients_df columns: client_id, name" in feedback
+        assert "'client_name' does not exist; did you mean 'client_id'" in feedback
+        assert "invoices_df" not in feedback
+
+    def test_unrelated_error_has_no_hint(self):
+        """Test that errors not about missing names are passed on without a hint."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        result = SafeCodeExecutor(dfs).execute("result = 1 / 0")
+
+        assert repair_feedback(result, dfs) == "line 1: result = 1 / 0\nZeroDivisionError: division by zero"
+
+    def test_retry_continues_conversation(self):
+        """Test that a retry sends the failed code and error as new turns, not a new question."""
+        usages = [SimpleNamespace(input_tokens=10), SimpleNamespace(input_tokens=10)]
+        client = SimpleNamespace(messages=FakeMessages(usages))
+        client.messages.replies = ["result = len(invoices_df.loc[:, 'id'])\n```", "result = len(invoices_df)\n```"]
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, client=client, direct_answers=True)
+        response = pipeline.ask("How many invoices?")
+        retry = client.messages.requests[1]["messages"]
+
+        assert response.success
+        assert response.answer == "Count: **31**"
+        assert [m["role"] for m in retry] == ["user", "assistant", "user"]
+        assert retry[0] == client.messages.requests[0]["messages"][0]
+        assert retry[1]["content"].startswith("result = len(invoices_df.loc[:, 'id'])")
+        assert "KeyError" in retry[2]["content"]
+        assert "invoices_df columns: invoice_id" in retry[2]["content"]
+        assert "How many invoices?" not in retry[2]["content"]
+
+
+class TestSandboxedExecutor:
+    """Tests for the process-pool sandbox."""
+
+    @pytest.fixture
+    def sandbox(self):
+        """Create a single-worker sandbox with a short timeout."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        sandbox = SandboxedExecutor(dfs, workers=1, timeout_seconds=2)
+        yield sandbox
+        sandbox.close()
+
+    def test_query_runs_in_worker(self, sandbox):
+        """Test that results come back from the worker process."""
+        result = sandbox.execute("result = line_items_df.groupby('service_name').size()")
+
+        assert result.success
+        assert isinstance(result.result, pd.Series)
+
+    def test_unsafe_code_rejected_before_worker(self, sandbox):
+        """Test that validation still blocks imports."""
+        result = sandbox.execute("import os; result = os.getcwd()")
+
+        assert not result.success
+        assert "import" in result.error.lower()
+
+    def test_runaway_code_times_out_and_worker_recovers(self, sandbox):
+        """Test that a runaway loop is killed and the pool keeps serving."""
+        result = sandbox.execute("while True:\n    pass")
+
+        assert not result.success
+        assert "timed out" in result.error
+        assert sandbox.execute("result = len(clients_df)").result == 10
+
+    def test_workers_map_published_tables(self, tmp_path):
+        """Test that workers are not forked and read tables from the shared store."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        namespace = {**dfs, "clients_by_id": dfs["clients_df"].set_index("client_id")}
+        sandbox = SandboxedExecutor(namespace, workers=1, table_store=SharedTableStore(tmp_path))
+        try:
+            result = sandbox.execute("result = clients_by_id.loc['C001', 'country'] + str(len(invoices_df))")
+        finally:
+            sandbox.close()
+
+        assert sandbox._context.get_start_method() != "fork"
+        assert len(list(tmp_path.glob("*/invoices_df.arrow"))) == 1
+        assert not list(tmp_path.glob("*/clients_by_id.arrow"))
+        assert result.success
+        assert result.result == dfs["clients_df"].set_index("client_id").loc["C001", "country"] + "31"
+
+    def test_workers_rebuild_key_indexes(self):
+        """Test that workers build the key indexes themselves instead of receiving pickled copies."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        indexes = build_indexes(dfs)
+        sandbox = SandboxedExecutor(dfs, workers=1, indexes=indexes)
+        try:
+            result = sandbox.execute(
+                "result = (invoices_by_invoice_id.loc['I1001', 'client_id'], int(line_items_to_invoices.sum()))"
+            )
+        finally:
+            sandbox.close()
+
+        assert not {index.name for index in indexes} & set(sandbox._worker_args[3])
+        assert result.success
+        assert result.result == (
+            dfs["invoices_df"].set_index("invoice_id").loc["I1001", "client_id"],
+            int(next(index.value for index in indexes if index.name == "line_items_to_invoices").sum()),
+        )
+
+
+class TestResultCache:
+    """Tests for the persistent answer cache."""
+
+    def test_normalized_questions_share_key(self):
+        """Test that case, whitespace and trailing punctuation are ignored."""
+        key = ResultCache.make_key("Total billed amount per client in 2024", "model", "data")
+
+        assert ResultCache.make_key("  total billed amount  per client in 2024? ", "model", "data") == key
+        assert ResultCache.make_key("Total billed amount per client in 2024", "other-model", "data") != key
+        assert ResultCache.make_key("Total billed amount per client in 2024", "model", "changed") != key
+
+    def test_engines_do_not_share_entries(self, tmp_path):
+        """Test that an answer cached under one execution engine is not served by another."""
+        cache = ResultCache(tmp_path / "cache.sqlite")
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        replies = {"pandas": "result = len(clients_df)", "sql": "SELECT COUNT(*) AS n FROM clients_df"}
+        responses = {}
+        for engine, code in replies.items():
+            pipeline = ChatPipeline(dataframes=dfs, api_key="test-key", result_cache=cache, engine=engine)
+            pipeline.code_generator.generate = lambda question, schema, code=code: code
+            pipeline.answer_generator.generate = lambda question, result, code: "There are 10 clients."
+            pipeline.ask("How many clients?")
+            responses[engine] = pipeline.ask("How many clients?")
+
+        assert len(cache) == 2
+        assert all(response.cached for response in responses.values())
+        assert responses["pandas"].generated_code == replies["pandas"]
+        assert responses["sql"].generated_code == replies["sql"]
+
+    def test_round_trip_and_eviction(self, tmp_path):
+        """Test that results round-trip and the oldest entries are evicted."""
+        cache = ResultCache(tmp_path / "cache.sqlite", max_entries=2)
+        df = pd.DataFrame({"client_id": ["C001"], "total": [10.5]})
+
+        cache.put("a", "q1", "result = 1", df, "answer a")
+        cache.put("b", "q2", "result = 2", 2, "answer b")
+        cache.put("c", "q3", "result = 3", 3, "answer c")
+
+        assert len(cache) == 2
+        assert cache.get("a") is None
+        assert cache.get("c").answer == "answer c"
+
+    def test_expired_entries_are_ignored(self, tmp_path):
+        """Test that entries older than the TTL are not served."""
+        cache = ResultCache(tmp_path / "cache.sqlite", ttl_seconds=0)
+        cache.put("a", "q1", "result = 1", 1, "answer a")
+
+        assert cache.get("a") is None
+
+    def test_unreadable_entries_are_dropped(self, tmp_path):
+        """Test that a result that cannot be unpickled is treated as a miss and removed."""
+        cache = ResultCache(tmp_path / "cache.sqlite")
+        cache.put("a", "q1", "result = 1", 1, "answer a")
+        cache._conn.execute("UPDATE answers SET result = ? WHERE key = 'a'", (b"not a pickle",))
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_pipeline_serves_repeat_questions_from_cache(self, tmp_path):
+        """Test that a repeated question makes no LLM calls."""
+        cache = ResultCache(tmp_path / "cache.sqlite")
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, api_key="test-key", result_cache=cache)
+        calls = []
+        pipeline.code_generator.generate = lambda question, schema: calls.append(question) or "result = len(clients_df)"
+        pipeline.answer_generator.generate = lambda question, result, code: f"There are {result} clients."
+
+        first = pipeline.ask("How many clients?")
+        second = pipeline.ask("how many clients")
+
+        assert len(calls) == 1
+        assert not first.cached
+        assert second.cached
+        assert second.answer == first.answer
+        assert second.execution_result.result == 10
+
+
+class TestChatPipeline:
+    """Tests for pipeline orchestration with stubbed LLM calls."""
+
+    @pytest.fixture
+    def pipeline(self):
+        """Create a pipeline whose LLM stages are replaced with stubs."""
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, api_key="test-key")
+        pipeline.code_generator.generate = lambda question, schema: "result = len(invoices_df)"
+        pipeline.answer_generator.generate = lambda question, result, code: f"There are {result} invoices."
+        pipeline.answer_generator.generate_stream = lambda question, result, code: iter(
+            ["There are ", f"{result}", " invoices."]
+        )
+        return pipeline
+
+    def test_ask_stream_yields_stages_in_order(self, pipeline):
+        """Test that streaming emits code, execution, answer tokens and the final response."""
+        events = list(pipeline.ask_stream("How many invoices?"))
+        types = [event.type for event in events]
+
+        assert types == ["code", "execution", "answer_delta", "answer_delta", "answer_delta", "done"]
+        assert "".join(event.text for event in events) == events[-1].response.answer
+        assert events[-1].response.success
+
+    def test_ask_matches_streamed_answer(self, pipeline):
+        """Test that the blocking API returns the same answer as the stream."""
+        streamed = list(pipeline.ask_stream("How many invoices?"))[-1].response
+
+        assert pipeline.ask("How many invoices?").answer == streamed.answer
+
+    def test_interrupted_stream_is_not_repeated(self, pipeline):
+        """Test that a stream failing after some tokens reports failure instead of answering twice."""
+        calls = []
+
+        def broken_stream(question, result, code):
+            calls.append(question)
+            yield "There are "
+            raise RuntimeError("connection reset")
+
+        pipeline.answer_generator.generate_stream = broken_stream
+        events = list(pipeline.ask_stream("How many invoices?"))
+
+        assert len(calls) == 1
+        assert [event.type for event in events] == ["code", "execution", "answer_delta", "done"]
+        assert not events[-1].response.success
+        assert events[-1].response.error == "connection reset"
+
+
+class FakeMessages:
+    """Stand-in for client.messages that records requests."""
+
+    def __init__(self, usages):
+        self.requests = []
+        self.usages = list(usages)
+        self.reply = "```python\nresult = 1\n```"
+        self.replies = []  # Sent in order before falling back to `reply`
+
+    def create(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=self.replies.pop(0) if self.replies else self.reply)],
+            usage=self.usages.pop(0),
+        )
+
+
+class TestCodeGenerator:
+    """Tests for code generation requests."""
+
+    def test_static_prefix_is_cache_marked(self):
+        """Test that the schema goes in a cached system prefix, not the question."""
+        messages = FakeMessages([SimpleNamespace(input_tokens=20, cache_read_input_tokens=0)])
+        generator = CodeGenerator(model="test-model", client=SimpleNamespace(messages=messages))
+
+        code = generator.generate("How many clients?", "SCHEMA TEXT")
+        request = messages.requests[0]
+
+        assert code == "result = 1"
+        assert all(block["cache_control"] == {"type": "ephemeral"} for block in request["system"])
+        assert request["system"][1]["text"] == "SCHEMA TEXT"
+        assert "SCHEMA TEXT" not in request["messages"][0]["content"]
+        assert "How many clients?" in request["messages"][0]["content"]
+
+    def test_cache_hits_and_misses_are_counted(self):
+        """Test that prompt-cache usage is aggregated for monitoring."""
+        messages = FakeMessages(
+            [
+                SimpleNamespace(input_tokens=20, cache_creation_input_tokens=1500, cache_read_input_tokens=0),
+                SimpleNamespace(input_tokens=22, cache_creation_input_tokens=0, cache_read_input_tokens=1500),
+            ]
+        )
+        generator = CodeGenerator(model="test-model", client=SimpleNamespace(messages=messages))
+
+        generator.generate("q1", "schema")
+        generator.generate("q2", "schema")
+
+        stats = generator.cache_stats
+        assert (stats.requests, stats.hits, stats.misses) == (2, 1, 1)
+        assert stats.cache_read_tokens == 1500
+        assert stats.hit_rate == 0.5
+
+    def test_truncated_replies_keep_their_code(self):
+        """Test that code is extracted from replies cut off before the closing fence."""
+        generator = CodeGenerator(model="test-model", client=SimpleNamespace(messages=None))
+
+        assert (
+            generator._extract_code("```python\nresult = len(clients_df)\nx = (") == "result = len(clients_df)\nx = ("
+        )
+        assert generator._extract_code("```\nresult = 1") == "result = 1"
+        assert generator._extract_code("result = 2\n```") == "result = 2"
+        assert generator._extract_code("Here:\n```python\nresult = 3\n```\nDone") == "result = 3"
+
+
+class TestDirectAnswers:
+    """Tests for deterministic answer formatting."""
+
+    def test_scalar_count(self):
+        """Test that counts render as plain integers."""
+        assert format_direct_answer("How many clients are there?", 10) == "Count: **10**"
+
+    def test_scalar_currency(self):
+        """Test that monetary totals get two decimals and thousands separators."""
+        assert format_direct_answer("Total billed amount in 2024", 123456.789) == "Total: **123,456.79**"
+
+    def test_small_series_renders_table(self):
+        """Test that a short grouped Series becomes a markdown table."""
+        series = pd.Series([3, 5], index=pd.Index(["Audit", "Review"], name="service_name"), name="count")
+        answer = format_direct_answer("Count line items by service name", series)
+
+        assert "| service_name | count |" in answer
+        assert "| Review | 5 |" in answer
+
+    def test_large_or_narrative_results_use_llm(self):
+        """Test that large results and interpretive questions fall back to the LLM."""
+        large = pd.DataFrame({"a": range(100)})
+
+        assert format_direct_answer("List all values", large) is None
+        assert format_direct_answer("Explain why the total dropped", 5.0) is None
+
+    def test_pipeline_skips_answer_call(self):
+        """Test that the answer LLM is not called for small results."""
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, api_key="test-key", direct_answers=True)
+        pipeline.code_generator.generate = lambda question, schema: "result = len(invoices_df)"
+        pipeline.answer_generator.generate = lambda question, result, code: pytest.fail("answer LLM was called")
+
+        response = pipeline.ask("How many invoices are there?")
+
+        assert response.success
+        assert response.answer == f"Count: **{len(pipeline.dataframes['invoices_df'])}**"
+
+
+class TestAsyncChatPipeline:
+    """Tests for the async pipeline."""
+
+    def test_concurrent_asks_overlap(self):
+        """Test that many questions are served concurrently on one event loop."""
+        pipeline = AsyncChatPipeline(data_dir=config.DATA_DIR, api_key="test-key")
+
+        async def generate_code(question, schema):
+            await asyncio.sleep(0.1)
+            return "result = len(clients_df)"
+
+        async def generate_answer(question, result, code):
+            await asyncio.sleep(0.1)
+            return f"{question}: {result}"
+
+        pipeline.code_generator.agenerate = generate_code
+        pipeline.answer_generator.agenerate = generate_answer
+
+        async def ask_all():
+            return await asyncio.gather(*(pipeline.ask(f"Question {i}") for i in range(20)))
+
+        start = time.perf_counter()
+        responses = asyncio.run(ask_all())
+        elapsed = time.perf_counter() - start
+
+        assert all(response.success for response in responses)
+        assert responses[7].answer == "Question 7: 10"
+        assert elapsed < 2.0  # 20 sequential asks would take at least 4 seconds
+
+    def test_pipeline_serves_several_event_loops(self):
+        """Test that the concurrency limit is not tied to the first event loop that used it."""
+        pipeline = AsyncChatPipeline(data_dir=config.DATA_DIR, api_key="test-key", max_concurrency=1)
+
+        async def generate_code(question, schema):
+            await asyncio.sleep(0.01)
+            return "result = len(clients_df)"
+
+        async def generate_answer(question, result, code):
+            return str(result)
+
+        pipeline.code_generator.agenerate = generate_code
+        pipeline.answer_generator.agenerate = generate_answer
+
+        async def ask_two():
+            return await asyncio.gather(pipeline.ask("First"), pipeline.ask("Second"))
+
+        for _ in range(2):
+            responses = asyncio.run(ask_two())
+            assert [response.answer for response in responses] == ["10", "10"]
+
+
+class TestQuestionIndex:
+    """Tests for paraphrased question matching."""
+
+    @pytest.fixture
+    def index(self):
+        """Create an index over the sample data with one answered question."""
+        dfs = DataLoader(config.DATA_DIR).load_all()
+        index = QuestionIndex.from_dataframes(dfs)
+        index.add("Client with highest 2024 billing", "result = 'top'")
+        index.add("Which clients are based in the UK?", "result = 'uk'")
+        return index
+
+    def test_paraphrase_matches(self, index):
+        """Test that a reworded question reuses the earlier code."""
+        match = index.lookup("top client by 2024 billing")
+
+        assert match is not None
+        assert match.code == "result = 'top'"
+
+    def test_different_literals_do_not_match(self, index):
+        """Test that years and data values must be identical to match."""
+        assert index.lookup("Client with highest 2023 billing") is None
+        assert index.lookup("Which clients are based in the US?") is None
+
+    def test_unrelated_question_does_not_match(self, index):
+        """Test that unrelated questions fall through to code generation."""
+        assert index.lookup("Count line items by service name") is None
+
+    def test_swapped_word_order_does_not_match(self, index):
+        """Test that the same words asking about different things are not treated as a paraphrase."""
+        index.add("Count clients per invoice", "result = 'clients per invoice'")
+
+        assert index.lookup("Count invoices per client") is None
+        assert index.lookup("Number of clients for each invoice").code == "result = 'clients per invoice'"
+
+    def test_pipeline_reuses_code_for_paraphrase(self):
+        """Test that a paraphrased question skips code generation."""
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, api_key="test-key", reuse_similar_questions=True)
+        calls = []
+        pipeline.code_generator.generate = lambda question, schema: calls.append(question) or "result = len(clients_df)"
+        pipeline.answer_generator.generate = lambda question, result, code: str(result)
+
+        pipeline.ask("How many clients are there?")
+        response = pipeline.ask("Number of clients")
+
+        assert len(calls) == 1
+        assert response.success
+        assert response.answer == "10"
+
+    def test_failed_reused_answer_falls_back_to_generation(self):
+        """Test that an API error while phrasing a reused answer is handled like any other failure."""
+        pipeline = ChatPipeline(data_dir=config.DATA_DIR, api_key="test-key", reuse_similar_questions=True)
+        pipeline.code_generator.generate = lambda question, schema: "result = len(clients_df)"
+        answers = iter(["first", RuntimeError("overloaded"), "regenerated"])
+
+        def generate_answer(question, result, code):
+            answer = next(answers)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        pipeline.answer_generator.generate = generate_answer
+        pipeline.ask("How many clients are there?")
+        response = pipeline.ask("Number of clients")
+
+        assert response.success
+        assert response.answer == "regenerated"
+
+    def test_async_answer_errors_become_failed_responses(self):
+        """Test that answer errors in the async pipeline are returned rather than raised."""
+        pipeline = AsyncChatPipeline(data_dir=config.DATA_DIR, api_key="test-key", reuse_similar_questions=True)
+
+        async def generate_code(question, schema):
+            return "result = len(clients_df)"
+
+        async def generate_answer(question, result, code):
+            if question != "How many clients are there?":
+                raise RuntimeError("overloaded")
+            return "ten"
+
+        pipeline.code_generator.agenerate = generate_code
+        pipeline.answer_generator.agenerate = generate_answer
+
+        async def ask_both():
+            return await pipeline.ask("How many clients are there?"), await pipeline.ask("Number of clients")
+
+        first, second = asyncio.run(ask_both())
+
+        assert first.success
+        assert not second.success
+        assert second.error == "overloaded"